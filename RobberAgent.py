@@ -1,13 +1,39 @@
+import copy
 import heapq
 
+import numpy as np
+
+from dstar_lite import PianificatoreDStarLite
+from hpa_star import PianificatoreHPA
+from jps import PianificatoreJPS
+from mappa import ottieni_mappa
+
+
+# Penalità delle guardie visibili attorno alla guardia: (4 - distanza) * 20 fino a distanza 3
+_D = np.abs(np.arange(-3, 4))
+KERNEL_GUARDIA = np.maximum(4 - (_D[:, None] + _D[None, :]), 0) * 20
+
 
 class RobberAgent:
-    def __init__(self, startPos, endPos):
+    def __init__(self, startPos, endPos, pianificatore="a_star", grid_size=20):
         self.pos = startPos  # Posizione corrente
         self.endPos = endPos  # Posizione obiettivo [cite: 42]
         self.vision_radius = 3  # Raggio di visione del ladro [cite: 40, 69]
         self.storico_mosse = []
-        self.heat_map = [[0 for _ in range(20)] for _ in range(20)]
+        self.grid_size = grid_size
+        self.heat_map = np.zeros((grid_size, grid_size), dtype=np.int64)
+        self.campo_obiettivo = None  # (mappa, endPos, xs, ys, distanza Manhattan dall'obiettivo)
+        self.contatori = None  # ContatoriRicerca di statistiche.py, solo se le statistiche sono attive
+        self.piano = []  # Ultimo percorso di A* (posizione di partenza compresa), per passo_di_ripiego
+        # "a_star": ricerca completa a ogni turno,
+        # "dstar_lite": ricerca incrementale per le mappe da 30x30 in su (sotto, la riparazione
+        # attorno alle guardie e allo storico tocca buona parte della mappa e costa più di a_star),
+        # "hpa_star": ricerca gerarchica a cluster per le mappe grandi (200x200 e oltre),
+        # "jps": lo stesso A* con la stessa prima mossa, ma a salti sui tratti aperti e su tabelle piatte
+        self.pianificatore = pianificatore
+        self.dstar = PianificatoreDStarLite(self) if pianificatore == "dstar_lite" else None
+        self.hpa = PianificatoreHPA(self) if pianificatore == "hpa_star" else None
+        self.jps = PianificatoreJPS(self) if pianificatore == "jps" else None
 
     def traduzioneCordinate(self, posizione_iniziale, posizione_finale):
         x, y = posizione_finale
@@ -27,43 +53,74 @@ class RobberAgent:
             return "WAIT"  # [cite: 120]
 
     def get_neighbors(self, grid, pos, visible_guards):
-        neighbors = []
+        # grid può essere la griglia o la sua Mappa: confini e muri sono già nella tabella dei vicini
         # Movimenti: NORD, SUD, EST, OVEST
-        for dx, dy in [(0, -1), (0, 1), (1, 0), (-1, 0)]:
-            x, y = pos[0] + dx, pos[1] + dy
-
-            # 1. Controllo confini della griglia 20x20
-            if 0 <= x < 20 and 0 <= y < 20:
-                # 2. CORREZIONE: Verifica che la cella non sia un muro (1)
-                # Prima c'era grid[y][x] != "OBSTACLE"
-                if grid[y][x] != 1 and (x, y) not in visible_guards:
-                    neighbors.append((x, y))
-        return neighbors
+        return [v for v in ottieni_mappa(grid).vicini_xy[pos] if v not in visible_guards]
 
     def heuristic(self, pos, guardie_visibili):
         # Distanza di Manhattan base [cite: 15, 157]
         h = abs(pos[0] - self.endPos[0]) + abs(pos[1] - self.endPos[1])
+        return h + self.penalita(pos, guardie_visibili)
 
+    def penalita(self, pos, guardie_visibili):
+        # Parte dell'euristica che non dipende dall'obiettivo
+        p = 0
         if pos in self.storico_mosse:
-            h += 100
+            p += 100
         if self.heat_map[pos[0]][pos[1]] > 0 :
-            h += self.heat_map[pos[0]][pos[1]] *5
+            p += self.heat_map[pos[0]][pos[1]] *5
         # Penalità guardie nel raggio di visione [cite: 15, 43]
         for g_pos in guardie_visibili:
             dist_g = abs(pos[0] - g_pos[0]) + abs(pos[1] - g_pos[1])
             if dist_g <= 3:
-                h += (4 - dist_g) * 20
-        return h
+                p += (4 - dist_g) * 20
+        return p
+
+    def _campo_obiettivo(self, mappa):
+        # Coordinate di ogni cella e distanza di Manhattan dall'obiettivo, una volta per mappa
+        if self.campo_obiettivo is None or self.campo_obiettivo[0] is not mappa or self.campo_obiettivo[1] != self.endPos:
+            celle = np.arange(mappa.n_celle)
+            xs, ys = celle % mappa.larghezza, celle // mappa.larghezza
+            distanza = np.abs(xs - self.endPos[0]) + np.abs(ys - self.endPos[1])
+            self.campo_obiettivo = (mappa, self.endPos, xs, ys, distanza)
+        return self.campo_obiettivo
+
+    def campo_penalita(self, mappa, guardie_visibili):
+        """penalita() di tutte le celle in un colpo solo: array NumPy piatto (indice y * larghezza + x)."""
+        _, _, xs, ys, _ = self._campo_obiettivo(mappa)
+        # Heat map letta come in penalita(): heat_map[x][y]
+        campo = self.heat_map[xs, ys] * 5
+        for x, y in set(self.storico_mosse):
+            campo[y * mappa.larghezza + x] += 100
+        # Kernel delle guardie, ritagliato ai bordi della mappa
+        griglia_campo = campo.reshape(mappa.altezza, mappa.larghezza)
+        for gx, gy in guardie_visibili:
+            x0, x1 = max(gx - 3, 0), min(gx + 4, mappa.larghezza)
+            y0, y1 = max(gy - 3, 0), min(gy + 4, mappa.altezza)
+            griglia_campo[y0:y1, x0:x1] += KERNEL_GUARDIA[y0 - gy + 3:y1 - gy + 3, x0 - gx + 3:x1 - gx + 3]
+        return campo
+
+    def campo_euristico(self, mappa, guardie_visibili):
+        # heuristic() di tutte le celle: distanza dall'obiettivo + penalità, come lista piatta
+        return (self._campo_obiettivo(mappa)[4] + self.campo_penalita(mappa, guardie_visibili)).tolist()
 
     def a_star(self, griglia, guardie_visibili):
         start = self.pos
+        griglia = ottieni_mappa(griglia)
+        # Euristica del turno calcolata una volta sola per tutta la mappa
+        h = self.campo_euristico(griglia, guardie_visibili)
+        w = griglia.larghezza
+        # Con i contatori attivi push/pop passano da loro, altrimenti sono quelli di heapq
+        push, pop = heapq.heappush, heapq.heappop
+        if self.contatori is not None:
+            push, pop = self.contatori.push, self.contatori.pop
         frontier = []
-        heapq.heappush(frontier, (0, start))
+        push(frontier, (0, start))
         came_from = {start: None}
         cost_so_far = {start: 0}  # g(n) [cite: 25, 144]
 
         while frontier:
-            current = heapq.heappop(frontier)[1]
+            current = pop(frontier)[1]
             if current == self.endPos: break
 
             for next_node in self.get_neighbors(griglia, current, guardie_visibili):
@@ -71,35 +128,51 @@ class RobberAgent:
                 if next_node not in cost_so_far or new_cost < cost_so_far[next_node]:
                     cost_so_far[next_node] = new_cost
                     # f(n) = g(n) + h(n) [cite: 15]
-                    priority = new_cost + self.heuristic(next_node, guardie_visibili)
-                    heapq.heappush(frontier, (priority, next_node))
+                    priority = new_cost + h[next_node[1] * w + next_node[0]]
+                    push(frontier, (priority, next_node))
                     came_from[next_node] = current
         return came_from
 
-    def pianifica_mossa(self, griglia, guardia_tutte):
-        # 1. Filtro guardie visibili (Raggio 3) [cite: 40, 69]
+    def scegli_passo(self, griglia, guardia_tutte):
+        """Prossima cella (x, y) verso la cassaforte, o None se è irraggiungibile; il ladro non si muove."""
+        # 1. Filtro guardie visibili (Raggio 3, i muri fanno ombra) [cite: 40, 69]
+        mappa_griglia = ottieni_mappa(griglia)
         guardia_visibili = []
         for g in guardia_tutte:
-            dist = abs(self.pos[0] - g[0]) + abs(self.pos[1] - g[1])
-            if dist <= 3:
+            if mappa_griglia.vede(self.pos[0], self.pos[1], g[0], g[1], self.vision_radius):
                 guardia_visibili.append(g)
 
+        esterno = self.dstar or self.hpa or self.jps
+        if esterno is not None:
+            # Il pianificatore è condiviso con le copie di istantanea: legge lo stato di chi cerca
+            esterno.agente = self
+            # 2-4. D* Lite ripara la ricerca del turno precedente, HPA* raffina solo il primo tratto,
+            # JPS rifà A* saltando la coda sui tratti aperti: tutti danno direttamente il passo
+            return esterno.prossimo_passo(griglia, guardia_visibili)
+
         # 2. Eseguo A*
         mappa = self.a_star(griglia, guardia_visibili)
 
         # 3. Controllo se l'obiettivo è raggiungibile
         if self.endPos not in mappa:
-            return "WAIT"
+            return None
 
         # 4. Ricostruzione percorso (torno indietro) [cite: 82]
+        # (fino alla radice della ricerca: la posizione da cui è partito A*)
         percorso = []
         attuale = self.endPos
-        while attuale != self.pos:
+        while mappa[attuale] is not None:
             percorso.append(attuale)
             attuale = mappa[attuale]
+        # Il piano intero resta per passo_di_ripiego, dalla posizione di partenza alla cassaforte
+        self.piano = [attuale] + percorso[::-1]
+        return percorso[-1]
 
+    def esegui_passo(self, prossima_pos):
+        """Muove il ladro su prossima_pos (None = resta fermo) e restituisce la mossa."""
+        if prossima_pos is None:
+            return "WAIT"
         # 5. Prendo il primo passo e aggiorno la posizione
-        prossima_pos = percorso[-1]
         mossa = self.traduzioneCordinate(self.pos, prossima_pos)
         if len(self.storico_mosse) > 2:
             self.storico_mosse.pop(0)
@@ -109,3 +182,32 @@ class RobberAgent:
         # IMPORTANTE: self.pos deve restare una coordinata (x, y), non la stringa "NORD"
         self.pos = prossima_pos
         return mossa
+
+    def istantanea(self):
+        """
+        Copia del ladro su cui scegliere il passo in un altro thread: posizione, storico, heat map
+        e piano sono suoi, così il ladro può muoversi (passo_di_ripiego, esegui_passo) mentre la
+        copia cerca. Il pianificatore esterno resta condiviso: una ricerca alla volta.
+        """
+        copia = copy.copy(self)
+        copia.storico_mosse = list(self.storico_mosse)
+        copia.heat_map = self.heat_map.copy()
+        copia.piano = []
+        return copia
+
+    def pianifica_mossa(self, griglia, guardia_tutte):
+        return self.esegui_passo(self.scegli_passo(griglia, guardia_tutte))
+
+    def passo_di_ripiego(self, griglia, guardia_tutte):
+        """
+        Passo senza nuova ricerca, per quando la pianificazione non arriva in tempo: la cella dopo
+        la posizione attuale nell'ultimo piano di A*, se è ancora accanto e nessuna guardia la occupa.
+        None (resta fermo) se il ladro è uscito dal piano o il pianificatore non ne tiene uno.
+        """
+        piano = self.piano
+        for attuale, seguente in zip(piano, piano[1:]):
+            if attuale == self.pos:
+                if seguente in ottieni_mappa(griglia).vicini_xy[self.pos] and seguente not in guardia_tutte:
+                    return seguente
+                return None
+        return None
@@ -1,7 +1,15 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-import os
+
+from risultati import carica_colonne, percorso_risultati
+
+
+def metriche(dati):
+    """Percentuale di vittorie e media mosse nelle vittorie."""
+    vittorie = dati["Risultato"] == 'VITTORIA'
+    rate = vittorie.mean() * 100 if len(vittorie) else 0
+    moves = dati["Mosse_Impiegate"][vittorie].mean() if vittorie.any() else 0
+    return rate, moves
 
 
 def confronta_algoritmi():
@@ -9,27 +17,26 @@ def confronta_algoritmi():
     file_astar = 'risultati_A_STAR.csv'
     file_greedy = 'risultati_GREEDY.csv'
 
-    # 1. Verifica esistenza file
-    if not os.path.exists(file_astar) or not os.path.exists(file_greedy):
+    # 1. Verifica esistenza file (CSV o cartella a colonne con lo stesso nome: la più recente)
+    percorso_astar = percorso_risultati(file_astar)
+    percorso_greedy = percorso_risultati(file_greedy)
+    if percorso_astar is None or percorso_greedy is None:
         print("⚠️ ERRORE: Mancano i file CSV nella cartella!")
         print(f"Controlla se esistono: {file_astar} e {file_greedy}")
         return
 
-    # 2. Caricamento Dati
-    df_astar = pd.read_csv(file_astar)
-    df_greedy = pd.read_csv(file_greedy)
+    # 2. Caricamento Dati: solo esito e mosse
+    dati_astar = carica_colonne(percorso_astar, ["Risultato", "Mosse_Impiegate"])
+    dati_greedy = carica_colonne(percorso_greedy, ["Risultato", "Mosse_Impiegate"])
 
-    print(f"✅ Dati caricati: {len(df_astar)} partite A*, {len(df_greedy)} partite Greedy.")
+    print(f"✅ Dati caricati: {len(dati_astar['Risultato'])} partite A*, "
+          f"{len(dati_greedy['Risultato'])} partite Greedy.")
 
     # 3. Calcolo Metriche A*
-    wins_astar = df_astar[df_astar['Risultato'] == 'VITTORIA']
-    rate_astar = (len(wins_astar) / len(df_astar)) * 100
-    moves_astar = wins_astar['Mosse_Impiegate'].mean() if not wins_astar.empty else 0
+    rate_astar, moves_astar = metriche(dati_astar)
 
     # 4. Calcolo Metriche GREEDY
-    wins_greedy = df_greedy[df_greedy['Risultato'] == 'VITTORIA']
-    rate_greedy = (len(wins_greedy) / len(df_greedy)) * 100
-    moves_greedy = wins_greedy['Mosse_Impiegate'].mean() if not wins_greedy.empty else 0
+    rate_greedy, moves_greedy = metriche(dati_greedy)
 
     # Stampa Console
     print("\n--- RISULTATI CONFRONTO ---")
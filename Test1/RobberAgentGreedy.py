@@ -1,14 +1,18 @@
 import heapq
 
+from mappa import ottieni_mappa
+
 
 class RobberAgent:
-    def __init__(self, startPos, endPos):
+    def __init__(self, startPos, endPos, grid_size=20):
         self.pos = startPos  # Posizione corrente
         self.endPos = endPos  # Posizione obiettivo
         self.vision_radius = 3  # Raggio di visione del ladro
         self.storico_mosse = []  # Ultime 2 posizioni visitate
         # Heat Map per evitare i cicli (memoria delle zone visitate)
-        self.heat_map = [[0 for _ in range(20)] for _ in range(20)]
+        self.grid_size = grid_size
+        self.heat_map = [[0 for _ in range(grid_size)] for _ in range(grid_size)]
+        self.contatori = None  # ContatoriRicerca di statistiche.py, solo se le statistiche sono attive
 
     def traduzioneCordinate(self, posizione_iniziale, posizione_finale):
         x, y = posizione_finale
@@ -28,17 +32,9 @@ class RobberAgent:
             return "WAIT"
 
     def get_neighbors(self, grid, pos, visible_guards):
-        neighbors = []
         # Movimenti possibili: NORD, SUD, EST, OVEST
-        for dx, dy in [(0, -1), (0, 1), (1, 0), (-1, 0)]:
-            x, y = pos[0] + dx, pos[1] + dy
-
-            # 1. Controllo confini della griglia 20x20
-            if 0 <= x < 20 and 0 <= y < 20:
-                # 2. Verifica che la cella non sia un muro (1) e non ci sia una guardia visibile
-                if grid[y][x] != 1 and (x, y) not in visible_guards:
-                    neighbors.append((x, y))
-        return neighbors
+        # Confini e muri sono già nella tabella dei vicini della Mappa: resta solo il filtro guardie
+        return [v for v in ottieni_mappa(grid).vicini_xy[pos] if v not in visible_guards]
 
     def heuristic(self, pos, guardie_visibili):
         """
@@ -71,16 +67,21 @@ class RobberAgent:
         ignorando il costo del cammino già percorso.
         """
         start = self.pos
+        griglia = ottieni_mappa(griglia)
+        # Con i contatori attivi push/pop passano da loro, altrimenti sono quelli di heapq
+        push, pop = heapq.heappush, heapq.heappop
+        if self.contatori is not None:
+            push, pop = self.contatori.push, self.contatori.pop
         frontier = []
         # Nella frontiera mettiamo solo la priorità data dall'euristica
-        heapq.heappush(frontier, (0, start))
+        push(frontier, (0, start))
 
         came_from = {start: None}
 
         # Nota: Non serve 'cost_so_far' perché il Greedy non calcola il costo reale del percorso
 
         while frontier:
-            current = heapq.heappop(frontier)[1]
+            current = pop(frontier)[1]
 
             if current == self.endPos:
                 break
@@ -91,7 +92,7 @@ class RobberAgent:
                     # La priorità è SOLO l'euristica (h), non c'è g(n)
                     priority = self.heuristic(next_node, guardie_visibili)
 
-                    heapq.heappush(frontier, (priority, next_node))
+                    push(frontier, (priority, next_node))
                     came_from[next_node] = current
 
         return came_from
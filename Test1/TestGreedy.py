@@ -1,7 +1,4 @@
-import random
-import csv
-from collections import deque
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 
 # --- MODIFICA FONDAMENTALE ---
@@ -11,57 +8,38 @@ except ImportError:
     print("ERRORE: Non trovo il file 'RobberAgentGreedy.py'. Controlla il nome!")
     exit()
 
-from guard import MinimaxGuardAI, GameState, Position
+from guard import MinimaxGuardAI, Position
+from mappa import genera_mappa
+from simulatore import Partita
+from statistiche import COLONNE
+from risultati import apri_scrittore, carica_colonne, percorso_risultati
 
 # --- CONFIGURAZIONE TEST ---
 NUMERO_PARTITE = 1000
 MAX_TURNI = 200
 GRID_SIZE = 20
 NOME_FILE_CSV = 'risultati_GREEDY.csv'
+FORMATO_RISULTATI = "csv"  # "colonne" = cartella risultati_GREEDY/ con un blocco .npy per colonna
 NOME_FILE_GRAFICO = 'grafico_greedy.png'  # Nome dell'immagine salvata
+BUDGET_GUARDIE_MS = None  # Es. 50: le guardie approfondiscono finché c'è tempo (None = max_depth fisso)
+STATISTICHE = False  # True = colonne extra con nodi, tagli, profondità e tempi di pianificazione
+PROTETTE = [(0, 0), (0, 1), (1, 0), (19, 19), (10, 5), (5, 10)]  # Celle di spawn sempre libere (riga, colonna)
 
 # --- FUNZIONI DI UTILITÀ ---
 
-def check_path_exists(griglia, start_pos, end_pos):
-    """BFS per verificare che la mappa sia risolvibile"""
-    rows = len(griglia)
-    cols = len(griglia[0])
-    queue = deque([start_pos])
-    visited = set()
-    visited.add(start_pos)
-
-    while queue:
-        r, c = queue.popleft()
-        if (r, c) == end_pos: return True
-
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nr, nc = r + dr, c + dc
-            if (0 <= nr < rows and 0 <= nc < cols and
-                    griglia[nr][nc] != 1 and (nr, nc) not in visited):
-                visited.add((nr, nc))
-                queue.append((nr, nc))
-    return False
-
-
 def genera_mappa_valida():
-    while True:
-        griglia = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                if (row, col) in [(0, 0), (0, 1), (1, 0), (19, 19), (10, 5), (5, 10)]:
-                    continue
-                if random.random() < 0.25:
-                    griglia[row][col] = 1
-
-        if check_path_exists(griglia, (0, 0), (19, 19)):
-            return griglia
+    return genera_mappa(GRID_SIZE, 0.25, PROTETTE, (0, 0), (19, 19))
 
 
 # --- MOTORE DI SIMULAZIONE ---
 
 def esegui_simulazione_greedy():
     print(f"🚀 AVVIO TEST GREEDY: {NUMERO_PARTITE} partite...")
-    risultati = []
+    intestazione = ["ID_Partita", "Risultato", "Mosse_Impiegate"] + (COLONNE if STATISTICHE else [])
+    configurazione = {"Ladro": "GREEDY", "Grid_Size": GRID_SIZE, "Max_Turni": MAX_TURNI,
+                      "Budget_Guardie_ms": BUDGET_GUARDIE_MS}
+    # Mappe dal generatore globale, non seedate per partita: ogni esecuzione riparte da zero
+    scrittore = apri_scrittore(NOME_FILE_CSV, intestazione, FORMATO_RISULTATI, False, configurazione)
 
     for i in range(NUMERO_PARTITE):
         griglia = genera_mappa_valida()
@@ -70,79 +48,56 @@ def esegui_simulazione_greedy():
         ladro = GreedyAgent((0, 0), (19, 19))
 
         guard_ai = MinimaxGuardAI(max_depth=2)
-        g1_pos = Position(10, 5)
-        g2_pos = Position(5, 10)
-
-        mosse_ladro = 0
-        stato_finale = "PAREGGIO"
-
-        for turno in range(MAX_TURNI):
-            # 1. Turno Ladro
-            old_pos = ladro.pos
-            ladro.pianifica_mossa(griglia, [(g1_pos.x, g1_pos.y), (g2_pos.x, g2_pos.y)])
-            if ladro.pos != old_pos:
-                mosse_ladro += 1
-
-            if ladro.pos == (19, 19):
-                stato_finale = "VITTORIA"
-                break
-
-            if (abs(ladro.pos[0] - g1_pos.x) + abs(ladro.pos[1] - g1_pos.y) <= 1 or
-                    abs(ladro.pos[0] - g2_pos.x) + abs(ladro.pos[1] - g2_pos.y) <= 1):
-                stato_finale = "CATTURATO"
-                break
-
-            # 2. Turno Guardie
-            stato = GameState(griglia, g1_pos, g2_pos, Position(*ladro.pos), False)
-            g1_pos, g2_pos = guard_ai.get_best_moves(stato)
-
-            if (abs(ladro.pos[0] - g1_pos.x) + abs(ladro.pos[1] - g1_pos.y) <= 1 or
-                    abs(ladro.pos[0] - g2_pos.x) + abs(ladro.pos[1] - g2_pos.y) <= 1):
-                stato_finale = "CATTURATO"
-                break
-
-        risultati.append([i + 1, stato_finale, mosse_ladro])
+
+        partita = Partita(griglia, ladro, guard_ai, Position(10, 5), Position(5, 10),
+                          max_turni=MAX_TURNI, budget_ms=BUDGET_GUARDIE_MS, statistiche=STATISTICHE)
+        risultato = partita.gioca()
+
+        riga = [i + 1, risultato.esito, risultato.mosse_ladro]
+        if STATISTICHE:
+            riga += [risultato.statistiche[c] for c in COLONNE]
+        scrittore.scrivi(riga)
         if (i + 1) % 20 == 0:
             print(f"   ...completate {i + 1}/{NUMERO_PARTITE} partite.")
 
-    with open(NOME_FILE_CSV, 'w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["ID_Partita", "Risultato", "Mosse_Impiegate"])
-        writer.writerows(risultati)
+    scrittore.chiudi()
 
-    print(f"✅ Dati Greedy salvati in '{NOME_FILE_CSV}'")
+    print(f"✅ Dati Greedy salvati in '{scrittore.percorso}'")
 
 
 # --- MOTORE GRAFICO (NUOVO) ---
 
 def genera_grafici():
     print("📊 Generazione grafici Greedy in corso...")
-    try:
-        # Legge il file appena creato
-        df = pd.read_csv(NOME_FILE_CSV)
-    except FileNotFoundError:
+    # Legge il file appena creato, solo le due colonne che servono ai grafici
+    percorso = percorso_risultati(NOME_FILE_CSV, FORMATO_RISULTATI)
+    if percorso is None:
         print("Errore: File CSV non trovato. Esegui la simulazione prima.")
         return
+    dati = carica_colonne(percorso, ["Risultato", "Mosse_Impiegate"])
+    esiti, mosse = dati["Risultato"], dati["Mosse_Impiegate"]
 
     # Setup Grafico
     plt.style.use('ggplot')
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
-    fig.suptitle(f'Analisi Prestazioni Ladro GREEDY su {len(df)} Partite', fontsize=18)
+    fig.suptitle(f'Analisi Prestazioni Ladro GREEDY su {len(esiti)} Partite', fontsize=18)
 
-    # GRAFICO 1: Torta (Percentuali)
-    counts = df['Risultato'].value_counts()
+    # GRAFICO 1: Torta (Percentuali), esiti dal più frequente
+    labels, counts = np.unique(esiti, return_counts=True)
+    ordine = np.argsort(-counts, kind="stable")
+    labels, counts = labels[ordine], counts[ordine]
     colors = {'VITTORIA': '#4CAF50', 'CATTURATO': '#F44336', 'PAREGGIO': 'grey'}
-    col_list = [colors.get(x, 'blue') for x in counts.index]
+    col_list = [colors.get(x, 'blue') for x in labels]
 
-    ax1.pie(counts, labels=counts.index, autopct='%1.1f%%', startangle=90,
+    ax1.pie(counts, labels=labels, autopct='%1.1f%%', startangle=90,
             colors=col_list, explode=[0.05] * len(counts), textprops={'fontsize': 12})
     ax1.set_title('Tasso di Successo', fontsize=14)
 
     # GRAFICO 2: Istogramma (Mosse)
-    wins = df[df['Risultato'] == 'VITTORIA']
-    if not wins.empty:
-        media = wins['Mosse_Impiegate'].mean()
-        ax2.hist(wins['Mosse_Impiegate'], bins=15, color='#FFA500', edgecolor='black', alpha=0.7) # Arancione per Greedy
+    wins = mosse[esiti == 'VITTORIA']
+    if len(wins):
+        media = wins.mean()
+        ax2.hist(wins, bins=15, color='#FFA500', edgecolor='black', alpha=0.7) # Arancione per Greedy
         ax2.axvline(media, color='red', linestyle='dashed', linewidth=2, label=f'Media: {media:.1f} mosse')
         ax2.set_title('Distribuzione Mosse (Solo Vittorie)', fontsize=14)
         ax2.set_xlabel('Numero di Mosse')
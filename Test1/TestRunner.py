@@ -1,146 +1,141 @@
-import random
-import csv
 import os
-from collections import deque
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import matplotlib.pyplot as plt
 
 # Importa le classi dal tuo progetto
 from RobberAgent import RobberAgent
-from guard import MinimaxGuardAI, GameState, Position
+from guard import MinimaxGuardAI, Position
+from mappa import genera_mappa
+from simulatore import Partita
+from replay import ScrittoreReplay
+from statistiche import COLONNE
+from risultati import apri_scrittore, carica_colonne, percorso_risultati
 
 # --- CONFIGURAZIONE TEST ---
 NUMERO_PARTITE = 1000
 MAX_TURNI = 200
 GRID_SIZE = 20
 NOME_FILE_CSV = 'risultati_A_STAR.csv'
+FORMATO_RISULTATI = "csv"  # "colonne" = cartella risultati_A_STAR/ con un blocco .npy per colonna
+BUDGET_GUARDIE_MS = None  # Es. 50: le guardie approfondiscono finché c'è tempo (None = max_depth fisso)
+PROTETTE = [(0, 0), (0, 1), (1, 0), (19, 19), (10, 5), (5, 10)]  # Celle di spawn sempre libere (riga, colonna)
+NUM_PROCESSI = os.cpu_count()  # Processi che giocano le partite in parallelo (1 = sequenziale)
+STATISTICHE = False  # True = colonne extra con nodi, tagli, profondità e tempi di pianificazione
+SEED_BASE = 2026  # Ogni partita ricava il suo seme da (SEED_BASE, ID): risultati uguali con qualsiasi NUM_PROCESSI
+RIPRENDI = False  # True = continua la campagna salvata (solo con la stessa configurazione)
+FILE_REPLAY = None  # Es. 'replay_A_STAR.bin': salva ogni partita per rivederla con main.py --replay
 
 
 # --- FUNZIONI DI UTILITÀ ---
 
-def check_path_exists(griglia, start_pos, end_pos):
-    """BFS per verificare che la mappa sia risolvibile"""
-    rows = len(griglia)
-    cols = len(griglia[0])
-    queue = deque([start_pos])
-    visited = set()
-    visited.add(start_pos)
-
-    while queue:
-        r, c = queue.popleft()
-        if (r, c) == end_pos: return True
-
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nr, nc = r + dr, c + dc
-            if (0 <= nr < rows and 0 <= nc < cols and
-                    griglia[nr][nc] != 1 and (nr, nc) not in visited):
-                visited.add((nr, nc))
-                queue.append((nr, nc))
-    return False
-
-
-def genera_mappa_valida():
-    """Genera mappe finché non ne trova una con un percorso valido"""
-    while True:
-        griglia = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                # Protezione spawn
-                if (row, col) in [(0, 0), (0, 1), (1, 0), (19, 19), (10, 5), (5, 10)]:
-                    continue
-                # 25% Muri
-                if random.random() < 0.25:
-                    griglia[row][col] = 1
-
-        if check_path_exists(griglia, (0, 0), (19, 19)):
-            return griglia
+def genera_mappa_valida(rng=None):
+    """Mappa 25% muri con percorso garantito, presa da un lotto generato in blocco"""
+    return genera_mappa(GRID_SIZE, 0.25, PROTETTE, (0, 0), (19, 19), rng=rng)
 
 
 # --- MOTORE DI SIMULAZIONE ---
 
-def esegui_simulazione():
-    print(f"🚀 AVVIO SIMULAZIONE: {NUMERO_PARTITE} partite in corso...")
-    risultati = []
-
-    for i in range(NUMERO_PARTITE):
-        griglia = genera_mappa_valida()
-        ladro = RobberAgent((0, 0), (19, 19))
-        guard_ai = MinimaxGuardAI(max_depth=2)
-        g1_pos = Position(10, 5)
-        g2_pos = Position(5, 10)
-
-        mosse_ladro = 0
-        stato_finale = "PAREGGIO"
-
-        for turno in range(MAX_TURNI):
-            # 1. Turno Ladro
-            old_pos = ladro.pos
-            ladro.pianifica_mossa(griglia, [(g1_pos.x, g1_pos.y), (g2_pos.x, g2_pos.y)])
-            if ladro.pos != old_pos:
-                mosse_ladro += 1
-
-            if ladro.pos == (19, 19):
-                stato_finale = "VITTORIA"
-                break
-
-            # Check Cattura Immediata
-            if (abs(ladro.pos[0] - g1_pos.x) + abs(ladro.pos[1] - g1_pos.y) <= 1 or
-                    abs(ladro.pos[0] - g2_pos.x) + abs(ladro.pos[1] - g2_pos.y) <= 1):
-                stato_finale = "CATTURATO"
-                break
-
-            # 2. Turno Guardie
-            stato = GameState(griglia, g1_pos, g2_pos, Position(*ladro.pos), False)
-            g1_pos, g2_pos = guard_ai.get_best_moves(stato)
-
-            # Check Cattura Finale
-            if (abs(ladro.pos[0] - g1_pos.x) + abs(ladro.pos[1] - g1_pos.y) <= 1 or
-                    abs(ladro.pos[0] - g2_pos.x) + abs(ladro.pos[1] - g2_pos.y) <= 1):
-                stato_finale = "CATTURATO"
-                break
-
-        risultati.append([i + 1, stato_finale, mosse_ladro])
-        if (i + 1) % 20 == 0:
-            print(f"   ...completate {i + 1}/{NUMERO_PARTITE} partite.")
-
-    # Salvataggio dati
-    with open(NOME_FILE_CSV, 'w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["ID_Partita", "Risultato", "Mosse_Impiegate"])
-        writer.writerows(risultati)
-
-    print(f"✅ Dati salvati in '{NOME_FILE_CSV}'")
+def gioca_partita(id_partita):
+    """
+    Gioca una partita completa; mappa e guardie dipendono solo dal seme della partita.
+    Restituisce la riga dei risultati e, se FILE_REPLAY è impostato, il replay in byte.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence([SEED_BASE, id_partita]))
+    griglia = genera_mappa_valida(rng)
+    ladro = RobberAgent((0, 0), (19, 19))
+    guard_ai = MinimaxGuardAI(max_depth=2, seed=int(rng.integers(2 ** 63)))
+    partita = Partita(griglia, ladro, guard_ai, Position(10, 5), Position(5, 10),
+                      max_turni=MAX_TURNI, budget_ms=BUDGET_GUARDIE_MS, statistiche=STATISTICHE,
+                      registra=FILE_REPLAY is not None, id_partita=id_partita)
+    risultato = partita.gioca()
+    riga = [id_partita, risultato.esito, risultato.mosse_ladro]
+    if STATISTICHE:
+        riga += [risultato.statistiche[c] for c in COLONNE]
+    # In byte: tra i processi viaggiano poche centinaia di byte invece dell'oggetto
+    return riga, risultato.replay.in_byte() if risultato.replay is not None else None
+
+
+def _blocchi(inizio, fine, dimensione):
+    for primo in range(inizio, fine + 1, dimensione):
+        yield range(primo, min(primo + dimensione, fine + 1))
+
+
+def esegui_simulazione(num_processi=NUM_PROCESSI, riprendi=RIPRENDI):
+    intestazione = ["ID_Partita", "Risultato", "Mosse_Impiegate"] + (COLONNE if STATISTICHE else [])
+    # I risultati vanno su disco man mano; con riprendi si continua dall'ultima partita salvata
+    # (i semi per partita rendono identiche le partite rigiocate dopo un'interruzione)
+    configurazione = {"Ladro": "A_STAR", "Grid_Size": GRID_SIZE, "Max_Turni": MAX_TURNI,
+                      "Budget_Guardie_ms": BUDGET_GUARDIE_MS, "Seed_Base": SEED_BASE}
+    with apri_scrittore(NOME_FILE_CSV, intestazione, FORMATO_RISULTATI, riprendi, configurazione) as scrittore:
+        primo = scrittore.ultimo_id + 1
+        if primo > NUMERO_PARTITE:
+            print(f"✅ Tutte le {NUMERO_PARTITE} partite sono già in '{scrittore.percorso}'")
+            return
+        if primo > 1:
+            print(f"↩️  Ripresa da partita {primo}: {primo - 1} già salvate in '{scrittore.percorso}'")
+        print(f"🚀 AVVIO SIMULAZIONE: {NUMERO_PARTITE - primo + 1} partite in corso...")
+
+        # map restituisce i risultati in ordine di ID, qualunque processo li abbia giocati;
+        # le partite vengono inviate a blocchi per non tenere in memoria tutta la campagna
+        esecutore = ProcessPoolExecutor(max_workers=num_processi) if num_processi != 1 else None
+        # I replay oltre l'ultima partita salvata verranno rigiocati: il file viene troncato lì
+        replay = ScrittoreReplay(FILE_REPLAY, riprendi, fino_a=primo - 1) if FILE_REPLAY else None
+        try:
+            for blocco in _blocchi(primo, NUMERO_PARTITE, 64 * (num_processi or os.cpu_count())):
+                if esecutore is None:
+                    partite = map(gioca_partita, blocco)
+                else:
+                    partite = esecutore.map(gioca_partita, blocco, chunksize=8)
+                for riga, dati_replay in partite:
+                    if replay is not None:
+                        replay.scrivi(dati_replay)
+                    scrittore.scrivi(riga)
+                    if riga[0] % 20 == 0:
+                        print(f"   ...completate {riga[0]}/{NUMERO_PARTITE} partite.")
+        finally:
+            if esecutore is not None:
+                esecutore.shutdown()
+            if replay is not None:
+                replay.chiudi()
+
+    print(f"✅ Dati salvati in '{scrittore.percorso}'")
 
 
 # --- MOTORE GRAFICO ---
 
 def genera_grafici():
     print("📊 Generazione grafici in corso...")
-    try:
-        df = pd.read_csv(NOME_FILE_CSV)
-    except FileNotFoundError:
+    percorso = percorso_risultati(NOME_FILE_CSV, FORMATO_RISULTATI)
+    if percorso is None:
         print("Errore: File CSV non trovato.")
         return
+    # Solo le due colonne che servono ai grafici
+    dati = carica_colonne(percorso, ["Risultato", "Mosse_Impiegate"])
+    esiti, mosse = dati["Risultato"], dati["Mosse_Impiegate"]
 
     # Setup Grafico
     plt.style.use('ggplot')
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
-    fig.suptitle(f'Analisi Prestazioni Ladro (A*) su {len(df)} Partite', fontsize=18)
+    fig.suptitle(f'Analisi Prestazioni Ladro (A*) su {len(esiti)} Partite', fontsize=18)
 
-    # GRAFICO 1: Torta (Percentuali)
-    counts = df['Risultato'].value_counts()
+    # GRAFICO 1: Torta (Percentuali), esiti dal più frequente
+    labels, counts = np.unique(esiti, return_counts=True)
+    ordine = np.argsort(-counts, kind="stable")
+    labels, counts = labels[ordine], counts[ordine]
     colors = {'VITTORIA': '#4CAF50', 'CATTURATO': '#F44336', 'PAREGGIO': 'grey'}
-    col_list = [colors.get(x, 'blue') for x in counts.index]
+    col_list = [colors.get(x, 'blue') for x in labels]
 
-    ax1.pie(counts, labels=counts.index, autopct='%1.1f%%', startangle=90,
+    ax1.pie(counts, labels=labels, autopct='%1.1f%%', startangle=90,
             colors=col_list, explode=[0.05] * len(counts), textprops={'fontsize': 12})
     ax1.set_title('Tasso di Successo', fontsize=14)
 
     # GRAFICO 2: Istogramma (Mosse)
-    wins = df[df['Risultato'] == 'VITTORIA']
-    if not wins.empty:
-        media = wins['Mosse_Impiegate'].mean()
-        ax2.hist(wins['Mosse_Impiegate'], bins=15, color='#2196F3', edgecolor='black', alpha=0.7)
+    wins = mosse[esiti == 'VITTORIA']
+    if len(wins):
+        media = wins.mean()
+        ax2.hist(wins, bins=15, color='#2196F3', edgecolor='black', alpha=0.7)
         ax2.axvline(media, color='red', linestyle='dashed', linewidth=2, label=f'Media: {media:.1f} mosse')
         ax2.set_title('Distribuzione Mosse (Solo Vittorie)', fontsize=14)
         ax2.set_xlabel('Numero di Mosse')
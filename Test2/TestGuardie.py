@@ -1,6 +1,4 @@
 import csv
-import random
-from collections import deque
 import pandas as pd
 import matplotlib.pyplot as plt
 
@@ -8,6 +6,8 @@ import matplotlib.pyplot as plt
 from RobberAgent1 import RobberAgent
 from guard1 import MinimaxGuardAI, GameState, Position  # La tua AI originale
 from DummyGuards import RandomGuardAI, GreedyGuardAI  # Le AI stupide
+import mappa
+from simulatore import Partita, CATTURATO
 
 # --- CONFIGURAZIONE ---
 NUM_PARTITE = 100
@@ -15,28 +15,8 @@ MAX_TURNI = 200
 GRID_SIZE = 20
 
 
-def check_path_exists(griglia, start, end):
-    q = deque([start])
-    visited = {start}
-    while q:
-        r, c = q.popleft()
-        if (r, c) == end: return True
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nr, nc = r + dr, c + dc
-            if 0 <= nr < 20 and 0 <= nc < 20 and griglia[nr][nc] != 1 and (nr, nc) not in visited:
-                visited.add((nr, nc))
-                q.append((nr, nc))
-    return False
-
-
 def genera_mappa():
-    while True:
-        g = [[0] * 20 for _ in range(20)]
-        for r in range(20):
-            for c in range(20):
-                if random.random() < 0.25 and (r, c) not in [(0, 0), (19, 19), (10, 5), (5, 10)]:
-                    g[r][c] = 1
-        if check_path_exists(g, (0, 0), (19, 19)): return g
+    return mappa.genera_mappa(GRID_SIZE, 0.25, [(0, 0), (19, 19), (10, 5), (5, 10)], (0, 0), (19, 19))
 
 
 def esegui_test(tipo_guardia):
@@ -58,39 +38,14 @@ def esegui_test(tipo_guardia):
         else:
             ai = MinimaxGuardAI(max_depth=2)  # La tua AI forte
 
-        g1 = Position(10, 5)
-        g2 = Position(5, 10)
-
-        esito = "VITTORIA"  # Ottimismo per il ladro
-
-        for _ in range(MAX_TURNI):
-            # 1. Mossa Ladro
-            ladro.pianifica_mossa(griglia, [(g1.x, g1.y), (g2.x, g2.y)])
-            if ladro.pos == (19, 19): break  # Vittoria Ladro
-
-            # Check Cattura
-            if (abs(ladro.pos[0] - g1.x) + abs(ladro.pos[1] - g1.y) <= 1 or
-                    abs(ladro.pos[0] - g2.x) + abs(ladro.pos[1] - g2.y) <= 1):
-                esito = "CATTURATO"
-                break
-
-            # 2. Mossa Guardie
-            # Creiamo lo stato per l'AI
-            # Nota: Minimax vuole GameState, le altre AI si adattano
-            # Il ladro è visibile solo se vicino (simulazione sensori)
-            dist_g1 = abs(ladro.pos[0] - g1.x) + abs(ladro.pos[1] - g1.y)
-            dist_g2 = abs(ladro.pos[0] - g2.x) + abs(ladro.pos[1] - g2.y)
-            visible_robber = Position(*ladro.pos) if (dist_g1 <= 4 or dist_g2 <= 4) else None
-
-            state = GameState(griglia, g1, g2, visible_robber)
-            g1, g2 = ai.get_best_moves(state)
-
-            # Check Cattura dopo mossa guardie
-            if (abs(ladro.pos[0] - g1.x) + abs(ladro.pos[1] - g1.y) <= 1 or
-                    abs(ladro.pos[0] - g2.x) + abs(ladro.pos[1] - g2.y) <= 1):
-                esito = "CATTURATO"
-                break
+        # Nota: Minimax vuole GameState, le altre AI si adattano
+        # Il ladro è visibile solo se vicino (simulazione sensori, raggio 4)
+        partita = Partita(griglia, ladro, ai, Position(10, 5), Position(5, 10), max_turni=MAX_TURNI,
+                          raggio_visivo=4, classe_stato=GameState, classe_posizione=Position)
+        risultato = partita.gioca()
 
+        # Ottimismo per il ladro: anche il pareggio conta come vittoria
+        esito = "CATTURATO" if risultato.esito == CATTURATO else "VITTORIA"
         risultati.append(esito)
         if esito == "CATTURATO": catture += 1
 
@@ -1,8 +1,8 @@
-import random
 import matplotlib.pyplot as plt
-from collections import deque
 from RobberAgent3 import RobberAgent
 from guard3 import MinimaxGuardAI, GameState, Position
+from mappa import genera_mappa
+from simulatore import Partita, VITTORIA, CATTURATO
 
 # --- CONFIGURAZIONE ---
 NUM_PARTITE = 100
@@ -10,39 +10,18 @@ MAX_TURNI = 300  # Aumentiamo i turni perché le mappe grandi richiedono più te
 DIMENSIONI_DA_TESTARE = [15, 20, 25]
 
 
-def check_path_exists(griglia, start_pos, end_pos, size):
-    queue = deque([start_pos])
-    visited = {start_pos}
-    while queue:
-        r, c = queue.popleft()
-        if (r, c) == end_pos: return True
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nr, nc = r + dr, c + dc
-            if 0 <= nr < size and 0 <= nc < size and griglia[nr][nc] != 1 and (nr, nc) not in visited:
-                visited.add((nr, nc))
-                queue.append((nr, nc))
-    return False
-
-
 def genera_mappa_variabile(size):
-    while True:
-        griglia = [[0 for _ in range(size)] for _ in range(size)]
-        # Coordinate critiche da tenere libere
-        start = (0, 0)
-        end = (size - 1, size - 1)
-        # Posizioniamo le guardie in punti proporzionali
-        g1_pos = (size // 2, size // 4)
-        g2_pos = (size // 4, size // 2)
-
-        safe_zones = [start, end, g1_pos, g2_pos]
+    # Coordinate critiche da tenere libere
+    start = (0, 0)
+    end = (size - 1, size - 1)
+    # Posizioniamo le guardie in punti proporzionali
+    g1_pos = (size // 2, size // 4)
+    g2_pos = (size // 4, size // 2)
 
-        for row in range(size):
-            for col in range(size):
-                if random.random() < 0.25 and (col, row) not in safe_zones:
-                    griglia[row][col] = 1
-
-        if check_path_exists(griglia, start, end, size):
-            return griglia, start, end, g1_pos, g2_pos
+    # safe_zones sono in (x, y): genera_mappa vuole (riga, colonna)
+    safe_zones = [(c, r) for r, c in [start, end, g1_pos, g2_pos]]
+    griglia = genera_mappa(size, 0.25, safe_zones, start, end)
+    return griglia, start, end, g1_pos, g2_pos
 
 
 def esegui_test_grid():
@@ -63,36 +42,13 @@ def esegui_test_grid():
             # Le guardie usano la vista standard (R=4)
             guard_ai = MinimaxGuardAI(max_depth=2, visual_range=4)
 
-            g1 = Position(*pos_g1)
-            g2 = Position(*pos_g2)
-
-            for _ in range(MAX_TURNI):
-                # 1. Ladro
-                ladro.pianifica_mossa(griglia, [(g1.x, g1.y), (g2.x, g2.y)])
-
-                if ladro.pos == end:
-                    vittorie_ladro += 1
-                    break
-
-                # Check Cattura Immediata
-                if (abs(ladro.pos[0] - g1.x) + abs(ladro.pos[1] - g1.y) <= 1 or
-                        abs(ladro.pos[0] - g2.x) + abs(ladro.pos[1] - g2.y) <= 1):
-                    catture += 1
-                    break
-
-                # 2. Guardie
-                dist_g1 = abs(ladro.pos[0] - g1.x) + abs(ladro.pos[1] - g1.y)
-                dist_g2 = abs(ladro.pos[0] - g2.x) + abs(ladro.pos[1] - g2.y)
-
-                visible_robber = Position(*ladro.pos) if (dist_g1 <= 4 or dist_g2 <= 4) else None
-
-                state = GameState(griglia, g1, g2, visible_robber)
-                g1, g2 = guard_ai.get_best_moves(state)
-
-                if (abs(ladro.pos[0] - g1.x) + abs(ladro.pos[1] - g1.y) <= 1 or
-                        abs(ladro.pos[0] - g2.x) + abs(ladro.pos[1] - g2.y) <= 1):
-                    catture += 1
-                    break
+            partita = Partita(griglia, ladro, guard_ai, Position(*pos_g1), Position(*pos_g2), obiettivo=end,
+                              max_turni=MAX_TURNI, raggio_visivo=4, classe_stato=GameState, classe_posizione=Position)
+            esito = partita.gioca().esito
+            if esito == VITTORIA:
+                vittorie_ladro += 1
+            elif esito == CATTURATO:
+                catture += 1
 
         tasso_cattura = (catture / NUM_PARTITE) * 100
         risultati.append(tasso_cattura)
@@ -0,0 +1,280 @@
+"""
+Benchmark dei punti caldi della pianificazione su un corpus fisso di mappe seedate.
+
+    python benchmark.py              # confronta con la baseline (la crea se non c'è)
+    python benchmark.py --salva      # sovrascrive la baseline con i risultati attuali
+
+Per ogni caso riporta tempo per chiamata (mediana), nodi espansi e picco di memoria
+(tracemalloc, misurato in un passaggio separato per non falsare i tempi).
+Esce con codice 1 se un caso è più lento della baseline oltre la soglia.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
+from RobberAgent import RobberAgent
+from Test1.RobberAgentGreedy import RobberAgent as GreedyAgent
+from guard import MinimaxGuardAI, GameState, Position
+from mcts import MCTSGuardAI
+from mappa import Mappa, genera_mappa, genera_mappe, ottieni_mappa, IRRAGGIUNGIBILE
+from statistiche import ContatoriRicerca
+
+DIMENSIONI = [15, 20, 25, 50, 100]
+PROFONDITA = [1, 2, 3]
+SQUADRE = [4, 8]  # Guardie per squadra nei casi a risposte migliori
+ITERAZIONI_MCTS = [100, 500]
+MAPPE_PER_DIMENSIONE = 3
+SEED_CORPUS = 2026
+FILE_BASELINE = "benchmark_baseline.json"
+SOGLIA = 0.25  # +25% di tempo rispetto alla baseline = regressione
+
+
+def corpus(size):
+    """Mappe fisse per dimensione, con spawn e guardie nelle posizioni proporzionali di TestGridSize."""
+    g1, g2 = (size // 2, size // 4), (size // 4, size // 2)
+    protette = [(0, 0), (size - 1, size - 1), (g1[1], g1[0]), (g2[1], g2[0])]
+    mappe = []
+    for k in range(MAPPE_PER_DIMENSIONE):
+        rng = np.random.default_rng([SEED_CORPUS, size, k])
+        mappe.append(genera_mappa(size, 0.25, protette, (0, 0), (size - 1, size - 1), rng=rng))
+    return mappe, g1, g2
+
+
+# --- CASI: ognuno prepara lo stato e restituisce una chiamata che dà i nodi espansi ---
+# (oppure la coppia (prepara, chiamata): prepara gira prima di ogni chiamata, fuori dal tempo)
+
+def caso_a_star(griglia, size, g1, g2):
+    def chiamata():
+        ladro = RobberAgent((0, 0), (size - 1, size - 1), grid_size=size)
+        ladro.contatori = ContatoriRicerca()
+        ladro.a_star(griglia, [g1, g2])
+        return ladro.contatori.nodi_espansi
+    return chiamata
+
+
+def caso_hpa(griglia, size, g1, g2):
+    # Il grafo astratto si costruisce una volta per mappa (nel riscaldamento): qui si misura il turno
+    def chiamata():
+        ladro = RobberAgent((0, 0), (size - 1, size - 1), pianificatore="hpa_star", grid_size=size)
+        ladro.contatori = ContatoriRicerca()
+        ladro.hpa.prossimo_passo(griglia, [g1, g2])
+        return ladro.contatori.nodi_espansi
+    return chiamata
+
+
+def caso_jps(griglia, size, g1, g2):
+    def chiamata():
+        ladro = RobberAgent((0, 0), (size - 1, size - 1), pianificatore="jps", grid_size=size)
+        ladro.contatori = ContatoriRicerca()
+        ladro.jps.prossimo_passo(griglia, [g1, g2])
+        return ladro.contatori.nodi_espansi
+    return chiamata
+
+
+def caso_dstar(griglia, size, g1, g2):
+    # D* Lite vale per i turni dopo il primo: prepara fa la ricerca completa del primo turno,
+    # poi il ladro avanza di un passo e G1 di una cella; si misura la riparazione del secondo
+    vicina = ottieni_mappa(griglia).vicini_xy[g1][0]
+    ladro = None
+
+    def prepara():
+        nonlocal ladro
+        ladro = RobberAgent((0, 0), (size - 1, size - 1), pianificatore="dstar_lite", grid_size=size)
+        ladro.esegui_passo(ladro.dstar.prossimo_passo(griglia, [g1, g2]))
+        ladro.contatori = ContatoriRicerca()
+
+    def chiamata():
+        ladro.dstar.prossimo_passo(griglia, [vicina, g2])
+        return ladro.contatori.nodi_espansi
+    return prepara, chiamata
+
+
+def caso_greedy(griglia, size, g1, g2):
+    def chiamata():
+        ladro = GreedyAgent((0, 0), (size - 1, size - 1), grid_size=size)
+        ladro.contatori = ContatoriRicerca()
+        ladro.greedy_search(griglia, [g1, g2])
+        return ladro.contatori.nodi_espansi
+    return chiamata
+
+
+def ladro_visibile(griglia, size, g1, g2):
+    """Ladro libero il più lontano possibile da G1 ma ancora nel suo raggio visivo (4), muri compresi."""
+    mappa = ottieni_mappa(griglia)
+
+    def distanza(c, g):
+        return abs(c[0] - g[0]) + abs(c[1] - g[1])
+    candidati = [(x, y) for y in range(size) for x in range(size)
+                 if griglia[y][x] != 1 and 2 <= distanza((x, y), g1) <= 4 and distanza((x, y), g2) > 1
+                 and mappa.vede(g1[0], g1[1], x, y, 4)]
+    return Position(*max(candidati, key=lambda c: (distanza(c, g1), c[1], c[0])))
+
+
+def primo_turno(guard_ai, griglia, stato):
+    """
+    (prepara, chiamata) per una AI costruita una volta per mappa: prepara la riporta al primo
+    turno della partita (tabella vuota, niente killer né storia, stesso seme), chiamata misura
+    solo get_best_moves. Mappa, distanze e chiavi di Zobrist restano quelle del riscaldamento.
+    """
+    def prepara():
+        guard_ai.rng.seed(0)
+        guard_ai.last_known_pos = None
+        guard_ai.killer, guard_ai.storia = {}, {}
+        if guard_ai.tt is not None:
+            m = ottieni_mappa(griglia)
+            guard_ai.tt.svuota(m.larghezza, m.altezza)
+        guard_ai.griglia_tt = griglia
+
+    guard_ai.conta_nodi = True  # Senza, la ricerca senza scadenza non conta i nodi
+
+    def chiamata():
+        nodi = guard_ai.nodi
+        guard_ai.get_best_moves(stato)
+        return guard_ai.nodi - nodi
+    return prepara, chiamata
+
+
+def caso_minimax(profondita):
+    def caso(griglia, size, g1, g2):
+        ladro = ladro_visibile(griglia, size, g1, g2)
+        guard_ai = MinimaxGuardAI(max_depth=profondita, seed=0)
+        return primo_turno(guard_ai, griglia, GameState(griglia, Position(*g1), Position(*g2), ladro))
+    return caso
+
+
+def caso_squadra(k):
+    def caso(griglia, size, g1, g2):
+        # G1 e G2 come negli altri casi, le altre k - 2 guardie su celle libere seedate lontane dal ladro
+        ladro = ladro_visibile(griglia, size, g1, g2)
+        libere = [(x, y) for y in range(size) for x in range(size)
+                  if griglia[y][x] != 1 and (x, y) not in (g1, g2) and ladro.manhattan(Position(x, y)) > 2]
+        rng = np.random.default_rng([SEED_CORPUS, size, k])
+        altre = [Position(*libere[i]) for i in rng.choice(len(libere), k - 2, replace=False)]
+        squadra = [Position(*g1), Position(*g2)] + altre
+        guard_ai = MinimaxGuardAI(max_depth=2, seed=0)
+        return primo_turno(guard_ai, griglia, GameState(griglia, squadra[0], squadra[1], ladro, guardie=squadra))
+    return caso
+
+
+def caso_mcts(iterazioni):
+    def caso(griglia, size, g1, g2):
+        ladro = ladro_visibile(griglia, size, g1, g2)
+        guard_ai = MCTSGuardAI(iterazioni=iterazioni, seed=0)
+        return primo_turno(guard_ai, griglia, GameState(griglia, Position(*g1), Position(*g2), ladro))
+    return caso
+
+
+def caso_validazione(griglia, size, g1, g2):
+    # Quello che faceva check_path_exists: BFS dalla partenza su una Mappa nuova
+    def chiamata():
+        mappa = Mappa(griglia)
+        riga = mappa.distanze_da(0)
+        return int((np.asarray(riga) != IRRAGGIUNGIBILE).sum())
+    return chiamata
+
+
+def caso_genera_lotto(griglia, size, g1, g2):
+    def chiamata():
+        return len(genera_mappe(256, size, np.random.default_rng(SEED_CORPUS), 0.25))
+    return chiamata
+
+
+CASI = {
+    "a_star": caso_a_star,
+    "hpa_star": caso_hpa,
+    "jps": caso_jps,
+    "dstar_lite": caso_dstar,
+    "greedy_search": caso_greedy,
+    **{f"minimax_d{p}": caso_minimax(p) for p in PROFONDITA},
+    **{f"squadra_k{k}": caso_squadra(k) for k in SQUADRE},
+    **{f"mcts_i{i}": caso_mcts(i) for i in ITERAZIONI_MCTS},
+    "validazione_mappa": caso_validazione,
+    "genera_mappe_256": caso_genera_lotto,
+}
+
+
+# --- MISURA ---
+
+def misura(chiamate, ripetizioni):
+    """Tempo mediano per chiamata (ms), nodi totali e picco di memoria (KiB) su tutte le mappe."""
+    tempi, nodi, picco = [], 0, 0
+    # Una mappa alla volta, come in partita: la Mappa in cache resta la stessa tra le ripetizioni
+    for caso in chiamate:
+        prepara, chiamata = caso if isinstance(caso, tuple) else (lambda: None, caso)
+        prepara()
+        nodi += chiamata()  # Riscaldamento: costruzione della Mappa, import pigri
+        for _ in range(ripetizioni):
+            prepara()
+            t0 = time.perf_counter()
+            chiamata()
+            tempi.append((time.perf_counter() - t0) * 1000)
+
+        prepara()
+        tracemalloc.start()
+        chiamata()
+        picco = max(picco, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {"ms": round(statistics.median(tempi), 4), "nodi": nodi, "picco_kib": round(picco / 1024, 1)}
+
+
+def esegui(casi, dimensioni, ripetizioni):
+    risultati = {}
+    for size in dimensioni:
+        mappe, g1, g2 = corpus(size)
+        for nome in casi:
+            chiamate = [CASI[nome](griglia, size, g1, g2) for griglia in mappe]
+            chiave = f"{nome}/{size}"
+            risultati[chiave] = misura(chiamate, ripetizioni)
+            r = risultati[chiave]
+            print(f"{chiave:<28} {r['ms']:>10.3f} ms {r['nodi']:>10} nodi {r['picco_kib']:>10.1f} KiB")
+    return risultati
+
+
+def confronta(risultati, baseline, soglia):
+    """Stampa le differenze rispetto alla baseline e restituisce i casi in regressione."""
+    regressioni = []
+    for chiave, r in risultati.items():
+        base = baseline.get(chiave)
+        if base is None:
+            continue
+        rapporto = r["ms"] / base["ms"] if base["ms"] else 1.0
+        note = []
+        if rapporto > 1 + soglia:
+            regressioni.append(chiave)
+            note.append("REGRESSIONE")
+        if r["nodi"] != base["nodi"]:
+            note.append(f"nodi {base['nodi']} -> {r['nodi']}")
+        print(f"{chiave:<28} x{rapporto:>6.2f} {' '.join(note)}")
+    return regressioni
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--salva", action="store_true", help="scrive i risultati come nuova baseline")
+    parser.add_argument("--baseline", default=FILE_BASELINE)
+    parser.add_argument("--soglia", type=float, default=SOGLIA)
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--casi", nargs="+", default=list(CASI), choices=list(CASI))
+    parser.add_argument("--dimensioni", nargs="+", type=int, default=DIMENSIONI)
+    args = parser.parse_args()
+
+    risultati = esegui(args.casi, args.dimensioni, args.ripetizioni)
+
+    if args.salva or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(risultati, f, indent=2, sort_keys=True)
+        print(f"\nBaseline salvata in '{args.baseline}'")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nConfronto con '{args.baseline}' (soglia +{args.soglia:.0%}):")
+        regressioni = confronta(risultati, baseline, args.soglia)
+        if regressioni:
+            print(f"\n{len(regressioni)} regressioni: {', '.join(regressioni)}")
+            raise SystemExit(1)
+        print("\nNessuna regressione.")
@@ -0,0 +1,151 @@
+import heapq
+
+import numpy as np
+
+from mappa import ottieni_mappa
+
+INF = float("inf")
+
+
+class PianificatoreDStarLite:
+    """
+    Pianificatore incrementale D* Lite per il ladro.
+    La ricerca parte dalla cassaforte e va all'indietro verso il ladro, così quando
+    il ladro avanza di un passo l'albero di ricerca resta valido: a ogni turno si
+    riparano solo i nodi toccati dalle guardie visibili o dalle penalità cambiate.
+    Le penalità dell'euristica (storico, heat map, guardie) diventano costi d'ingresso
+    nelle celle: c(u, v) = 1 + penalita(v).
+    """
+
+    def __init__(self, agente):
+        self.agente = agente
+        self.mappa = None
+        self.push = heapq.heappush
+
+    def _reset(self, mappa):
+        self.mappa = mappa
+        self.g = {}
+        self.rhs = {}
+        self.coda = []
+        self.chiavi = {}  # Chiave valida per ogni nodo in coda (le altre voci dell'heap sono scadute)
+        self.km = 0
+        self.ultimo = self.agente.pos
+        self.costi = np.zeros(mappa.n_celle, dtype=np.int64)  # Penalità correnti per cella
+        self.costi_lista = self.costi.tolist()  # Stesse penalità, per le letture scalari
+        self.bloccate = set()  # Guardie visibili al turno precedente
+        goal = self.agente.endPos
+        self.rhs[goal] = 0
+        self._inserisci(goal)
+
+    # --- FUNZIONI DI SUPPORTO ---
+
+    def _h(self, a, b):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    def _vicini(self, pos):
+        # Stesso ordine di RobberAgent.get_neighbors: NORD, SUD, EST, OVEST
+        return self.mappa.vicini_xy[pos]
+
+    def _costo(self, v):
+        # Costo per entrare nella cella v
+        if v in self.bloccate:
+            return INF
+        return 1 + self.costi_lista[v[1] * self.mappa.larghezza + v[0]]
+
+    def _chiave(self, s):
+        m = min(self.g.get(s, INF), self.rhs.get(s, INF))
+        return (m + self._h(self.agente.pos, s) + self.km, m)
+
+    def _inserisci(self, s):
+        chiave = self._chiave(s)
+        self.chiavi[s] = chiave
+        self.push(self.coda, (chiave, s))
+
+    def _top(self):
+        # Scarta le voci scadute in cima all'heap
+        while self.coda:
+            chiave, s = self.coda[0]
+            if self.chiavi.get(s) == chiave:
+                return chiave, s
+            heapq.heappop(self.coda)
+        return (INF, INF), None
+
+    def _aggiorna_vertice(self, u):
+        if u != self.agente.endPos:
+            self.rhs[u] = min((self._costo(s) + self.g.get(s, INF) for s in self._vicini(u)), default=INF)
+        self.chiavi.pop(u, None)
+        if self.g.get(u, INF) != self.rhs.get(u, INF):
+            self._inserisci(u)
+
+    def _calcola_percorso(self):
+        start = self.agente.pos
+        contatori = self.agente.contatori
+        while True:
+            chiave_top, u = self._top()
+            if u is None:
+                break
+            if chiave_top >= self._chiave(start) and self.rhs.get(start, INF) == self.g.get(start, INF):
+                break
+
+            nuova_chiave = self._chiave(u)
+            if chiave_top < nuova_chiave:
+                self._inserisci(u)
+            elif self.g.get(u, INF) > self.rhs.get(u, INF):
+                if contatori is not None:
+                    contatori.nodi_espansi += 1
+                del self.chiavi[u]
+                self.g[u] = self.rhs[u]
+                for s in self._vicini(u):
+                    self._aggiorna_vertice(s)
+            else:
+                if contatori is not None:
+                    contatori.nodi_espansi += 1
+                del self.chiavi[u]
+                self.g[u] = INF
+                self._aggiorna_vertice(u)
+                for s in self._vicini(u):
+                    self._aggiorna_vertice(s)
+
+    # --- INTERFACCIA ---
+
+    def prossimo_passo(self, griglia, guardie_visibili):
+        """Ripara la ricerca e restituisce la prossima cella, oppure None se la cassaforte è irraggiungibile."""
+        mappa = ottieni_mappa(griglia)
+        if mappa is not self.mappa:
+            self._reset(mappa)
+
+        # Con i contatori attivi gli inserimenti in coda passano da loro, altrimenti da heapq
+        contatori = self.agente.contatori
+        self.push = heapq.heappush if contatori is None else contatori.push
+
+        start = self.agente.pos
+        self.km += self._h(self.ultimo, start)
+        self.ultimo = start
+
+        # 1. Nuove penalità (campo vettoriale dell'agente) e nuove celle bloccate
+        nuovi_costi = self.agente.campo_penalita(mappa, guardie_visibili)
+        nuove_bloccate = set(guardie_visibili)
+
+        # 2. Celle il cui costo d'ingresso è cambiato dall'ultimo turno
+        cambiate = set(self.bloccate ^ nuove_bloccate)
+        for i in np.flatnonzero(nuovi_costi != self.costi).tolist():
+            cambiate.add(mappa.coordinate[i])
+        self.costi = nuovi_costi
+        self.costi_lista = nuovi_costi.tolist()
+        self.bloccate = nuove_bloccate
+
+        # 3. Riparo solo i predecessori delle celle cambiate
+        for v in cambiate:
+            for u in self._vicini(v):
+                self._aggiorna_vertice(u)
+        self._calcola_percorso()
+
+        if self.g.get(start, INF) == INF:
+            return None
+
+        migliore, costo_migliore = None, INF
+        for s in self._vicini(start):
+            costo = self._costo(s) + self.g.get(s, INF)
+            if costo < costo_migliore:
+                migliore, costo_migliore = s, costo
+        return migliore
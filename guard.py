@@ -1,7 +1,9 @@
 import random
+import time
 from dataclasses import dataclass
 from typing import List, Tuple, Optional
-import game_state
+
+from mappa import ottieni_mappa, IRRAGGIUNGIBILE
 
 @dataclass(frozen=True)
 class Position:
@@ -17,158 +19,691 @@ class Position:
 
 # 2. DEFINISCI POI GAMESTATE
 class GameState:
-    def __init__(self, grid, g1, g2, robber, prev_g1=None, prev_g2=None):
+    """
+    Stato visto dalle guardie. La squadra è la lista guardie (k posizioni, prev_guardie
+    quelle del turno prima); g1, g2, prev_g1 e prev_g2 restano come nomi delle prime due.
+    Con guardie=None la squadra è la coppia g1, g2 di sempre.
+    """
+
+    def __init__(self, grid, g1, g2, robber, prev_g1=None, prev_g2=None, guardie=None, prev_guardie=None):
         self.grid = grid
+        self.guardie = list(guardie) if guardie is not None else [g1, g2]
+        if prev_guardie is not None:
+            self.prev_guardie = list(prev_guardie)
+        else:
+            self.prev_guardie = ([prev_g1, prev_g2] + [None] * len(self.guardie))[:len(self.guardie)]
+        self.robber = robber
+
+    @property
+    def g1(self):
+        return self.guardie[0]
+
+    @g1.setter
+    def g1(self, pos):
+        self.guardie[0] = pos
+
+    @property
+    def g2(self):
+        return self.guardie[1]
+
+    @g2.setter
+    def g2(self, pos):
+        self.guardie[1] = pos
+
+    @property
+    def prev_g1(self):
+        return self.prev_guardie[0]
+
+    @prev_g1.setter
+    def prev_g1(self, pos):
+        self.prev_guardie[0] = pos
+
+    @property
+    def prev_g2(self):
+        return self.prev_guardie[1]
+
+    @prev_g2.setter
+    def prev_g2(self, pos):
+        self.prev_guardie[1] = pos
+
+
+# Limite di sicurezza per l'approfondimento iterativo a tempo
+PROFONDITA_MAX_ID = 32
+# Squadre di k != 2 guardie: giri massimi di risposte migliori per ricerca
+RONDE_SQUADRA = 3
+
+
+class TempoScaduto(Exception):
+    """Sollevata dentro minimax quando scade il budget del turno."""
+    pass
+
+
+# Tipo di valore salvato nella tabella di trasposizione
+ESATTO, INFERIORE, SUPERIORE = 0, 1, 2
+
+# Chiavi di Zobrist per (larghezza, altezza, seme): generate alla prima partita su quella
+# dimensione e condivise da tutte le tabelle del processo (sono solo numeri casuali fissi)
+_CHIAVI_ZOBRIST = {}
+
+
+def chiavi_zobrist(larghezza, altezza, seed=0):
+    """
+    (lato, zobrist): un numero casuale a 64 bit per la mossa alle guardie e uno per ogni
+    (pezzo, cella) della mappa; l'ultima voce di ogni pezzo vale 0 (cella -1 = posizione assente).
+    """
+    chiave = (larghezza, altezza, seed)
+    if chiave not in _CHIAVI_ZOBRIST:
+        rng = random.Random(seed)
+        lato = rng.getrandbits(64)
+        zobrist = [[rng.getrandbits(64) for _ in range(larghezza * altezza)] + [0] for _ in range(5)]
+        _CHIAVI_ZOBRIST[chiave] = (lato, zobrist)
+    return _CHIAVI_ZOBRIST[chiave]
+
+
+class TabellaTrasposizione:
+    """
+    Tabella di trasposizione a dimensione fissa, indicizzata con hash di Zobrist.
+    Ogni slot contiene (chiave, profondità, valore, tipo, mossa migliore, generazione).
+    Sostituzione: si sovrascrive se lo slot è vuoto, se contiene la stessa posizione,
+    se la voce viene da un turno precedente o se la nuova ricerca è almeno altrettanto profonda.
+    """
+
+    # Pezzi che compongono la chiave: guardie, ladro e posizioni precedenti delle guardie
+    G1, G2, LADRO, PREV_G1, PREV_G2 = range(5)
+
+    def __init__(self, dimensione=1 << 16, seed=0):
+        self.dimensione = dimensione
+        self.seed = seed
+        # Chiavi e slot arrivano con svuota, alla prima ricerca su una mappa
+        self.larghezza = None
+        self.lato = None  # Mossa alle guardie
+        self.zobrist = None
+        self.slot = None
+        self.generazione = 0
+
+    def svuota(self, larghezza, altezza):
+        # Tabella vuota con le chiavi di Zobrist della dimensione della mappa
+        self.larghezza = larghezza
+        self.lato, self.zobrist = chiavi_zobrist(larghezza, altezza, self.seed)
+        self.slot = [None] * self.dimensione
+        self.generazione = 0
+
+    def nuovo_turno(self):
+        self.generazione += 1
+
+    def pezzo(self, pezzo, pos):
+        if not pos:  # None (o False) = posizione assente
+            return 0
+        return self.zobrist[pezzo][pos.y * self.larghezza + pos.x]
+
+    def chiave(self, state, maximizing):
+        h = (self.pezzo(self.G1, state.g1) ^ self.pezzo(self.G2, state.g2) ^
+             self.pezzo(self.LADRO, state.robber) ^
+             self.pezzo(self.PREV_G1, state.prev_g1) ^ self.pezzo(self.PREV_G2, state.prev_g2))
+        return h ^ self.lato if maximizing else h
+
+    def chiave_celle(self, g1, g2, ladro, prev_g1, prev_g2, maximizing):
+        # Come chiave(), ma sulle celle intere usate dalla ricerca
+        z = self.zobrist
+        h = (z[self.G1][g1] ^ z[self.G2][g2] ^ z[self.LADRO][ladro] ^
+             z[self.PREV_G1][prev_g1] ^ z[self.PREV_G2][prev_g2])
+        return h ^ self.lato if maximizing else h
+
+    def cerca(self, chiave):
+        voce = self.slot[chiave % self.dimensione]
+        if voce is not None and voce[0] == chiave:
+            return voce
+        return None
+
+    def salva(self, chiave, profondita, valore, tipo, mossa):
+        i = chiave % self.dimensione
+        voce = self.slot[i]
+        if (voce is None or voce[0] == chiave or voce[5] != self.generazione
+                or profondita >= voce[1]):
+            self.slot[i] = (chiave, profondita, valore, tipo, mossa, self.generazione)
+
+
+class StatoRicerca:
+    """
+    Stato interno della ricerca: celle intere (y * larghezza + x, -1 = assente) e chiave Zobrist.
+    Un solo oggetto per ricerca, modificato in place con make/unmake.
+    """
+    __slots__ = ("g1", "g2", "ladro", "prev_g1", "prev_g2", "chiave")
+
+    def __init__(self, g1, g2, ladro, prev_g1=-1, prev_g2=-1, chiave=0):
         self.g1 = g1
         self.g2 = g2
-        self.robber = robber
+        self.ladro = ladro
         self.prev_g1 = prev_g1
         self.prev_g2 = prev_g2
+        self.chiave = chiave
 
 
 # 3. INFINE DEFINISCI LA CLASSE AI
 class MinimaxGuardAI:
-    def __init__(self, max_depth=2, visual_range = 4):
+    def __init__(self, max_depth=2, visual_range = 4, dimensione_tt=1 << 16, seed=None,
+                 distanze_labirinto=True):
         self.max_depth = max_depth
         self.visual_range = visual_range
         self.moves = [(0, 1), (0, -1), (1, 0), (-1, 0), (0, 0)]
         self.last_known_pos = None
+        # La tabella resta valida per tutta la partita (dimensione_tt=0 la disattiva)
+        self.tt = TabellaTrasposizione(dimensione_tt) if dimensione_tt else None
+        self.griglia_tt = None
+        # Modalità anytime: scadenza del turno corrente e profondità completata per turno
+        self.scadenza = None
+        # Nodi visitati e tagli alfa-beta: si contano solo con conta_nodi (statistiche, benchmark);
+        # la modalità anytime conta comunque i nodi, le servono per controllare il tempo
+        self.conta_nodi = False
+        self.contando = False
+        self.nodi = 0
+        self.tagli = 0
+        self.profondita_raggiunta = 0
+        self.profondita_per_turno = []
+        # Mosse dell'ultima profondità completata nella ricerca su stato_corrente (None finché non ce
+        # n'è una): chi gioca con una scadenza può usarle se get_best_moves non ha ancora finito
+        self.mossa_corrente = None
+        self.stato_corrente = None
+        # Ordinamento mosse: mossa della tabella, killer per ply, storia dei tagli.
+        # Il caso serve solo a rompere i pareggi ed è riproducibile con seed
+        self.rng = random.Random(seed)
+        self.killer = {}  # ply -> ultime 2 mosse che hanno causato un taglio
+        self.storia = {}  # (pezzo * n + da) * n + a -> punteggio accumulato nei tagli
+        self.profondita_radice = 0
+        # Stato della ricerca in corso: le mosse delle guardie sono codificate come g1 * n + g2
+        self.stato = None
+        # evaluate usa le distanze BFS della mappa invece di Manhattan
+        self.distanze_labirinto = distanze_labirinto
+        self.mappa = None
+        self.posizioni = []  # Position di ogni cella della mappa corrente, per indice
+
+    def _mappa(self, grid):
+        # grid può essere la griglia o la sua Mappa; la tabella delle Position segue la mappa
+        m = self.mappa
+        if m is None or (grid is not m and grid is not m.griglia):
+            m = self.mappa = ottieni_mappa(grid)
+            self.posizioni = [Position(x, y) for x, y in m.coordinate]
+        return m
+
+    def _cella(self, pos):
+        # Da Position a cella intera (-1 se assente)
+        if not pos:
+            return -1
+        return pos.y * self.mappa.larghezza + pos.x
+
+    def _stato_da(self, state, maximizing):
+        s = StatoRicerca(self._cella(state.g1), self._cella(state.g2), self._cella(state.robber),
+                         self._cella(state.prev_g1), self._cella(state.prev_g2))
+        if self.tt is not None:
+            s.chiave = self.tt.chiave_celle(s.g1, s.g2, s.ladro, s.prev_g1, s.prev_g2, maximizing)
+        return s
 
     def can_see(self, grid, g1, robber_pos):
-        if self.visual_range >= g1.manhattan(robber_pos) :
-            return True
-        else:
-            return g1.manhattan(robber_pos) <= self.visual_range
+        # Entro visual_range e senza muri in mezzo: un test di bit sull'indice di visibilità della mappa
+        return self._mappa(grid).vede(g1.x, g1.y, robber_pos.x, robber_pos.y, self.visual_range)
 
     def has_line_of_sight(self, grid, start: Position, end: Position):
-        curr_x, curr_y = start.x, start.y
-        target_x, target_y = end.x, end.y
-
-        dx = 1 if target_x > curr_x else -1 if target_x < curr_x else 0
-        dy = 1 if target_y > curr_y else -1 if target_y < curr_y else 0
-
-        temp_x, temp_y = curr_x, curr_y
-        while (temp_x != target_x or temp_y != target_y):
-            if temp_x != target_x:
-                temp_x += dx
-            if temp_y != target_y:
-                temp_y += dy
-
-            # Controllo se la cella corrente è un muro
-            if grid[temp_y][temp_x] == 1:
-                return False
-        return True
-
-
+        # Nel raggio visivo basta l'indice di visibilità, oltre si cammina lungo il raggio
+        m = self._mappa(grid)
+        if start.manhattan(end) <= self.visual_range:
+            return m.vede(start.x, start.y, end.x, end.y, self.visual_range)
+        return m.linea_di_vista(start.x, start.y, end.x, end.y)
 
     def valid(self, grid, x, y):
-        return 0 <= x < len(grid[0]) and 0 <= y < len(grid) and grid[y][x] != 1
+        return self._mappa(grid).libera(x, y)
 
     def get_moves(self, grid, pos, other_pos=None):
-        res = []
-        for dx, dy in self.moves:
-            nx, ny = pos.x + dx, pos.y + dy
-            if self.valid(grid, nx, ny):
-                new_pos = Position(nx, ny)
-                if other_pos is None or new_pos != other_pos:
-                    res.append(new_pos)
-        random.shuffle(res)
+        # Mosse precalcolate nella Mappa: NORD, SUD, EST, OVEST e ferma
+        m = self._mappa(grid)
+        posizioni = self.posizioni
+        res = [posizioni[j] for j in m.mosse[pos.y * m.larghezza + pos.x]]
+        if other_pos is not None and other_pos in res:
+            res.remove(other_pos)
         return res
 
+    def _ordina(self, punteggi, ply, mossa_tt):
+        # punteggi: lista di (storia, mossa). Prima la mossa della tabella, poi i killer
+        # del ply, poi la storia; i pareggi si rompono con il generatore seedato
+        killer = self.killer.get(ply, ())
+        rnd = self.rng.random
+        ordinate = []
+        for punteggio, m in punteggi:
+            if m == mossa_tt:
+                punteggio = 1 << 62
+            elif m in killer:
+                punteggio = 1 << (61 - killer.index(m))
+            ordinate.append((punteggio + rnd(), m))
+        ordinate.sort(reverse=True)
+        return [m for _, m in ordinate]
+
+    def _ordina_guardie(self, g1, g2, ply, mossa_tt):
+        # Coppie legali: G1 non entra nella cella di G2, G2 non entra nella nuova cella di G1
+        n = self.mappa.n_celle
+        mosse = self.mappa.mosse
+        storia = self.storia
+        base1, base2 = g1 * n, (n + g2) * n
+        punteggi = []
+        for a in mosse[g1]:
+            if a == g2:
+                continue
+            s1 = storia.get(base1 + a, 0)
+            for b in mosse[g2]:
+                if b != a:
+                    punteggi.append((s1 + storia.get(base2 + b, 0), a * n + b))
+        return self._ordina(punteggi, ply, mossa_tt)
+
+    def _ordina_ladro(self, r, ply, mossa_tt):
+        n = self.mappa.n_celle
+        storia = self.storia
+        base = (2 * n + r) * n
+        return self._ordina([(storia.get(base + c, 0), c) for c in self.mappa.mosse[r]], ply, mossa_tt)
+
+    def _registra_taglio(self, ply, mossa, depth, chiavi_storia):
+        if self.conta_nodi:
+            self.tagli += 1
+        killer = self.killer.setdefault(ply, [])
+        if mossa not in killer:
+            killer.insert(0, mossa)
+            del killer[2:]
+        for k in chiavi_storia:
+            self.storia[k] = self.storia.get(k, 0) + depth * depth
+
     def evaluate(self, state: GameState):
         if state.robber is None: return 100000.0
+        self._mappa(state.grid)
+        return self._valuta_squadra([self._cella(g) for g in state.guardie], self._cella(state.robber),
+                                    [self._cella(p) for p in state.prev_guardie])
+
+    def _valuta_squadra(self, guardie, r, prev):
+        # Gli stessi termini di _valuta su una lista di k guardie (con k = 2 lo stesso punteggio)
+        m = self.mappa
+        if self.distanze_labirinto:
+            righe = [m.distanze_da(g) for g in guardie]
+            dist = [riga[r] for riga in righe]
+        else:
+            coord = m.coordinate
+            xr, yr = coord[r]
+            scarti = [(coord[g][0] - xr, coord[g][1] - yr) for g in guardie]
+            dist = [abs(dx) + abs(dy) for dx, dy in scarti]
+
+        if 0 in dist: return 80000.0
 
-        d1 = state.g1.manhattan(state.robber)
-        d2 = state.g2.manhattan(state.robber)
+        # Punteggio vicinanza
+        score = -sum(dist) * 50 - (min(dist) * 100)
+
+        if self.distanze_labirinto:
+            # Bonus Accerchiamento: +1000 per ogni uscita del ladro in più presa da una guardia
+            uscite = m.vicini[r]
+            if len(uscite) > 1:
+                prese = {min(uscite, key=riga.__getitem__)
+                         for riga, d in zip(righe, dist) if d != IRRAGGIUNGIBILE}
+                if len(prese) > 1:
+                    score += 1000 * (len(prese) - 1)
+        else:
+            # Bonus Accerchiamento: almeno due guardie da lati opposti
+            if any(dx1 * dx2 < 0 or dy1 * dy2 < 0
+                   for i, (dx1, dy1) in enumerate(scarti) for dx2, dy2 in scarti[i + 1:]):
+                score += 1000
+
+        # Anti-oscillazione
+        for g, p in zip(guardie, prev):
+            if g == p: score -= 2000
+
+        # Distanziamento guardie: -1500 per ogni coppia troppo vicina
+        for i, g in enumerate(guardie):
+            for j in range(i + 1, len(guardie)):
+                if self.distanze_labirinto:
+                    vicine = righe[i][guardie[j]] < 2
+                else:
+                    vicine = abs(coord[g][0] - coord[guardie[j]][0]) + abs(coord[g][1] - coord[guardie[j]][1]) < 2
+                if vicine:
+                    score -= 1500
+
+        return float(score)
+
+    def _valuta(self, g1, g2, r, prev_g1, prev_g2):
+        # Caso k = 2 di _valuta_squadra, sulle celle della ricerca: è la foglia di _minimax
+        m = self.mappa
+        if self.distanze_labirinto:
+            # Distanza vera nel labirinto (lookup O(1))
+            riga1 = m.distanze_da(g1)
+            riga2 = m.distanze_da(g2)
+            d1, d2 = riga1[r], riga2[r]
+        else:
+            coord = m.coordinate
+            (x1, y1), (x2, y2), (xr, yr) = coord[g1], coord[g2], coord[r]
+            d1 = abs(x1 - xr) + abs(y1 - yr)
+            d2 = abs(x2 - xr) + abs(y2 - yr)
 
         if d1 == 0 or d2 == 0: return 80000.0
 
         # Punteggio vicinanza
         score = -(d1 + d2) * 50 - (min(d1, d2) * 100)
 
-        # Bonus Accerchiamento
-        dx1, dx2 = state.g1.x - state.robber.x, state.g2.x - state.robber.x
-        dy1, dy2 = state.g1.y - state.robber.y, state.g2.y - state.robber.y
-        if (dx1 * dx2 < 0) or (dy1 * dy2 < 0):
-            score += 1000
+        if self.distanze_labirinto:
+            # Bonus Accerchiamento: le guardie arrivano al ladro da uscite diverse
+            uscite = m.vicini[r]
+            if len(uscite) > 1 and d1 != IRRAGGIUNGIBILE and d2 != IRRAGGIUNGIBILE:
+                if min(uscite, key=riga1.__getitem__) != min(uscite, key=riga2.__getitem__):
+                    score += 1000
+        else:
+            # Bonus Accerchiamento
+            dx1, dx2 = x1 - xr, x2 - xr
+            dy1, dy2 = y1 - yr, y2 - yr
+            if (dx1 * dx2 < 0) or (dy1 * dy2 < 0):
+                score += 1000
 
-            # Anti-oscillazione
-        if state.prev_g1 and state.g1 == state.prev_g1: score -= 2000
-        if state.prev_g2 and state.g2 == state.prev_g2: score -= 2000
+        # Anti-oscillazione
+        if g1 == prev_g1: score -= 2000
+        if g2 == prev_g2: score -= 2000
 
         # Distanziamento guardie
-        if state.g1.manhattan(state.g2) < 2:
+        if self.distanze_labirinto:
+            vicine = riga1[g2] < 2
+        else:
+            vicine = abs(x1 - x2) + abs(y1 - y2) < 2
+        if vicine:
             score -= 1500
 
         return float(score)
 
     def minimax(self, state, depth, maximizing, alpha, beta):
-        if depth == 0 or state.robber is None:
+        # Confine pubblico: converte lo stato e lancia la ricerca interna
+        if state.robber is None:
             return self.evaluate(state)
-
+        self._mappa(state.grid)
+        self.stato = self._stato_da(state, maximizing)
+        self.contando = self.conta_nodi
+        return self._minimax(depth, maximizing, alpha, beta)
+
+    def _minimax(self, depth, maximizing, alpha, beta):
+        # Controllo il tempo ogni 256 nodi (foglie comprese)
+        if self.contando:
+            self.nodi += 1
+            if self.scadenza is not None and self.nodi & 255 == 0 and time.perf_counter() > self.scadenza:
+                raise TempoScaduto()
+
+        s = self.stato
+        if depth == 0:
+            return self._valuta(s.g1, s.g2, s.ladro, s.prev_g1, s.prev_g2)
+
+        # Consulto la tabella di trasposizione
+        tt = self.tt
+        chiave = s.chiave
+        alpha_iniziale = alpha
+        mossa_tt = -1
+        if tt is not None:
+            voce = tt.cerca(chiave)
+            if voce is not None:
+                mossa_tt = voce[4]
+                if voce[1] >= depth:
+                    valore, tipo = voce[2], voce[3]
+                    if tipo == ESATTO: return valore
+                    if tipo == INFERIORE: alpha = max(alpha, valore)
+                    else: beta = min(beta, valore)
+                    if beta <= alpha: return valore
+
+        ply = self.profondita_radice - depth
+        n = self.mappa.n_celle
+        mossa_migliore = -1
         if maximizing:
+            g1, g2, prev_g1, prev_g2 = s.g1, s.g2, s.prev_g1, s.prev_g2
+            if tt is not None:
+                # Aggiornamento incrementale: cambiano guardie, posizioni precedenti e lato
+                z = tt.zobrist
+                base = (chiave ^ tt.lato ^ z[0][g1] ^ z[1][g2] ^
+                        z[3][prev_g1] ^ z[3][g1] ^ z[4][prev_g2] ^ z[4][g2])
+            s.prev_g1, s.prev_g2 = g1, g2
             best = -float("inf")
-            for g1 in self.get_moves(state.grid, state.g1, state.g2):
-                for g2 in self.get_moves(state.grid, state.g2, g1):
-                    new_state = GameState(state.grid, g1, g2, state.robber, state.g1, state.g2)
-                    val = self.minimax(new_state, depth - 1, False, alpha, beta)
-                    best = max(best, val)
-                    alpha = max(alpha, val)
-                    if beta <= alpha: break
-                if beta <= alpha: break
-            return best
+            for mossa in self._ordina_guardie(g1, g2, ply, mossa_tt):
+                n1, n2 = divmod(mossa, n)
+                s.g1, s.g2 = n1, n2
+                if tt is not None:
+                    s.chiave = base ^ z[0][n1] ^ z[1][n2]
+                val = self._minimax(depth - 1, False, alpha, beta)
+                if val > best:
+                    best, mossa_migliore = val, mossa
+                alpha = max(alpha, val)
+                if beta <= alpha:
+                    self._registra_taglio(ply, mossa, depth, (g1 * n + n1, (n + g2) * n + n2))
+                    break
+            # Unmake
+            s.g1, s.g2, s.prev_g1, s.prev_g2, s.chiave = g1, g2, prev_g1, prev_g2, chiave
         else:
+            r = s.ladro
+            if tt is not None:
+                z = tt.zobrist
+                base = chiave ^ tt.lato ^ z[2][r]
             best = float("inf")
-            for r_pos in self.get_moves(state.grid, state.robber):
-                new_state = GameState(state.grid, state.g1, state.g2, r_pos, state.prev_g1, state.prev_g2)
-                val = self.minimax(new_state, depth - 1, True, alpha, beta)
-                best = min(best, val)
+            for r_nuovo in self._ordina_ladro(r, ply, mossa_tt):
+                s.ladro = r_nuovo
+                if tt is not None:
+                    s.chiave = base ^ z[2][r_nuovo]
+                val = self._minimax(depth - 1, True, alpha, beta)
+                if val < best:
+                    best, mossa_migliore = val, r_nuovo
                 beta = min(beta, val)
-                if beta <= alpha: break
-            return best
+                if beta <= alpha:
+                    self._registra_taglio(ply, r_nuovo, depth, ((2 * n + r) * n + r_nuovo,))
+                    break
+            s.ladro, s.chiave = r, chiave
+
+        if tt is not None:
+            if best <= alpha_iniziale: tipo = SUPERIORE
+            elif best >= beta: tipo = INFERIORE
+            else: tipo = ESATTO
+            tt.salva(chiave, depth, best, tipo, mossa_migliore)
+        return best
 
     def _muoviti_a_caso(self, state):
-        # Prende mosse casuali per G1 e G2
-        m1 = self.get_moves(state.grid, state.g1, state.g2)
-        new_g1 = random.choice(m1) if m1 else state.g1
-        m2 = self.get_moves(state.grid, state.g2, new_g1)
-        new_g2 = random.choice(m2) if m2 else state.g2
-        return new_g1, new_g2
-
-
-    def get_best_moves(self, state: GameState):
-        visible = self.can_see(state.grid, state.g1, state.robber) or self.can_see(state.grid, state.g2, state.robber)
+        # Prende mosse casuali per ogni guardia, una dopo l'altra: nessuna entra
+        # nella cella di un'altra (nuova per chi ha già mosso, attuale per le successive)
+        nuove = list(state.guardie)
+        for i, g in enumerate(state.guardie):
+            altre = nuove[:i] + nuove[i + 1:]
+            mosse = [p for p in self.get_moves(state.grid, g) if p not in altre]
+            nuove[i] = self.rng.choice(mosse) if mosse else g
+        return tuple(nuove)
+
+
+    def get_best_moves(self, state: GameState, time_budget_ms=None):
+        """
+        Restituisce le nuove posizioni della squadra: (g1, g2) per la coppia, una tupla di k
+        posizioni per le squadre di k guardie (ricerca a risposte migliori, vedi _cerca_squadra).
+        Con time_budget_ms la ricerca approfondisce iterativamente finché c'è tempo e usa
+        la mossa dell'ultima iterazione completata; la profondità raggiunta finisce in
+        profondita_per_turno (0 nei turni di pattugliamento casuale).
+        """
+        self.profondita_raggiunta = 0
+        # Prima si azzera la mossa, poi si cambia stato: chi trova stato_corrente è il suo stato
+        # legge in mossa_corrente None o una mossa di questa ricerca
+        self.mossa_corrente = None
+        self.stato_corrente = state
+        mosse = self.mossa_corrente = self._scegli_mosse(state, time_budget_ms)
+        self.profondita_per_turno.append(self.profondita_raggiunta)
+        return mosse
+
+    def _bersaglio(self, state):
+        # (posizione del ladro su cui cercare, True se è solo l'ultima posizione nota);
+        # None = nessuna informazione, pattugliamento casuale
+        visible = state.robber is not None and any(self.can_see(state.grid, g, state.robber) for g in state.guardie)
         if visible: #ho aggiornato la posizione del ladro in memoria, avvio il minimax normale e il ladro si attiva per scappare
             self.last_known_pos = state.robber
-            target_robber = state.robber
-            is_chasing_ghost = False
-        elif self.last_known_pos is not None:
-            if state.g1 == self.last_known_pos or state.g2 == self.last_known_pos:
+            return state.robber, False
+        if self.last_known_pos is not None:
+            if self.last_known_pos in state.guardie:
                 self.last_known_pos = None
-                return self._muoviti_a_caso(state)
-            target_robber = self.last_known_pos
-            is_chasing_ghost = True
-        else:
+                return None
+            return self.last_known_pos, True
+        return None
+
+    def _scegli_mosse(self, state, time_budget_ms):
+        bersaglio = self._bersaglio(state)
+        if bersaglio is None:
             return self._muoviti_a_caso(state)
+        target_robber, is_chasing_ghost = bersaglio
+        cerca = self._prepara_ricerca(state)
+
+        # Se stiamo inseguendo una memoria, il ladro NON deve muoversi nel minimax
+        # quindi valuto solo la posizione dopo la mossa delle guardie (profondità 1)
+        if is_chasing_ghost:
+            _, migliori = cerca(state, target_robber, 1)
+            self.profondita_raggiunta = 1
+            return migliori
+
+        if time_budget_ms is None:
+            _, migliori = cerca(state, target_robber, self.max_depth)
+            self.profondita_raggiunta = self.max_depth
+            return migliori
+
+        # Modalità anytime: la profondità 1 non controlla il tempo ed è sempre disponibile
+        inizio = time.perf_counter()
+        _, migliori = cerca(state, target_robber, 1)
+        self.mossa_corrente = migliori
+        self.profondita_raggiunta = 1
+        self.scadenza = inizio + time_budget_ms / 1000
+        self.contando = True
+        try:
+            for depth in range(2, PROFONDITA_MAX_ID + 1):
+                _, migliori = cerca(state, target_robber, depth)
+                self.mossa_corrente = migliori
+                self.profondita_raggiunta = depth
+        except TempoScaduto:
+            pass  # L'iterazione interrotta viene scartata
+        finally:
+            self.scadenza = None
+            self.contando = self.conta_nodi
+        return migliori
+
+    def _prepara_ricerca(self, state):
+        # Tabella, killer e storia sopravvivono ai turni, ma non a un cambio di mappa
+        if state.grid is not self.griglia_tt:
+            if self.tt is not None:
+                m = self._mappa(state.grid)
+                self.tt.svuota(m.larghezza, m.altezza)
+            self.killer, self.storia = {}, {}
+            self.griglia_tt = state.grid
+        if self.tt is not None:
+            self.tt.nuovo_turno()
+        self.contando = self.conta_nodi
+        # La storia dei turni passati pesa la metà
+        for k in self.storia:
+            self.storia[k] //= 2
+
+        # La coppia cerca sulle mosse congiunte, le altre squadre una guardia alla volta
+        return self._cerca_radice if len(state.guardie) == 2 else self._cerca_squadra
+
+    def _cerca_radice(self, state, target_robber, depth):
         best_value = -float("inf")
-        best_g1, best_g2 = state.g1, state.g2
         alpha, beta = -float("inf"), float("inf")
-
-        m1_list = self.get_moves(state.grid, state.g1, state.g2)
-        for g1 in m1_list:
-            m2_list = self.get_moves(state.grid, state.g2, g1)
-            for g2 in m2_list:
-                # Creo lo stato usando target_robber invece di state.robber reale
-                temp_state = GameState(state.grid, g1, g2, target_robber, state.g1, state.g2)
-
-                # Se stiamo inseguendo una memoria, il ladro NON deve muoversi nel minimax
-                # quindi ho messo depth=0 per valutare solo la posizione attuale
-                attuale_depth = self.max_depth - 1 if not is_chasing_ghost else 0
-
-                val = self.minimax(temp_state, attuale_depth, False, alpha, beta)
-                if val > best_value:
-                    best_value = val
-                    best_g1, best_g2 = g1, g2
-                alpha = max(alpha, best_value)
-
-        return best_g1, best_g2
\ No newline at end of file
+        self.profondita_radice = depth
+
+        # Creo lo stato usando target_robber invece di state.robber reale
+        m = self._mappa(state.grid)
+        n = m.n_celle
+        radice = GameState(state.grid, state.g1, state.g2, target_robber, state.prev_g1, state.prev_g2)
+        s = self.stato = self._stato_da(radice, True)
+        g1, g2, chiave = s.g1, s.g2, s.chiave
+        mossa_tt = -1
+        tt = self.tt
+        if tt is not None:
+            voce = tt.cerca(chiave)
+            if voce is not None:
+                mossa_tt = voce[4]
+            z = tt.zobrist
+            base = (chiave ^ tt.lato ^ z[0][g1] ^ z[1][g2] ^
+                    z[3][s.prev_g1] ^ z[3][g1] ^ z[4][s.prev_g2] ^ z[4][g2])
+
+        mossa_migliore = -1
+        s.prev_g1, s.prev_g2 = g1, g2
+        for mossa in self._ordina_guardie(g1, g2, 0, mossa_tt):
+            n1, n2 = divmod(mossa, n)
+            s.g1, s.g2 = n1, n2
+            if tt is not None:
+                s.chiave = base ^ z[0][n1] ^ z[1][n2]
+            val = self._minimax(depth - 1, False, alpha, beta)
+            if val > best_value:
+                best_value = val
+                mossa_migliore = mossa
+            alpha = max(alpha, best_value)
+
+        if mossa_migliore < 0:
+            return best_value, (state.g1, state.g2)
+        if tt is not None:
+            tt.salva(chiave, depth, best_value, ESATTO, mossa_migliore)
+        n1, n2 = divmod(mossa_migliore, n)
+        return best_value, (self.posizioni[n1], self.posizioni[n2])
+
+    def _cerca_squadra(self, state, target_robber, depth):
+        """
+        Ricerca per squadre di k guardie a risposte migliori alternate: a turno ogni guardia
+        sceglie la sua mossa con un minimax in cui si muove solo lei, con le altre ferme sulle
+        celle già scelte. Ogni guardia costa 5 mosse per livello invece delle 5^k congiunte;
+        i giri si ripetono finché nessuna guardia cambia mossa (al massimo RONDE_SQUADRA).
+        """
+        self._mappa(state.grid)
+        mosse = self.mappa.mosse
+        r = self._cella(target_robber)
+        attuali = [self._cella(g) for g in state.guardie]
+        scelte = list(attuali)
+        # Come in _minimax: dopo la mossa la posizione precedente di ogni guardia è quella attuale
+        prev = list(attuali)
+        valore = -float("inf")
+        for _ in range(RONDE_SQUADRA):
+            cambiata = False
+            for i, g in enumerate(attuali):
+                squadra = list(scelte)
+                altre = scelte[:i] + scelte[i + 1:]
+                migliore, valore = scelte[i], -float("inf")
+                # La mossa già scelta per prima: a parità di valore non cambia
+                candidate = [scelte[i]] + [a for a in mosse[g] if a != scelte[i]]
+                for a in candidate:
+                    if a in altre:
+                        continue
+                    squadra[i] = a
+                    val = self._minimax_guardia(squadra, i, prev, r, depth - 1, False, valore, float("inf"))
+                    if val > valore:
+                        migliore, valore = a, val
+                if migliore != scelte[i]:
+                    scelte[i], cambiata = migliore, True
+            if not cambiata:
+                break
+        return valore, tuple(self.posizioni[c] for c in scelte)
+
+    def _minimax_guardia(self, squadra, i, prev, r, depth, maximizing, alpha, beta):
+        # Minimax di _cerca_squadra: ai livelli delle guardie si muove solo la guardia i
+        if self.contando:
+            self.nodi += 1
+            if self.scadenza is not None and self.nodi & 255 == 0 and time.perf_counter() > self.scadenza:
+                raise TempoScaduto()
+        if depth == 0:
+            return self._valuta_squadra(squadra, r, prev)
+
+        mosse = self.mappa.mosse
+        if maximizing:
+            g, p = squadra[i], prev[i]
+            prev[i] = g
+            best = -float("inf")
+            for a in mosse[g]:
+                if a != g and a in squadra:
+                    continue
+                squadra[i] = a
+                val = self._minimax_guardia(squadra, i, prev, r, depth - 1, False, alpha, beta)
+                best = max(best, val)
+                alpha = max(alpha, val)
+                if beta <= alpha:
+                    if self.conta_nodi:
+                        self.tagli += 1
+                    break
+            squadra[i], prev[i] = g, p
+        else:
+            best = float("inf")
+            for c in mosse[r]:
+                val = self._minimax_guardia(squadra, i, prev, c, depth - 1, True, alpha, beta)
+                best = min(best, val)
+                beta = min(beta, val)
+                if beta <= alpha:
+                    if self.conta_nodi:
+                        self.tagli += 1
+                    break
+        return best
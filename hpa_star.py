@@ -0,0 +1,376 @@
+import heapq
+from collections import deque
+
+import numpy as np
+
+from mappa import ottieni_mappa, impacca_righe, espandi_righe, MAX_LARGHEZZA_BIT
+
+DIMENSIONE_CLUSTER = 16
+# Ingressi più lunghi di così hanno due transizioni (agli estremi) invece di una nel mezzo
+LUNGHEZZA_INGRESSO_DOPPIO = 6
+INF = float("inf")
+
+
+class GrafoAstratto:
+    """
+    Livello astratto di HPA*, costruito una volta per mappa.
+    La griglia è divisa in cluster quadrati; sui confini tra cluster adiacenti ogni tratto libero
+    su entrambi i lati (ingresso) dà una o due coppie di celle di transizione, i nodi del grafo.
+    - esterni[nodo]: nodi dall'altra parte del confine (costo 1)
+    - interni[nodo]: (nodo, distanza) verso gli altri nodi dello stesso cluster, BFS dentro il cluster
+    I nodi sono indici di cella y * larghezza + x, come nella Mappa.
+    """
+
+    def __init__(self, mappa, dimensione=DIMENSIONE_CLUSTER):
+        if dimensione > MAX_LARGHEZZA_BIT:
+            raise ValueError(f"Cluster al massimo di {MAX_LARGHEZZA_BIT} celle di lato")
+        self.mappa = mappa
+        self.dimensione = dimensione
+        self.colonne = -(-mappa.larghezza // dimensione)
+        self.righe = -(-mappa.altezza // dimensione)
+        self.esterni = {}
+        self.nodi_cluster = {}  # cluster -> nodi al suo interno
+        self._trova_ingressi()
+        self.interni = self._distanze_interne()
+
+    def cluster(self, x, y):
+        return (y // self.dimensione) * self.colonne + x // self.dimensione
+
+    def limiti(self, cluster):
+        """(x0, y0, x1, y1) del cluster, estremi superiori esclusi."""
+        d = self.dimensione
+        x0, y0 = (cluster % self.colonne) * d, (cluster // self.colonne) * d
+        return x0, y0, min(x0 + d, self.mappa.larghezza), min(y0 + d, self.mappa.altezza)
+
+    # --- COSTRUZIONE ---
+
+    def _collega(self, a, b):
+        w = self.mappa.larghezza
+        for nodo, altro in ((a, b), (b, a)):
+            if nodo not in self.esterni:
+                self.esterni[nodo] = []
+                self.nodi_cluster.setdefault(self.cluster(nodo % w, nodo // w), []).append(nodo)
+            self.esterni[nodo].append(altro)
+
+    def _trova_ingressi(self):
+        m, d = self.mappa, self.dimensione
+        w, h = m.larghezza, m.altezza
+        libere = np.frombuffer(m.occupazione, dtype=np.uint8).reshape(h, w) == 0
+
+        # Confini verticali (tra colonne di cluster) e orizzontali (tra righe di cluster)
+        for bordo in range(d, w, d):
+            entrambe = libere[:, bordo - 1] & libere[:, bordo]
+            for inizio, fine in _tratti(entrambe, d):
+                for y in _transizioni(inizio, fine):
+                    self._collega(y * w + bordo - 1, y * w + bordo)
+        for bordo in range(d, h, d):
+            entrambe = libere[bordo - 1, :] & libere[bordo, :]
+            for inizio, fine in _tratti(entrambe, d):
+                for x in _transizioni(inizio, fine):
+                    self._collega((bordo - 1) * w + x, bordo * w + x)
+
+    def _distanze_interne(self):
+        # Una BFS per nodo, limitata al suo cluster: tutte insieme sulle righe di bit dei cluster
+        m, d = self.mappa, self.dimensione
+        w = m.larghezza
+        libere = np.zeros((self.righe * d, self.colonne * d), dtype=bool)
+        libere[:m.altezza, :w] = np.frombuffer(m.occupazione, dtype=np.uint8).reshape(m.altezza, w) == 0
+        blocchi = libere.reshape(self.righe, d, self.colonne, d).transpose(0, 2, 1, 3).reshape(-1, d, d)
+        righe_cluster = impacca_righe(blocchi)
+
+        cluster_ordinati = sorted(self.nodi_cluster)
+        sorgenti = [(c, nodo) for c in cluster_ordinati for nodo in self.nodi_cluster[c]]
+        interni = {nodo: [] for _, nodo in sorgenti}
+        if not sorgenti:
+            return interni
+
+        # Obiettivi di ogni BFS: i nodi del suo cluster, in coordinate locali (riempiti fino a k_max)
+        k_max = max(len(nodi) for nodi in self.nodi_cluster.values())
+        n = len(sorgenti)
+        tx = np.zeros((n, k_max), dtype=np.int64)
+        ty = np.zeros((n, k_max), dtype=np.int64)
+        valido = np.zeros((n, k_max), dtype=bool)
+        fronte = np.zeros((n, d), dtype=np.uint64)
+        for j, (c, nodo) in enumerate(sorgenti):
+            nodi = self.nodi_cluster[c]
+            tx[j, :len(nodi)] = [v % w % d for v in nodi]
+            ty[j, :len(nodi)] = [v // w % d for v in nodi]
+            valido[j, :len(nodi)] = True
+            fronte[j, nodo // w % d] = np.uint64(1) << np.uint64(nodo % w % d)
+        lib = righe_cluster[[c for c, _ in sorgenti]]
+
+        # Come campi_distanza di simulatore_batch: la distanza si accumula un bit alla volta
+        # (piani[j] = celle con il bit j acceso), e le BFS finite escono dagli array
+        piani = []
+        indici = np.arange(n)
+        visitate_attive = fronte.copy()
+        visitate = np.zeros_like(fronte)
+        passo = 0
+        while len(indici):
+            for j in range(passo.bit_length()):
+                if j == len(piani):
+                    piani.append(np.zeros_like(visitate))
+                if passo >> j & 1:
+                    piani[j][indici] |= fronte
+            fronte = espandi_righe(fronte, lib) & ~visitate_attive
+            visitate_attive |= fronte
+            vive = fronte.any(axis=1)
+            if not vive.all():
+                visitate[indici[~vive]] = visitate_attive[~vive]
+                indici, fronte, lib, visitate_attive = indici[vive], fronte[vive], lib[vive], visitate_attive[vive]
+            passo += 1
+
+        # Distanze lette solo nelle celle dei nodi
+        righe = np.arange(n)[:, None]
+        bit = tx.astype(np.uint64)
+        dist = np.zeros((n, k_max), dtype=np.int64)
+        for j, piano in enumerate(piani):
+            dist |= ((piano[righe, ty] >> bit) & np.uint64(1)).astype(np.int64) << j
+        raggiunti = ((visitate[righe, ty] >> bit) & np.uint64(1)).astype(bool)
+        dist[~(raggiunti & valido)] = -1
+
+        for (c, nodo), riga in zip(sorgenti, dist.tolist()):
+            interni[nodo] = [(altro, d) for altro, d in zip(self.nodi_cluster[c], riga) if d >= 0 and altro != nodo]
+        return interni
+
+    # --- RICERCHE LOCALI ---
+
+    def distanze_locali(self, sorgente, bloccate):
+        """BFS da una cella dentro il suo cluster, evitando le celle bloccate: {cella: distanza}."""
+        m = self.mappa
+        w = m.larghezza
+        x0, y0, x1, y1 = self.limiti(self.cluster(sorgente % w, sorgente // w))
+        dist = {sorgente: 0}
+        coda = deque([sorgente])
+        occupazione = m.occupazione
+        while coda:
+            c = coda.popleft()
+            x, y = c % w, c // w
+            for nx, ny in ((x, y - 1), (x, y + 1), (x + 1, y), (x - 1, y)):
+                if x0 <= nx < x1 and y0 <= ny < y1:
+                    v = ny * w + nx
+                    if v not in dist and not occupazione[v] and v not in bloccate:
+                        dist[v] = dist[c] + 1
+                        coda.append(v)
+        return dist
+
+
+# Ultimo grafo costruito: come per la Mappa, gli agenti sulla stessa mappa lo condividono
+_ultimo_grafo = None
+
+
+def ottieni_grafo(mappa, dimensione=DIMENSIONE_CLUSTER):
+    global _ultimo_grafo
+    if _ultimo_grafo is None or _ultimo_grafo.mappa is not mappa or _ultimo_grafo.dimensione != dimensione:
+        _ultimo_grafo = GrafoAstratto(mappa, dimensione)
+    return _ultimo_grafo
+
+
+def _tratti(entrambe, d):
+    # Tratti consecutivi di True, spezzati anche al cambio di cluster lungo il confine
+    tratti = []
+    inizio = None
+    for i, libera in enumerate(entrambe.tolist()):
+        if libera and inizio is not None and i % d == 0:
+            tratti.append((inizio, i - 1))
+            inizio = None
+        if libera and inizio is None:
+            inizio = i
+        elif not libera and inizio is not None:
+            tratti.append((inizio, i - 1))
+            inizio = None
+    if inizio is not None:
+        tratti.append((inizio, len(entrambe) - 1))
+    return tratti
+
+
+def _transizioni(inizio, fine):
+    if fine - inizio + 1 < LUNGHEZZA_INGRESSO_DOPPIO:
+        return [(inizio + fine) // 2]
+    return [inizio, fine]
+
+
+class PianificatoreHPA:
+    """
+    Pianificatore gerarchico (HPA*) per il ladro sulle mappe grandi.
+    A ogni turno collega ladro e cassaforte ai nodi dei loro cluster, cerca sul grafo astratto
+    e raffina solo il primo arco: un A* dentro il cluster del ladro, con le penalità dell'euristica
+    del ladro (storico, heat map, guardie). I cluster che contengono una guardia visibile
+    ricalcolano le distanze interne per quel turno; il resto del grafo non viene toccato.
+    Il percorso astratto del turno prima viene ripreso dal suo nodo più avanzato raggiungibile
+    dal cluster del ladro, senza una nuova ricerca, finché le guardie non cambiano i suoi archi.
+    I percorsi sono approssimati: passano per le celle di transizione, non sempre su un percorso minimo.
+    """
+
+    def __init__(self, agente, dimensione_cluster=DIMENSIONE_CLUSTER):
+        self.agente = agente
+        self.dimensione_cluster = dimensione_cluster
+        self.grafo = None
+        self.distanze_obiettivo = None  # Nodi del cluster della cassaforte -> distanza (senza guardie)
+        self.percorso = None  # Ultimo percorso astratto, dal ladro alla cassaforte
+        self.turno = None  # (celle bloccate, cluster sporchi, loro archi interni) dell'ultimo calcolo
+
+    def _prepara(self, griglia):
+        mappa = ottieni_mappa(griglia)
+        if self.grafo is None or self.grafo.mappa is not mappa:
+            self.grafo = ottieni_grafo(mappa, self.dimensione_cluster)
+            self.distanze_obiettivo = None
+            self.percorso = None
+        return self.grafo
+
+    def _archi_interni(self, grafo, cluster, bloccate):
+        # Distanze interne dei cluster con guardie, ricalcolate senza le celle occupate
+        archi = {}
+        nodi = [v for v in grafo.nodi_cluster.get(cluster, []) if v not in bloccate]
+        for nodo in nodi:
+            dist = grafo.distanze_locali(nodo, bloccate)
+            archi[nodo] = [(v, dist[v]) for v in nodi if v != nodo and v in dist]
+        return archi
+
+    def _archi_sporchi(self, bloccate):
+        # Cluster con guardie e i loro archi interni ricalcolati, una volta per insieme di celle bloccate
+        if self.turno is None or self.turno[0] != bloccate:
+            grafo = self.grafo
+            w = grafo.mappa.larghezza
+            sporchi = {grafo.cluster(v % w, v // w) for v in bloccate}
+            archi_sporchi = {}
+            for c in sporchi:
+                archi_sporchi.update(self._archi_interni(grafo, c, bloccate))
+            self.turno = (bloccate, sporchi, archi_sporchi)
+        return self.turno[1], self.turno[2]
+
+    def cerca_astratto(self, start, goal, bloccate):
+        """Percorso di nodi da start a goal (indici di cella) sul grafo astratto, o None."""
+        grafo = self.grafo
+        w = grafo.mappa.larghezza
+        gx, gy = goal % w, goal // w
+        cluster_goal = grafo.cluster(gx, gy)
+        sporchi, archi_sporchi = self._archi_sporchi(bloccate)
+
+        # Archi entranti nella cassaforte: distanze dai nodi del suo cluster
+        if cluster_goal in sporchi:
+            verso_goal = grafo.distanze_locali(goal, bloccate)
+        else:
+            if self.distanze_obiettivo is None or self.distanze_obiettivo[0] != goal:
+                self.distanze_obiettivo = (goal, grafo.distanze_locali(goal, set()))
+            verso_goal = self.distanze_obiettivo[1]
+        # Archi uscenti dal ladro: nodi del suo cluster e cassaforte se è nello stesso cluster
+        dal_ladro = grafo.distanze_locali(start, bloccate)
+        archi_start = [(v, dal_ladro[v]) for v in grafo.nodi_cluster.get(grafo.cluster(start % w, start // w), [])
+                       if v != start and v in dal_ladro and v not in bloccate]
+        if goal in dal_ladro:
+            archi_start.append((goal, dal_ladro[goal]))
+
+        push, pop = heapq.heappush, heapq.heappop
+        if self.agente.contatori is not None:
+            push, pop = self.agente.contatori.push, self.agente.contatori.pop
+        frontiera = [(0, start)]
+        g = {start: 0}
+        padre = {start: None}
+        while frontiera:
+            u = pop(frontiera)[1]
+            if u == goal:
+                percorso = []
+                while u is not None:
+                    percorso.append(u)
+                    u = padre[u]
+                return percorso[::-1]
+
+            ux, uy = u % w, u // w
+            archi = archi_start if u == start else []
+            if u in grafo.esterni:
+                archi = archi + [(v, 1) for v in grafo.esterni[u] if v not in bloccate]
+                c = grafo.cluster(ux, uy)
+                archi += archi_sporchi.get(u, []) if c in sporchi else grafo.interni[u]
+                if c == cluster_goal and u in verso_goal:
+                    archi.append((goal, verso_goal[u]))
+
+            for v, costo in archi:
+                nuovo = g[u] + costo
+                if nuovo < g.get(v, INF):
+                    g[v] = nuovo
+                    padre[v] = u
+                    push(frontiera, (nuovo + abs(v % w - gx) + abs(v // w - gy), v))
+        return None
+
+    def _riprendi_percorso(self, start, goal, bloccate):
+        # Il nodo più avanti nel percorso precedente che il ladro raggiunge restando nel suo cluster
+        grafo, percorso = self.grafo, self.percorso
+        if not percorso or percorso[-1] != goal:
+            return None
+        raggiungibili = grafo.distanze_locali(start, bloccate)
+        for k in range(len(percorso) - 1, 0, -1):
+            if percorso[k] in raggiungibili:
+                resto = percorso[k + 1 if percorso[k] == start else k:]
+                break
+        else:
+            return None
+
+        # Con guardie visibili il resto vale solo se nei cluster sporchi ogni arco ha ancora lo stesso costo
+        if bloccate:
+            w = grafo.mappa.larghezza
+            sporchi, archi_sporchi = self._archi_sporchi(bloccate)
+            if grafo.cluster(goal % w, goal // w) in sporchi:
+                return None
+            for a, b in zip(resto, resto[1:]):
+                if b in bloccate:
+                    return None
+                if grafo.cluster(a % w, a // w) in sporchi and b not in grafo.esterni.get(a, ()):
+                    if dict(archi_sporchi.get(a, [])).get(b) != dict(grafo.interni[a]).get(b):
+                        return None
+        return [start] + resto
+
+    def _raffina(self, start, arrivo, bloccate, guardie_visibili):
+        # A* dentro il cluster del ladro fino al primo nodo, con le penalità del ladro nell'euristica
+        grafo, agente = self.grafo, self.agente
+        w = grafo.mappa.larghezza
+        occupazione = grafo.mappa.occupazione
+        x0, y0, x1, y1 = grafo.limiti(grafo.cluster(start % w, start // w))
+        ax, ay = arrivo % w, arrivo // w
+        frontiera = [(0, start)]
+        costo = {start: 0}
+        padre = {start: None}
+        while frontiera:
+            u = heapq.heappop(frontiera)[1]
+            if u == arrivo:
+                break
+            x, y = u % w, u // w
+            for nx, ny in ((x, y - 1), (x, y + 1), (x + 1, y), (x - 1, y)):
+                v = ny * w + nx
+                if x0 <= nx < x1 and y0 <= ny < y1 and not occupazione[v] and v not in bloccate:
+                    nuovo = costo[u] + 1
+                    if nuovo < costo.get(v, INF):
+                        costo[v] = nuovo
+                        padre[v] = u
+                        priorita = nuovo + abs(nx - ax) + abs(ny - ay) + agente.penalita((nx, ny), guardie_visibili)
+                        heapq.heappush(frontiera, (priorita, v))
+        if arrivo not in padre:
+            return None
+        while padre[arrivo] != start:
+            arrivo = padre[arrivo]
+        return arrivo
+
+    def prossimo_passo(self, griglia, guardie_visibili):
+        """Prossima cella (x, y) verso la cassaforte, oppure None se è irraggiungibile."""
+        grafo = self._prepara(griglia)
+        w = grafo.mappa.larghezza
+        start = self.agente.pos[1] * w + self.agente.pos[0]
+        goal = self.agente.endPos[1] * w + self.agente.endPos[0]
+        bloccate = {y * w + x for x, y in guardie_visibili}
+
+        percorso = self._riprendi_percorso(start, goal, bloccate)
+        if percorso is None:
+            percorso = self.cerca_astratto(start, goal, bloccate)
+        self.percorso = percorso
+        if percorso is None or len(percorso) < 2:
+            return None
+        primo = percorso[1]
+        sx, sy = start % w, start // w
+        if abs(primo % w - sx) + abs(primo // w - sy) == 1:
+            # Il primo arco è già un passo (transizione tra cluster o nodo accanto)
+            passo = primo
+        else:
+            passo = self._raffina(start, primo, bloccate, guardie_visibili)
+            if passo is None:
+                return None
+        return passo % w, passo // w
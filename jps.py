@@ -0,0 +1,121 @@
+import heapq
+
+import numpy as np
+
+from mappa import ottieni_mappa
+
+# Costo g iniziale delle celle: mai raggiunte, o occupate da una guardia (nessun costo lo migliora)
+NON_RAGGIUNTA = 1 << 62
+GUARDIA = -1
+
+
+class PianificatoreJPS:
+    """
+    A* a salti per il ladro: stessa ricerca di RobberAgent.a_star, con la stessa prima mossa.
+    L'euristica di a_star contiene le penalità (storico, heat map, guardie), quindi non è
+    consistente: tagliare i percorsi simmetrici come il Jump Point Search classico cambia quale
+    dei percorsi alla pari vince, e con esso la prima mossa. Qui invece i nodi si espandono
+    nell'ordine esatto di a_star, (f, (x, y)), e si salta solo la coda:
+    - sui tratti aperti verso la cassaforte il figlio appena scoperto ha la stessa f e viene
+      prima di tutto ciò che è in coda, quindi si espande subito (heappushpop) invece di
+      passare dall'heap: la ricerca scorre in linea retta finché un muro, una cella penalizzata
+      o una guardia non cambia la f;
+    - le celle penalizzate e quelle attorno alle guardie sono nodi normali, con il loro costo g;
+    - vicini, euristica e chiavi dell'heap sono liste piatte sulla griglia con bordo di muri
+      (la chiave è un intero: f, poi x, poi y, come le tuple di a_star).
+    """
+
+    def __init__(self, agente):
+        self.agente = agente
+        self.mappa = None
+
+    def _prepara(self, mappa):
+        # Tabelle che dipendono solo dalla mappa: griglia con bordo, vicini e decodifica delle chiavi
+        w, h = mappa.larghezza, mappa.altezza
+        largo, alto = w + 2, h + 2
+        libere = np.zeros((alto, largo), dtype=bool)
+        libere[1:-1, 1:-1] = np.frombuffer(mappa.occupazione, dtype=np.uint8).reshape(h, w) == 0
+        self.mappa = mappa
+        self.largo = largo
+        self.alto = alto
+        # Vicini liberi di ogni cella, NORD, SUD, EST, OVEST come get_neighbors
+        piatte = libere.ravel()
+        self.vicini = [[i + d for d in (-largo, largo, 1, -1) if piatte[i + d]] if piatte[i] else []
+                       for i in range(largo, largo * (alto - 1))]
+        self.vicini = [[]] * largo + self.vicini + [[]] * largo
+        # Chiave = f * passo_f + x * alto + y (coordinate con bordo): stesso ordine di (f, (x, y))
+        self.passo_f = largo * alto
+        indici = np.arange(largo * alto).reshape(alto, largo)
+        self.indice_da_chiave = indici.T.ravel().tolist()
+        self.chiave_da_indice = (indici % largo * alto + indici // largo).ravel().tolist()
+
+    def _cerca(self, griglia, guardie_visibili):
+        # A* sulla griglia con bordo: came_from e cost_so_far come liste per indice, partenza e arrivo
+        agente = self.agente
+        mappa = ottieni_mappa(griglia)
+        if self.mappa is not mappa:
+            self._prepara(mappa)
+        largo, passo_f = self.largo, self.passo_f
+        campo = np.zeros((self.alto, largo), dtype=np.int64)
+        campo[1:-1, 1:-1] = (agente._campo_obiettivo(mappa)[4]
+                             + agente.campo_penalita(mappa, guardie_visibili)).reshape(mappa.altezza, -1)
+        h = campo.ravel().tolist()
+        cost_so_far = [NON_RAGGIUNTA] * len(h)
+        for gx, gy in guardie_visibili:
+            cost_so_far[(gy + 1) * largo + gx + 1] = GUARDIA
+        vicini, indice_da_chiave, chiave_da_indice = self.vicini, self.indice_da_chiave, self.chiave_da_indice
+
+        push, pop, pushpop = heapq.heappush, heapq.heappop, heapq.heappushpop
+        if agente.contatori is not None:
+            push, pop, pushpop = agente.contatori.push, agente.contatori.pop, agente.contatori.pushpop
+        start = (agente.pos[1] + 1) * largo + agente.pos[0] + 1
+        goal = (agente.endPos[1] + 1) * largo + agente.endPos[0] + 1
+        came_from = [-1] * len(h)
+        cost_so_far[start] = 0
+        frontier = []
+        chiave = h[start] * passo_f + chiave_da_indice[start]
+
+        while True:
+            current = indice_da_chiave[chiave % passo_f]
+            if current == goal:
+                break
+            new_cost = cost_so_far[current] + 1
+            # Il figlio con la chiave più bassa resta fuori dall'heap: se batte la coda si espande subito
+            migliore = None
+            for next_node in vicini[current]:
+                if new_cost < cost_so_far[next_node]:
+                    cost_so_far[next_node] = new_cost
+                    came_from[next_node] = current
+                    chiave = (new_cost + h[next_node]) * passo_f + chiave_da_indice[next_node]
+                    if migliore is None:
+                        migliore = chiave
+                    elif chiave < migliore:
+                        push(frontier, migliore)
+                        migliore = chiave
+                    else:
+                        push(frontier, chiave)
+            if migliore is not None:
+                chiave = pushpop(frontier, migliore)
+            elif frontier:
+                chiave = pop(frontier)
+            else:
+                break
+
+        return came_from, start, goal, cost_so_far
+
+    def cerca(self, griglia, guardie_visibili):
+        """came_from in coordinate (x, y), uguale a quello di a_star."""
+        came_from, start, _, cost_so_far = self._cerca(griglia, guardie_visibili)
+        largo = self.largo
+        return {(i % largo - 1, i // largo - 1): None if i == start else
+                (came_from[i] % largo - 1, came_from[i] // largo - 1)
+                for i, g in enumerate(cost_so_far) if g not in (NON_RAGGIUNTA, GUARDIA)}
+
+    def prossimo_passo(self, griglia, guardie_visibili):
+        """Primo passo verso la cassaforte, oppure None se è irraggiungibile."""
+        came_from, start, attuale, cost_so_far = self._cerca(griglia, guardie_visibili)
+        if cost_so_far[attuale] in (NON_RAGGIUNTA, GUARDIA) or attuale == start:
+            return None
+        while came_from[attuale] != start:
+            attuale = came_from[attuale]
+        return attuale % self.largo - 1, attuale // self.largo - 1
@@ -1,17 +1,29 @@
+import argparse
 import os
-import random
-from collections import deque
 
 import pygame
 import math
 from RobberAgent import RobberAgent
-from guard import MinimaxGuardAI, GameState, Position
+from guard import MinimaxGuardAI, Position
+from mappa import genera_mappa, ottieni_mappa
+from simulatore import Partita, Pianificatore, VITTORIA
+from replay import ScrittoreReplay, carica, elenca
 
 #COSTANTI
 GRID_SIZE = 20
 CELL_SIZE = 35
 WINDOW_SIZE = GRID_SIZE * CELL_SIZE
-FPS = 15
+FPS = 60
+DURATA_PASSO_MS = 67  # Un mezzo turno ogni 67 ms (il ritmo dei vecchi 15 FPS), animato tra le due celle
+OMBRE_TORCE = False  # True = i muri fermano il fascio delle torce (shadowcasting della Mappa, come le guardie)
+PROFONDITA_GUARDIE = 2
+# Budget della ricerca delle guardie: approfondiscono finché c'è tempo e allo scadere usano la mossa
+# dell'ultima profondità completata (None = PROFONDITA_GUARDIE fissa, per quanto ci metta)
+BUDGET_GUARDIE_MS = 200
+# Scadenza di ogni mezzo turno, ladro e guardie: chi non ha deciso in tempo gioca il ripiego
+# (il ladro il passo successivo del suo ultimo piano, le guardie la mossa dell'ultima profondità
+# completata o restano ferme). None = si aspetta sempre la decisione
+SCADENZA_TURNO_MS = 250
 
 # COLORI TEMA SCURO
 BLACK_BG = (15, 15, 15)  # Sfondo nero profondo
@@ -19,31 +31,8 @@ WHITE_WALL = (240, 240, 240)  # Muri bianchi accesi
 DARK_GREY = (40, 40, 40)  # Griglia sottile
 FLASHLIGHT_COLOR = (255, 255, 150, 80)  # Luce gialla calda semitrasparente
 
-def check_path_exists(griglia, start_pos, end_pos):
-    row= len(griglia)
-    col = len(griglia[0])
-    queue = deque([start_pos])
-    visited = set()
-    visited.add(start_pos)
-
-    while queue:
-        r, c = queue.popleft()
-
-        if (r, c) == end_pos:
-            return True  # Percorso trovato!
-
-        # Controlla le 4 direzioni (Nord, Sud, Est, Ovest)
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for dr, dc in directions:
-            nr, nc = r + dr, c + dc
-
-            # Controlla confini, muri e se già visitato
-            if (0 <= nr < row and 0 <= nc < col and
-                    griglia[nr][nc] != 1 and (nr, nc) not in visited):
-                visited.add((nr, nc))
-                queue.append((nr, nc))
-
-    return False
+# Celle sempre libere (riga, colonna): spawn, cassaforte e celle davanti alle torce delle guardie
+PROTETTE = [(0, 0), (19, 19), (10, 5), (5, 10), (10, 4), (4, 10), (0, 1)]
 
 def load_safe_image(path, fallback_color):
     if os.path.exists(path):
@@ -54,133 +43,291 @@ def load_safe_image(path, fallback_color):
     return surf
 
 
-def draw_flashlight(screen, pos, direction, length_cells=4):
-    #Disegna il fascio di luce basato sulla direzione attuale
-    if direction == (0, 0): return  # Non dovrebbe succedere con la logica nuova
+# Sprite dei coni per (direzione, lunghezza): (superficie, scarto x, scarto y) rispetto all'angolo della cella
+_CONI = {}
+
+
+def sprite_cono(direction, length_cells=4):
+    """Il fascio di luce disegnato una sola volta per direzione, su una superficie grande quanto il triangolo"""
+    chiave = (direction, length_cells)
+    if chiave not in _CONI:
+        # Centro della cella (l'angolo della cella è l'origine)
+        cx = cy = CELL_SIZE // 2
+
+        # Calcolo angolo della direzione
+        angle = math.atan2(direction[1], direction[0])
+
+        # Apertura del fascio (es. 40 gradi)
+        spread = math.radians(20)
+        length = length_cells * CELL_SIZE
+
+        # Punti del triangolo della luce
+        p1 = (cx, cy)
+        p2 = (cx + length * math.cos(angle - spread), cy + length * math.sin(angle - spread))
+        p3 = (cx + length * math.cos(angle + spread), cy + length * math.sin(angle + spread))
+
+        x0 = math.floor(min(p1[0], p2[0], p3[0]))
+        y0 = math.floor(min(p1[1], p2[1], p3[1]))
+        x1 = math.ceil(max(p1[0], p2[0], p3[0])) + 1
+        y1 = math.ceil(max(p1[1], p2[1], p3[1])) + 1
+        light_surf = pygame.Surface((x1 - x0, y1 - y0), pygame.SRCALPHA)
+        pygame.draw.polygon(light_surf, FLASHLIGHT_COLOR, [(x - x0, y - y0) for x, y in (p1, p2, p3)])
+        _CONI[chiave] = (light_surf, x0, y0)
+    return _CONI[chiave]
+
+
+def sprite_cono_occluso(mappa, pos, direction, length_cells=4):
+    """
+    Come sprite_cono, ma restano al buio i muri e le celle che l'agente non vede: le stesse di
+    can_see delle guardie (Mappa.visibili_da con raggio length_cells, muri che fanno ombra)
+    """
+    light_surf, ox, oy = sprite_cono(direction, length_cells)
+    light_surf = light_surf.copy()
+    base_x, base_y = pos[0] * CELL_SIZE + ox, pos[1] * CELL_SIZE + oy
+    larghezza, altezza = light_surf.get_size()
+    raggio, lato = length_cells, 2 * length_cells + 1
+    visibili = mappa.visibili_da(pos[0], pos[1], raggio)
+    for y in range(base_y // CELL_SIZE, (base_y + altezza - 1) // CELL_SIZE + 1):
+        for x in range(base_x // CELL_SIZE, (base_x + larghezza - 1) // CELL_SIZE + 1):
+            dx, dy = x - pos[0], y - pos[1]
+            if abs(dx) + abs(dy) > raggio or not mappa.libera(x, y) or \
+                    not visibili >> ((dy + raggio) * lato + dx + raggio) & 1:
+                light_surf.fill((0, 0, 0, 0), (x * CELL_SIZE - base_x, y * CELL_SIZE - base_y, CELL_SIZE, CELL_SIZE))
+    return light_surf, ox, oy
+
+
+def draw_flashlight(screen, pos, direction, length_cells=4, sprite=None):
+    #Disegna il fascio di luce basato sulla direzione attuale e restituisce il rettangolo toccato
+    if direction == (0, 0): return None  # Non dovrebbe succedere con la logica nuova
+    light_surf, ox, oy = sprite or sprite_cono(direction, length_cells)
+    return screen.blit(light_surf, (pos[0] * CELL_SIZE + ox, pos[1] * CELL_SIZE + oy))
+
+
+def crea_sfondo(griglia, obiettivo, img_cassaforte):
+    """Muri, griglia e cassaforte: non cambiano mai durante la partita, si disegnano una volta"""
+    altezza, larghezza = len(griglia), len(griglia[0])
+    sfondo = pygame.Surface((larghezza * CELL_SIZE, altezza * CELL_SIZE)).convert()
+    sfondo.fill(BLACK_BG)
+    for r in range(altezza):
+        for c in range(larghezza):
+            rect = pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+            if griglia[r][c] == 1:
+                pygame.draw.rect(sfondo, WHITE_WALL, rect)
+            pygame.draw.rect(sfondo, DARK_GREY, rect, 1)
+    sfondo.blit(img_cassaforte, (obiettivo[0] * CELL_SIZE, obiettivo[1] * CELL_SIZE))
+    return sfondo
+
+
+class Scena:
+    """
+    Disegno a rettangoli sporchi: lo sfondo statico viene copiato solo dove il fotogramma
+    precedente aveva torce e personaggi, e a schermo si aggiornano solo quelle zone.
+    """
+
+    def __init__(self, screen, griglia, obiettivo, immagini, ombre=OMBRE_TORCE):
+        self.screen = screen
+        # Con le ombre ogni coppia (cella, direzione) ha il suo sprite, calcolato alla prima richiesta
+        self.mappa = ottieni_mappa(griglia) if ombre else None
+        self.coni = {}
+        self.img_ladro, self.img_guardia, img_cassaforte = immagini
+        self.sfondo = crea_sfondo(griglia, obiettivo, img_cassaforte)
+        self.sporche = []  # Zone disegnate nel fotogramma precedente
+        screen.blit(self.sfondo, (0, 0))
+        pygame.display.flip()
+
+    def disegna(self, ladro_pos, g1_pos, g2_pos, direzioni):
+        """Disegna un fotogramma; posizioni (x, y), direzioni = (ladro, g1, g2)"""
+        for rect in self.sporche:
+            self.screen.blit(self.sfondo, rect, rect)
+
+        # DISEGNO TORCE (Prima dei personaggi così non coprono le icone)
+        nuove = [self._torcia(ladro_pos, direzioni[0]), self._torcia(g1_pos, direzioni[1]),
+                 self._torcia(g2_pos, direzioni[2])]
+
+        # Personaggi
+        t = pygame.time.get_ticks() / 200
+        rimbalzo = int(math.sin(t) * 3)
+        nuove.append(self.screen.blit(self.img_ladro, (ladro_pos[0] * CELL_SIZE, ladro_pos[1] * CELL_SIZE + rimbalzo)))
+        nuove.append(self.screen.blit(self.img_guardia, (g1_pos[0] * CELL_SIZE, g1_pos[1] * CELL_SIZE)))
+        nuove.append(self.screen.blit(self.img_guardia, (g2_pos[0] * CELL_SIZE, g2_pos[1] * CELL_SIZE)))
+
+        nuove = [rect for rect in nuove if rect is not None]
+        pygame.display.update(self.sporche + nuove)
+        self.sporche = nuove
 
-    # Centro della cella
-    cx = pos[0] * CELL_SIZE + CELL_SIZE // 2
-    cy = pos[1] * CELL_SIZE + CELL_SIZE // 2
+    def _torcia(self, pos, direzione):
+        if self.mappa is None or direzione == (0, 0):
+            return draw_flashlight(self.screen, pos, direzione)
+        # Durante l'animazione le ombre sono quelle della cella più vicina
+        cella = (round(pos[0]), round(pos[1]))
+        chiave = (cella, direzione)
+        if chiave not in self.coni:
+            self.coni[chiave] = sprite_cono_occluso(self.mappa, cella, direzione)
+        return draw_flashlight(self.screen, pos, direzione, sprite=self.coni[chiave])
 
-    # Calcolo angolo della direzione
-    angle = math.atan2(direction[1], direction[0])
 
-    # Apertura del fascio (es. 40 gradi)
-    spread = math.radians(20)
-    length = length_cells * CELL_SIZE
+def carica_immagini():
+    return (load_safe_image("img/ladro.png", (0, 0, 255)),
+            load_safe_image("img/guardia.png", (255, 0, 0)),
+            load_safe_image("img/cassaforte.png", (0, 255, 0)))
 
-    # Punti del triangolo della luce
-    p1 = (cx, cy)
-    p2 = (cx + length * math.cos(angle - spread), cy + length * math.sin(angle - spread))
-    p3 = (cx + length * math.cos(angle + spread), cy + length * math.sin(angle + spread))
 
-    # Disegno su superficie dedicata per la trasparenza
-    light_surf = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE), pygame.SRCALPHA)
-    pygame.draw.polygon(light_surf, FLASHLIGHT_COLOR, [p1, p2, p3])
-    screen.blit(light_surf, (0, 0))
+def interpola(partenza, arrivo, t):
+    """Posizioni (x, y) a frazione t del passo tra due fotogrammi"""
+    return tuple((p[0] + (a[0] - p[0]) * t, p[1] + (a[1] - p[1]) * t) for p, a in zip(partenza, arrivo))
 
 
-def main():
+def main(file_replay=None, ombre=OMBRE_TORCE):
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
     pygame.display.set_caption("Night Infiltration - Torce Fisse")
     clock = pygame.time.Clock()
 
-    img_ladro = load_safe_image("img/ladro.png", (0, 0, 255))
-    img_guardia = load_safe_image("img/guardia.png", (255, 0, 0))
-    img_cassaforte = load_safe_image("img/cassaforte.png", (0, 255, 0))
-    map_valid = False
-    while not  map_valid:
-        griglia = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                if random.random() < 0.25 and (col, row) not in [(0, 0), (19, 19), (10, 5), (5, 10)]:
-                    if  (row, col)  not in [(10, 4), (4, 10), (0, 1)]:
-                        griglia[row][col] = 1
-
-        if check_path_exists(griglia, (0, 0), (19, 19)):
-            map_valid = True
-            print("Mappa generata con successo! Percorso garantito.")
-        else:
-            print("Mappa impossibile generata. Riprovo...")
+    # Le mappe senza percorso vengono scartate in blocco durante la generazione
+    griglia = genera_mappa(GRID_SIZE, 0.25, PROTETTE, (0, 0), (19, 19))
+    print("Mappa generata con successo! Percorso garantito.")
+    scena = Scena(screen, griglia, (19, 19), carica_immagini(), ombre)
 
     ladro = RobberAgent((0, 0), (19, 19))
-    guard_ai = MinimaxGuardAI(max_depth=2)
-    g1_pos = Position(10, 5)
-    g2_pos = Position(5, 10)
+    guard_ai = MinimaxGuardAI(max_depth=PROFONDITA_GUARDIE)
+    # Niente limite di turni: si gioca finché qualcuno vince
+    partita = Partita(griglia, ladro, guard_ai, Position(10, 5), Position(5, 10),
+                      max_turni=None, budget_ms=BUDGET_GUARDIE_MS, registra=file_replay is not None)
+
+    def posizioni():
+        return tuple(ladro.pos), (partita.g1.x, partita.g1.y), (partita.g2.x, partita.g2.y)
 
     # DIREZIONI INIZIALI (Fisse finché non si muovono)
-    ladro_dir = (1, 0)
-    g1_dir = (0, 1)
-    g2_dir = (1, 0)
+    direzioni = ((1, 0), (0, 1), (1, 0))
 
-    running = True
+    def avvia_mezzo_turno():
+        if semaforo_ladro:
+            pianificatore_ladro.avvia(*partita.prepara_ladro())
+        else:
+            pianificatore_guardie.avvia(*partita.prepara_guardie())
+
+    # Il mezzo turno successivo si pianifica mentre il precedente è ancora animato
+    partenza = arrivo = posizioni()
+    inizio_passo = pygame.time.get_ticks()
+    pianificatore_ladro = Pianificatore(SCADENZA_TURNO_MS)
+    pianificatore_guardie = Pianificatore(SCADENZA_TURNO_MS)
     semaforo_ladro = True
+    avvia_mezzo_turno()
+    esito = None
+    running = True
 
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT: running = False
 
         # --- LOGICA MOVIMENTO ---
-        old_lp = ladro.pos
-        old_g1 = (g1_pos.x, g1_pos.y)
-        old_g2 = (g2_pos.x, g2_pos.y)
-
-        if semaforo_ladro:
-            ladro.pianifica_mossa(griglia, [(g1_pos.x, g1_pos.y), (g2_pos.x, g2_pos.y)])
-            # Aggiorna direzione se si è mosso
-            if ladro.pos != old_lp:
-                ladro_dir = (ladro.pos[0] - old_lp[0], ladro.pos[1] - old_lp[1])
-            semaforo_ladro = False
-        else:
-            stato = GameState(griglia, g1_pos, g2_pos, Position(*ladro.pos), False)
-            g1_pos, g2_pos = guard_ai.get_best_moves(stato)
-            # Aggiorna direzioni guardie
-            if (g1_pos.x, g1_pos.y) != old_g1:
-                g1_dir = (g1_pos.x - old_g1[0], g1_pos.y - old_g1[1])
-            if (g2_pos.x, g2_pos.y) != old_g2:
-                g2_dir = (g2_pos.x - old_g2[0], g2_pos.y - old_g2[1])
-            semaforo_ladro = True
+        # Il thread decide soltanto: la partita si muove qui, mai a metà di una mossa
+        t = min((pygame.time.get_ticks() - inizio_passo) / DURATA_PASSO_MS, 1)
+        pianificatore = pianificatore_ladro if semaforo_ladro else pianificatore_guardie
+        if esito is None and t == 1 and pianificatore.pronto():
+            if semaforo_ladro:
+                esito = partita.turno_ladro(pianificatore.decisione())
+            else:
+                esito = partita.turno_guardie(pianificatore.decisione())
+            partenza, arrivo = arrivo, posizioni()
+            # Aggiorna direzione di chi si è mosso
+            direzioni = tuple((a[0] - p[0], a[1] - p[1]) if a != p else d
+                              for p, a, d in zip(partenza, arrivo, direzioni))
+            inizio_passo, t = pygame.time.get_ticks(), 0
+            if esito is None:
+                semaforo_ladro = not semaforo_ladro
+                avvia_mezzo_turno()
 
         # --- DISEGNO ---
-        screen.fill(BLACK_BG)
+        scena.disegna(*interpola(partenza, arrivo, t), direzioni)
 
-        # Disegno Muri e Griglia
-        for r in range(GRID_SIZE):
-            for c in range(GRID_SIZE):
-                rect = pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                if griglia[r][c] == 1:
-                    pygame.draw.rect(screen, WHITE_WALL, rect)
-                pygame.draw.rect(screen, DARK_GREY, rect, 1)
+        # Check Vittoria/Sconfitta (deciso dal motore di gioco), a passo finito
+        if esito is not None and t == 1:
+            print("VITTORIA!" if esito == VITTORIA else "CATTURATO!")
+            running = False
 
-        screen.blit(img_cassaforte, (19 * CELL_SIZE, 19 * CELL_SIZE))
+        clock.tick(FPS)
 
-        # DISEGNO TORCE (Prima dei personaggi così non coprono le icone)
-        draw_flashlight(screen, ladro.pos, ladro_dir)
-        draw_flashlight(screen, (g1_pos.x, g1_pos.y), g1_dir)
-        draw_flashlight(screen, (g2_pos.x, g2_pos.y), g2_dir)
+    if file_replay is not None and partita.esito is not None:
+        # Le partite si accodano nel file, numerate in ordine
+        replay = partita.risultato().replay
+        replay.id_partita = len(elenca(file_replay)) + 1 if os.path.exists(file_replay) else 1
+        with ScrittoreReplay(file_replay) as scrittore:
+            scrittore.scrivi(replay)
+        print(f"Replay salvato in '{file_replay}'")
 
-        # Personaggi
-        t = pygame.time.get_ticks() / 200
-        rimbalzo = int(math.sin(t) * 3)
-        screen.blit(img_ladro, (ladro.pos[0] * CELL_SIZE, ladro.pos[1] * CELL_SIZE + rimbalzo))
-        screen.blit(img_guardia, (g1_pos.x * CELL_SIZE, g1_pos.y * CELL_SIZE))
-        screen.blit(img_guardia, (g2_pos.x * CELL_SIZE, g2_pos.y * CELL_SIZE))
-
-        # Check Vittoria/Sconfitta
-        if abs(ladro.pos[0] - g1_pos.x) + abs(ladro.pos[1] - g1_pos.y) <= 1 or \
-                abs(ladro.pos[0] - g2_pos.x) + abs(ladro.pos[1] - g2_pos.y) <= 1:
-            print("CATTURATO!")
-            running = False
-        elif ladro.pos == (19, 19):
-            print("VITTORIA!")
-            running = False
+    pygame.quit()
 
-        pygame.display.flip()
+
+def direzioni_fotogrammi(fotogrammi):
+    """Direzione delle torce in ogni fotogramma: l'ultimo spostamento di ciascuno, come nel gioco"""
+    direzioni = [((1, 0), (0, 1), (1, 0))]
+    for prima, dopo in zip(fotogrammi, fotogrammi[1:]):
+        direzioni.append(tuple((d[0] - p[0], d[1] - p[1]) if d != p else vecchia
+                               for p, d, vecchia in zip(prima, dopo, direzioni[-1])))
+    return direzioni
+
+
+def riproduci(file_replay, id_partita=None, ombre=OMBRE_TORCE):
+    """
+    Rivede una partita salvata senza rieseguire le AI.
+    SPAZIO pausa, FRECCE sinistra/destra un mezzo turno indietro/avanti, HOME/END inizio/fine.
+    """
+    replay = carica(file_replay, id_partita)
+    fotogrammi = replay.fotogrammi()
+    direzioni = direzioni_fotogrammi(fotogrammi)
+    altezza, larghezza = len(replay.griglia), len(replay.griglia[0])
+
+    pygame.init()
+    screen = pygame.display.set_mode((larghezza * CELL_SIZE, altezza * CELL_SIZE))
+    clock = pygame.time.Clock()
+    scena = Scena(screen, replay.griglia, replay.obiettivo, carica_immagini(), ombre)
+
+    indice, in_pausa, running = 0, False, True
+    inizio_passo = pygame.time.get_ticks()
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    in_pausa = not in_pausa
+                    inizio_passo = pygame.time.get_ticks()
+                elif event.key == pygame.K_RIGHT:
+                    indice, in_pausa = min(indice + 1, len(fotogrammi) - 1), True
+                elif event.key == pygame.K_LEFT:
+                    indice, in_pausa = max(indice - 1, 0), True
+                elif event.key == pygame.K_HOME:
+                    indice = 0
+                elif event.key == pygame.K_END:
+                    indice = len(fotogrammi) - 1
+
+        # In riproduzione il passo verso il fotogramma corrente viene animato, in pausa no
+        t = min((pygame.time.get_ticks() - inizio_passo) / DURATA_PASSO_MS, 1)
+        if in_pausa or indice == 0:
+            t = 1
+        scena.disegna(*interpola(fotogrammi[max(indice - 1, 0)], fotogrammi[indice], t), direzioni[indice])
+        fine = f" - {replay.esito}" if indice == len(fotogrammi) - 1 else ""
+        pygame.display.set_caption(f"Replay partita {replay.id_partita} - "
+                                   f"turno {(indice + 1) // 2}/{len(replay.mosse_ladro)}{fine}")
+
+        # A fine partita la finestra resta aperta per scorrere avanti e indietro
+        if not in_pausa and t == 1 and indice < len(fotogrammi) - 1:
+            indice += 1
+            inizio_passo = pygame.time.get_ticks()
         clock.tick(FPS)
 
     pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Night Infiltration")
+    parser.add_argument("--replay", metavar="FILE", help="rivede una partita da un file di replay invece di giocarla")
+    parser.add_argument("--partita", type=int, help="ID della partita da rivedere (default: la prima del file)")
+    parser.add_argument("--salva", metavar="FILE", help="salva il replay della partita giocata in FILE")
+    parser.add_argument("--ombre", action="store_true", default=OMBRE_TORCE, help="i muri fermano le torce")
+    args = parser.parse_args()
+    if args.replay:
+        riproduci(args.replay, args.partita, args.ombre)
+    else:
+        main(args.salva, args.ombre)
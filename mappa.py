@@ -0,0 +1,308 @@
+import random
+from collections import deque
+from functools import cached_property
+
+import numpy as np
+
+# Valore delle celle non raggiungibili nei campi di distanza
+IRRAGGIUNGIBILE = np.iinfo(np.uint16).max
+# Oltre questo numero di celle la tabella n x n non viene allocata tutta insieme
+MAX_CELLE_TABELLA = 2500
+# Quadranti dello shadowcasting: la cella (profondità, colonna) del quadrante è
+# (x0 + profondità * px + colonna * cx, y0 + profondità * py + colonna * cy)
+_QUADRANTI = [(0, -1, 1, 0), (0, 1, 1, 0), (1, 0, 0, 1), (-1, 0, 0, 1)]
+
+
+class Mappa:
+    """
+    Dati precalcolati di una griglia (0 = libero, 1 = muro), costruiti una volta per mappa
+    e condivisi da tutti gli agenti della partita.
+    Le celle sono indicizzate come y * larghezza + x.
+    - occupazione: bytearray piatto, 1 = muro
+    - vicini[i]: celle libere raggiungibili da i in un passo (NORD, SUD, EST, OVEST)
+    - mosse[i]: come vicini[i] più la cella stessa (mossa "ferma")
+    - vicini_xy / mosse_xy: le stesse tabelle con chiavi e valori (x, y)
+    - visibilita[raggio][i]: celle visibili da i entro il raggio (bitset, vedi visibili_da)
+    Le tabelle dei vicini si costruiscono al primo utilizzo: sulle mappe enormi chi usa
+    solo l'occupazione (HPA*) non paga milioni di tuple.
+    """
+
+    def __init__(self, griglia):
+        self.griglia = griglia
+        self.altezza = len(griglia)
+        self.larghezza = len(griglia[0])
+        self.n_celle = self.altezza * self.larghezza
+
+        self.occupazione = bytearray(1 if cella == 1 else 0 for riga in griglia for cella in riga)
+
+        # Distanze nel labirinto (BFS), calcolate per sorgente al primo utilizzo.
+        # Sulle mappe piccole le righe sono viste di un'unica tabella n x n
+        if self.n_celle <= MAX_CELLE_TABELLA:
+            self.distanze = np.full((self.n_celle, self.n_celle), IRRAGGIUNGIBILE, dtype=np.uint16)
+        else:
+            self.distanze = None
+        self.righe = {}  # sorgente -> memoryview della riga (lettura O(1) come int Python)
+        # Indice di visibilità, anche questo per sorgente al primo utilizzo: raggio -> {sorgente: bitset}
+        self.visibilita = {}
+
+    @cached_property
+    def coordinate(self):
+        w = self.larghezza
+        return [(i % w, i // w) for i in range(self.n_celle)]
+
+    def _tabelle_vicini(self):
+        w = self.larghezza
+        vicini = []
+        mosse = []
+        for i, (x, y) in enumerate(self.coordinate):
+            celle = []
+            if not self.occupazione[i]:
+                for dx, dy in [(0, -1), (0, 1), (1, 0), (-1, 0)]:
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < w and 0 <= ny < self.altezza and not self.occupazione[ny * w + nx]:
+                        celle.append(ny * w + nx)
+            vicini.append(tuple(celle))
+            mosse.append(tuple(celle) + (i,) if not self.occupazione[i] else ())
+        return vicini, mosse
+
+    @cached_property
+    def vicini(self):
+        vicini, self.__dict__["mosse"] = self._tabelle_vicini()
+        return vicini
+
+    @cached_property
+    def mosse(self):
+        self.__dict__["vicini"], mosse = self._tabelle_vicini()
+        return mosse
+
+    @cached_property
+    def vicini_xy(self):
+        coord = self.coordinate
+        return {coord[i]: tuple(coord[j] for j in celle) for i, celle in enumerate(self.vicini)}
+
+    @cached_property
+    def mosse_xy(self):
+        coord = self.coordinate
+        return {coord[i]: tuple(coord[j] for j in celle) for i, celle in enumerate(self.mosse)}
+
+    def indice(self, x, y):
+        return y * self.larghezza + x
+
+    def libera(self, x, y):
+        return 0 <= x < self.larghezza and 0 <= y < self.altezza and not self.occupazione[y * self.larghezza + x]
+
+    def linea_di_vista(self, x0, y0, x1, y1):
+        """True se nessun muro sta tra (x0, y0) e (x1, y1), cella d'arrivo compresa (passi diagonali, poi dritti)."""
+        dx = 1 if x1 > x0 else -1 if x1 < x0 else 0
+        dy = 1 if y1 > y0 else -1 if y1 < y0 else 0
+        occupazione, w = self.occupazione, self.larghezza
+        x, y = x0, y0
+        while x != x1 or y != y1:
+            if x != x1:
+                x += dx
+            if y != y1:
+                y += dy
+            if occupazione[y * w + x]:
+                return False
+        return True
+
+    def visibili_da(self, x0, y0, raggio):
+        """
+        Celle visibili da (x0, y0) entro distanza di Manhattan raggio, con i muri che fanno ombra.
+        Bitset sulla finestra quadrata centrata in (x0, y0): la cella (x0 + dx, y0 + dy) è il bit
+        (dy + raggio) * (2 * raggio + 1) + dx + raggio.
+        """
+        tabella = self.visibilita.setdefault(raggio, {})
+        sorgente = y0 * self.larghezza + x0
+        bitset = tabella.get(sorgente)
+        if bitset is None:
+            bitset = tabella[sorgente] = self._shadowcasting(x0, y0, raggio)
+        return bitset
+
+    def vede(self, x0, y0, x1, y1, raggio):
+        """True se (x1, y1) è visibile da (x0, y0) entro raggio: un test di bit sull'indice di visibilità."""
+        dx, dy = x1 - x0, y1 - y0
+        if abs(dx) + abs(dy) > raggio:
+            return False
+        return self.visibili_da(x0, y0, raggio) >> ((dy + raggio) * (2 * raggio + 1) + dx + raggio) & 1 == 1
+
+    def _shadowcasting(self, x0, y0, raggio):
+        # Shadowcasting simmetrico per quadranti (A. Ford): una cella libera è visibile se il suo
+        # centro cade nel settore illuminato, quindi a vede b se e solo se b vede a.
+        # I muri illuminati sono visibili; fuori dalla mappa è tutto muro.
+        # Pendenze come frazioni intere: inizio = ni / di, fine = nf / df (denominatori positivi)
+        lato = 2 * raggio + 1
+        w, h, occupazione = self.larghezza, self.altezza, self.occupazione
+        bitset = 1 << (raggio * lato + raggio)
+        for px, py, cx, cy in _QUADRANTI:
+            righe = [(1, -1, 1, 1, 1)]  # (profondità, ni, di, nf, df)
+            while righe:
+                d, ni, di, nf, df = righe.pop()
+                if d > raggio:
+                    continue
+                precedente = None  # None prima della prima cella, poi True se muro
+                # Colonne da d * inizio a d * fine, arrotondate al centro cella (pareggi verso l'interno)
+                for colonna in range((2 * d * ni + di) // (2 * di), -((df - 2 * d * nf) // (2 * df)) + 1):
+                    dx, dy = d * px + colonna * cx, d * py + colonna * cy
+                    x, y = x0 + dx, y0 + dy
+                    dentro = 0 <= x < w and 0 <= y < h
+                    muro = not dentro or occupazione[y * w + x] == 1
+                    if dentro and abs(dx) + abs(dy) <= raggio and \
+                            (muro or (d * ni <= colonna * di and colonna * df <= d * nf)):
+                        bitset |= 1 << ((dy + raggio) * lato + dx + raggio)
+                    if precedente is True and not muro:
+                        ni, di = 2 * colonna - 1, 2 * d
+                    elif precedente is False and muro:
+                        righe.append((d + 1, ni, di, 2 * colonna - 1, 2 * d))
+                    precedente = muro
+                if precedente is False:
+                    righe.append((d + 1, ni, di, nf, df))
+        return bitset
+
+    def distanze_da(self, sorgente):
+        """Riga delle distanze dalla cella sorgente verso tutte le altre."""
+        riga = self.righe.get(sorgente)
+        if riga is None:
+            riga = self._bfs(sorgente)
+        return riga
+
+    def distanza(self, a, b):
+        # a e b sono Position o tuple (x, y)
+        if isinstance(a, tuple):
+            return self.distanze_da(self.indice(*a))[self.indice(*b)]
+        return self.distanze_da(a.y * self.larghezza + a.x)[b.y * self.larghezza + b.x]
+
+    def _bfs(self, sorgente):
+        if self.distanze is not None:
+            array = self.distanze[sorgente]
+        else:
+            array = np.full(self.n_celle, IRRAGGIUNGIBILE, dtype=np.uint16)
+        riga = memoryview(array)
+        riga[sorgente] = 0
+        queue = deque([sorgente])
+        vicini = self.vicini
+        while queue:
+            c = queue.popleft()
+            d = riga[c] + 1
+            for v in vicini[c]:
+                if riga[v] == IRRAGGIUNGIBILE:
+                    riga[v] = d
+                    queue.append(v)
+        self.righe[sorgente] = riga
+        return riga
+
+
+# Ultima mappa costruita: tutti gli agenti che ricevono la stessa griglia la condividono
+_ultima_mappa = None
+
+
+def ottieni_mappa(griglia):
+    global _ultima_mappa
+    if isinstance(griglia, Mappa):
+        return griglia
+    if _ultima_mappa is None or _ultima_mappa.griglia is not griglia:
+        _ultima_mappa = Mappa(griglia)
+    return _ultima_mappa
+
+
+# --- GENERAZIONE DELLE MAPPE ---
+
+# Le mappe larghe al massimo 64 celle si propagano come righe di bit: una riga = un uint64, bit x = colonna x
+MAX_LARGHEZZA_BIT = 64
+_UNO = np.uint64(1)
+
+
+def impacca_righe(celle):
+    """(B, H, W) bool -> (B, H) uint64 con il bit x acceso se la cella (x, y) è True."""
+    b, h, w = celle.shape
+    byte = np.zeros((b, h, 8), dtype=np.uint8)
+    byte[:, :, :(w + 7) // 8] = np.packbits(celle, axis=2, bitorder="little")
+    return byte.view("<u8")[:, :, 0]
+
+
+def spacchetta_righe(righe, w):
+    """Inverso di impacca_righe: (B, H) uint64 -> (B, H, W) bool."""
+    byte = np.ascontiguousarray(righe, dtype="<u8").view(np.uint8).reshape(righe.shape + (8,))
+    return np.unpackbits(byte, axis=2, bitorder="little")[:, :, :w].view(bool)
+
+
+def espandi_righe(fronte, libere):
+    """Un passo di flood fill (N, S, E, O) sulle righe di bit, limitato alle celle libere."""
+    nuovo = fronte | (fronte << _UNO) | (fronte >> _UNO)
+    nuovo[:, 1:] |= fronte[:, :-1]
+    nuovo[:, :-1] |= fronte[:, 1:]
+    return nuovo & libere
+
+
+def genera_mappe(n, size, rng, densita=0.25, protette=(), start=(0, 0), end=None):
+    """
+    Genera n mappe candidate in un unico array e restituisce solo quelle risolvibili:
+    array bool (k, size, size), True = muro. Posizioni in (riga, colonna).
+    La connessione start -> end viene verificata per tutto il lotto con un flood fill vettoriale.
+    """
+    if end is None:
+        end = (size - 1, size - 1)
+    muri = rng.random((n, size, size)) < densita
+    for r, c in protette:
+        muri[:, r, c] = False
+    muri[:, start[0], start[1]] = False
+    muri[:, end[0], end[1]] = False
+    if size > MAX_LARGHEZZA_BIT:
+        return muri[_raggiunge_bool(~muri, start, end)]
+
+    # Flood fill dalla partenza sulle righe di bit; una mappa esce dal ciclo
+    # appena raggiunge l'arrivo o smette di espandersi
+    libere = impacca_righe(~muri)
+    valide = np.zeros(n, dtype=bool)
+    attive = np.arange(n)
+    raggiunte = np.zeros((n, size), dtype=np.uint64)
+    raggiunte[:, start[0]] = _UNO << np.uint64(start[1])
+    bit_arrivo = _UNO << np.uint64(end[1])
+    lib = libere
+    while len(attive):
+        nuove = espandi_righe(raggiunte, lib)
+        arrivate = (nuove[:, end[0]] & bit_arrivo) != 0
+        valide[attive[arrivate]] = True
+        ancora = ~arrivate & (nuove != raggiunte).any(axis=1)
+        attive, raggiunte, lib = attive[ancora], nuove[ancora], lib[ancora]
+    return muri[valide]
+
+
+def _raggiunge_bool(libere, start, end):
+    # Stesso flood fill su array bool, per le mappe più larghe di MAX_LARGHEZZA_BIT
+    raggiunte = np.zeros_like(libere)
+    raggiunte[:, start[0], start[1]] = True
+    while True:
+        nuove = raggiunte.copy()
+        nuove[:, 1:, :] |= raggiunte[:, :-1, :]
+        nuove[:, :-1, :] |= raggiunte[:, 1:, :]
+        nuove[:, :, 1:] |= raggiunte[:, :, :-1]
+        nuove[:, :, :-1] |= raggiunte[:, :, 1:]
+        nuove &= libere
+        if np.array_equal(nuove, raggiunte):
+            return raggiunte[:, end[0], end[1]]
+        raggiunte = nuove
+
+
+# Mappe valide già generate e non ancora usate, per parametri di generazione
+_riserva = {}
+
+
+def genera_mappa(size, densita=0.25, protette=(), start=(0, 0), end=None, rng=None, lotto=64):
+    """
+    Restituisce una mappa risolvibile come lista di liste (0 = libero, 1 = muro).
+    Senza rng le mappe vengono prese da un lotto generato in blocco (seme dal modulo random:
+    dopo random.seed() all'avvio la sequenza è riproducibile); con rng esplicito la mappa dipende solo da lui.
+    """
+    if rng is not None:
+        while True:
+            valide = genera_mappe(8, size, rng, densita, protette, start, end)
+            if len(valide):
+                return valide[0].astype(np.int8).tolist()
+
+    chiave = (size, densita, tuple(protette), start, end)
+    riserva = _riserva.setdefault(chiave, [])
+    while not riserva:
+        rng = np.random.default_rng(random.getrandbits(64))
+        riserva.extend(reversed(genera_mappe(lotto, size, rng, densita, protette, start, end)))
+    return riserva.pop().astype(np.int8).tolist()
@@ -0,0 +1,268 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from guard import MinimaxGuardAI
+from mappa import Mappa, IRRAGGIUNGIBILE
+
+# Costante di esplorazione di UCT (le ricompense stanno in [0, 1])
+C_UCT = 0.7
+# Ricompensa delle foglie senza cattura: sigmoide di evaluate su questa scala
+SCALA_VALUTAZIONE = 2000.0
+# Una cattura vale SCONTO ** (mezzi turni per arrivarci): meglio prima che dopo
+SCONTO = 0.98
+# Probabilità di una mossa a caso nei rollout, per ladro e guardie
+EPSILON_ROLLOUT = 0.1
+
+
+class Nodo:
+    """
+    Nodo dell'albero: posizione dopo una mossa (congiunta delle guardie o del ladro).
+    valore è la somma delle ricompense viste dalle guardie; mosse sono le mosse di chi
+    tocca da qui, in ordine casuale, e figli[i] il nodo di mosse[i] (espansi in quell'ordine).
+    """
+    __slots__ = ("mosse", "figli", "visite", "valore", "cattura")
+
+    def __init__(self, cattura=False):
+        self.mosse = None
+        self.figli = []
+        self.visite = 0
+        self.valore = 0.0
+        self.cattura = cattura
+
+
+class MCTSGuardAI(MinimaxGuardAI):
+    """
+    Guardie con Monte Carlo Tree Search, alternativa a MinimaxGuardAI con lo stesso get_best_moves.
+    - Selezione UCT: ai nodi delle guardie sulle mosse congiunte della squadra (stesse regole di
+      _ordina_guardie: nessuna guardia entra nella cella nuova di chi ha già mosso né in quella
+      attuale di chi muove dopo), ai nodi del ladro sulle sue mosse, con la ricompensa rovesciata.
+    - Rollout veloci: il ladro si allontana dalla guardia più vicina, le guardie scendono lungo
+      il campo di distanze del ladro, entrambi con EPSILON_ROLLOUT di mosse a caso.
+      Cattura = 1 (scontata), altrimenti evaluate della foglia schiacciata in [0, 1].
+    - Budget: iterazioni per turno, oppure time_budget_ms se passato a get_best_moves.
+    - processi > 1: parallelizzazione alla radice, ogni processo cresce un albero con il suo seme
+      e le visite dei figli della radice si sommano; vince la mossa più visitata.
+    Pattugliamento e ultima posizione nota come MinimaxGuardAI (quest'ultima con il minimax a
+    profondità 1). nodi conta le iterazioni, profondita_per_turno i turni di guardia dell'albero.
+    Le mosse congiunte sono 5^k: pensato per la coppia e le squadre piccole.
+    """
+
+    def __init__(self, iterazioni=1000, visual_range=4, profondita_rollout=16, c_uct=C_UCT,
+                 processi=1, seed=None, distanze_labirinto=True):
+        super().__init__(max_depth=1, visual_range=visual_range, dimensione_tt=0, seed=seed,
+                         distanze_labirinto=distanze_labirinto)
+        self.iterazioni = iterazioni
+        self.profondita_rollout = profondita_rollout  # Mezzi turni (ladro o guardie) per rollout
+        self.c_uct = c_uct
+        self.processi = processi
+        self.esecutore = None
+
+    def chiudi(self):
+        """Chiude i processi della parallelizzazione alla radice, se avviati."""
+        if self.esecutore is not None:
+            self.esecutore.shutdown()
+            self.esecutore = None
+
+    def _parametri(self):
+        # Quello che serve per ricreare la stessa AI in un processo
+        return {"visual_range": self.visual_range, "profondita_rollout": self.profondita_rollout,
+                "c_uct": self.c_uct, "distanze_labirinto": self.distanze_labirinto}
+
+    def _scegli_mosse(self, state, time_budget_ms):
+        bersaglio = self._bersaglio(state)
+        if bersaglio is None:
+            return self._muoviti_a_caso(state)
+        target_robber, is_chasing_ghost = bersaglio
+        if is_chasing_ghost:
+            # Il ricordo non si muove: basta valutare la mossa delle guardie, come fa il minimax
+            _, migliori = self._prepara_ricerca(state)(state, target_robber, 1)
+            self.profondita_raggiunta = 1
+            return migliori
+
+        m = self._mappa(state.grid)
+        guardie = tuple(self._cella(g) for g in state.guardie)
+        r = self._cella(target_robber)
+        if self.processi > 1:
+            statistiche, profondita, iterazioni = self._statistiche_parallele(m, guardie, r, time_budget_ms)
+        else:
+            scadenza = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000
+            statistiche, profondita, iterazioni = self._statistiche_radice(guardie, r, self.iterazioni, scadenza)
+        self.nodi += iterazioni
+        self.profondita_raggiunta = profondita
+        if not statistiche:
+            return tuple(state.guardie)
+        mossa = max(statistiche, key=lambda k: statistiche[k])
+        return tuple(self.posizioni[c] for c in mossa)
+
+    def _statistiche_parallele(self, m, guardie, r, time_budget_ms):
+        # Parallelizzazione alla radice: la mappa viaggia come occupazione, gli alberi restano nei processi
+        if self.esecutore is None:
+            self.esecutore = ProcessPoolExecutor(max_workers=self.processi)
+        quota = -(-self.iterazioni // self.processi)
+        occupazione = bytes(m.occupazione)
+        lavori = [(m.larghezza, occupazione, guardie, r, quota, time_budget_ms,
+                   self.rng.getrandbits(63), self._parametri()) for _ in range(self.processi)]
+        totali, profondita, iterazioni = {}, 0, 0
+        for statistiche, p, n in self.esecutore.map(_cerca_in_processo, lavori):
+            for mossa, (visite, valore) in statistiche.items():
+                v, q = totali.get(mossa, (0, 0.0))
+                totali[mossa] = (v + visite, q + valore)
+            profondita = max(profondita, p)
+            iterazioni += n
+        return totali, profondita, iterazioni
+
+    def _statistiche_radice(self, guardie, r, iterazioni, scadenza):
+        """
+        Cresce un albero dalla posizione (guardie, r) con le guardie al tratto.
+        Restituisce {mossa congiunta: (visite, valore)} dei figli della radice, la profondità
+        massima raggiunta in turni di guardia e le iterazioni fatte. Con scadenza il limite è
+        il tempo (almeno un'iterazione), altrimenti il numero di iterazioni.
+        """
+        radice = Nodo()
+        profondita, fatte = 0, 0
+        while True:
+            if scadenza is None:
+                if fatte >= iterazioni:
+                    break
+            elif fatte and time.perf_counter() > scadenza:
+                break
+            profondita = max(profondita, self._iterazione(radice, guardie, r))
+            fatte += 1
+        statistiche = {mossa: (figlio.visite, figlio.valore) for mossa, figlio in zip(radice.mosse, radice.figli)}
+        return statistiche, (profondita + 1) // 2, fatte
+
+    def _iterazione(self, radice, guardie, r):
+        # Selezione con UCT, espansione di un figlio, rollout e propagazione; restituisce i mezzi turni nell'albero
+        rng = self.rng
+        c = self.c_uct
+        prev = guardie
+        nodo = radice
+        percorso = [radice]
+        turno_guardie = True
+        ply = 0
+        while not nodo.cattura:
+            if nodo.mosse is None:
+                nodo.mosse = self._mosse_congiunte(guardie) if turno_guardie else list(self.mappa.mosse[r])
+                rng.shuffle(nodo.mosse)
+            figli = nodo.figli
+            espandi = len(figli) < len(nodo.mosse)
+            if espandi:
+                i = len(figli)
+            elif not figli:
+                break  # Nessuna mossa legale: si valuta la posizione così com'è
+            else:
+                # UCT: le guardie massimizzano la media, il ladro la minimizza
+                log_n = math.log(nodo.visite)
+                segno, base = (1.0, 0.0) if turno_guardie else (-1.0, 1.0)
+                i = max(range(len(figli)), key=lambda j: base + segno * figli[j].valore / figli[j].visite
+                        + c * math.sqrt(log_n / figli[j].visite))
+            mossa = nodo.mosse[i]
+            if turno_guardie:
+                prev, guardie = guardie, mossa
+            else:
+                r = mossa
+            ply += 1
+            if espandi:
+                nodo = Nodo(self._cattura(guardie, r))
+                figli.append(nodo)
+            else:
+                nodo = figli[i]
+            percorso.append(nodo)
+            turno_guardie = not turno_guardie
+            if espandi:
+                break
+
+        if nodo.cattura:
+            ricompensa = SCONTO ** ply
+        else:
+            ricompensa = self._rollout(list(guardie), r, list(prev), turno_guardie, ply)
+        for n in percorso:
+            n.visite += 1
+            n.valore += ricompensa
+        return ply
+
+    def _mosse_congiunte(self, guardie):
+        # Mosse della squadra una guardia alla volta, come in _ordina_guardie per la coppia
+        mosse = self.mappa.mosse
+        congiunte = [()]
+        for i, g in enumerate(guardie):
+            dopo = guardie[i + 1:]
+            congiunte = [p + (a,) for p in congiunte for a in mosse[g] if a not in p and a not in dopo]
+        return congiunte
+
+    def _cattura(self, guardie, r):
+        # Come Partita._catturato: una guardia a distanza di Manhattan al massimo 1
+        coord = self.mappa.coordinate
+        xr, yr = coord[r]
+        for g in guardie:
+            x, y = coord[g]
+            if abs(x - xr) + abs(y - yr) <= 1:
+                return True
+        return False
+
+    def _rollout(self, guardie, r, prev, turno_guardie, ply):
+        m = self.mappa
+        mosse = m.mosse
+        rng = self.rng
+        for _ in range(self.profondita_rollout):
+            if turno_guardie:
+                # Ogni guardia scende lungo le distanze dal ladro, senza entrare nelle celle delle altre
+                prev = list(guardie)
+                riga = m.distanze_da(r)
+                for i, g in enumerate(guardie):
+                    candidate = [a for a in mosse[g] if a == g or a not in guardie]
+                    if rng.random() < EPSILON_ROLLOUT:
+                        guardie[i] = rng.choice(candidate)
+                    else:
+                        guardie[i] = min(candidate, key=lambda a: (riga[a], rng.random()))
+            else:
+                # Il ladro va dove la guardia più vicina è più lontana
+                candidate = mosse[r]
+                if rng.random() < EPSILON_ROLLOUT:
+                    r = rng.choice(candidate)
+                else:
+                    righe = [m.distanze_da(g) for g in guardie]
+                    r = max(candidate, key=lambda a: (min(riga[a] for riga in righe), rng.random()))
+            ply += 1
+            if self._cattura(guardie, r):
+                return SCONTO ** ply
+            turno_guardie = not turno_guardie
+        return self._valore_foglia(guardie, r, prev)
+
+    def _valore_foglia(self, guardie, r, prev):
+        # evaluate sulle sole guardie che possono raggiungere il ladro (le altre sommerebbero
+        # IRRAGGIUNGIBILE), poi sigmoide stabile: exp riceve sempre un esponente <= 0
+        if self.distanze_labirinto:
+            m = self.mappa
+            raggiungibili = [i for i, g in enumerate(guardie) if m.distanze_da(g)[r] != IRRAGGIUNGIBILE]
+            if not raggiungibili:
+                return 0.0
+            guardie = [guardie[i] for i in raggiungibili]
+            prev = [prev[i] for i in raggiungibili]
+        x = self._valuta_squadra(guardie, r, prev) / SCALA_VALUTAZIONE
+        if x >= 0:
+            return 1.0 / (1.0 + math.exp(-x))
+        e = math.exp(x)
+        return e / (1.0 + e)
+
+
+# --- PARALLELIZZAZIONE ALLA RADICE ---
+
+# AI e mappa di ogni processo: la Mappa (con le sue distanze BFS) resta finché la mappa non cambia
+_ai_processo = None
+_chiave_processo = None
+
+
+def _cerca_in_processo(lavoro):
+    """Un albero indipendente in un processo del pool; restituisce le statistiche della radice."""
+    global _ai_processo, _chiave_processo
+    larghezza, occupazione, guardie, r, iterazioni, time_budget_ms, seed, parametri = lavoro
+    scadenza = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000
+    if _ai_processo is None or _chiave_processo != (larghezza, occupazione, parametri):
+        griglia = [list(occupazione[y:y + larghezza]) for y in range(0, len(occupazione), larghezza)]
+        _ai_processo = MCTSGuardAI(**parametri)
+        _ai_processo._mappa(Mappa(griglia))
+        _chiave_processo = (larghezza, occupazione, parametri)
+    _ai_processo.rng.seed(seed)
+    return _ai_processo._statistiche_radice(guardie, r, iterazioni, scadenza)
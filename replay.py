@@ -0,0 +1,179 @@
+"""
+Formato compatto dei replay: ogni partita è un record binario con la mappa come bitset,
+le posizioni iniziali e un codice di mossa a 3 bit per agente per turno.
+Una partita 20x20 da 200 turni occupa circa 300 byte, quindi si possono tenere tutte
+le partite di una campagna e rivederle in main.py senza rieseguire le AI.
+
+Record (little endian):
+    intestazione  _INTESTAZIONE (ID, dimensioni, posizioni iniziali, cassaforte, esito, numero di mosse)
+    mappa         altezza * larghezza bit, riga per riga (1 = muro)
+    mosse ladro   3 bit per mossa
+    mosse guardie 3 bit per mossa, G1 e G2 alternate
+"""
+import os
+import struct
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import numpy as np
+
+MAGIA = b"NIRP\x01"
+_INTESTAZIONE = struct.Struct("<IHHHHHHHHHHBII")
+
+# Codice 3 bit -> spostamento (dx, dy); 0 = fermo
+MOSSE = [(0, 0), (0, 1), (0, -1), (1, 0), (-1, 0)]
+_CODICI = {mossa: codice for codice, mossa in enumerate(MOSSE)}
+ESITI = ["VITTORIA", "CATTURATO", "PAREGGIO"]
+
+
+@dataclass
+class Replay:
+    id_partita: int
+    griglia: List[List[int]]
+    ladro: Tuple[int, int]  # Posizioni iniziali (x, y)
+    g1: Tuple[int, int]
+    g2: Tuple[int, int]
+    obiettivo: Tuple[int, int]
+    esito: str = None
+    mosse_ladro: List[int] = field(default_factory=list)  # Codici MOSSE, uno per turno del ladro
+    mosse_guardie: List[Tuple[int, int]] = field(default_factory=list)  # (G1, G2) per turno delle guardie
+
+    def registra_ladro(self, prima, dopo):
+        self.mosse_ladro.append(_codice(prima, dopo))
+
+    def registra_guardie(self, g1_prima, g1_dopo, g2_prima, g2_dopo):
+        self.mosse_guardie.append((_codice(g1_prima, g1_dopo), _codice(g2_prima, g2_dopo)))
+
+    def fotogrammi(self):
+        """Posizioni (ladro, g1, g2) dopo ogni mezzo turno, a partire da quelle iniziali."""
+        ladro, g1, g2 = self.ladro, self.g1, self.g2
+        stati = [(ladro, g1, g2)]
+        for turno, codice in enumerate(self.mosse_ladro):
+            ladro = _applica(ladro, codice)
+            stati.append((ladro, g1, g2))
+            if turno < len(self.mosse_guardie):
+                c1, c2 = self.mosse_guardie[turno]
+                g1, g2 = _applica(g1, c1), _applica(g2, c2)
+                stati.append((ladro, g1, g2))
+        return stati
+
+    def in_byte(self):
+        altezza, larghezza = len(self.griglia), len(self.griglia[0])
+        intestazione = _INTESTAZIONE.pack(self.id_partita, larghezza, altezza, *self.ladro, *self.g1, *self.g2,
+                                          *self.obiettivo, ESITI.index(self.esito) if self.esito else 255,
+                                          len(self.mosse_ladro), len(self.mosse_guardie))
+        muri = np.packbits(np.asarray(self.griglia, dtype=np.uint8).ravel() == 1)
+        return b"".join([intestazione, muri.tobytes(), _impacca(self.mosse_ladro),
+                         _impacca([c for coppia in self.mosse_guardie for c in coppia])])
+
+    @classmethod
+    def da_byte(cls, dati):
+        (id_partita, larghezza, altezza, lx, ly, g1x, g1y, g2x, g2y, ox, oy,
+         esito, n_ladro, n_guardie) = _INTESTAZIONE.unpack_from(dati)
+        pos = _INTESTAZIONE.size
+        n_muri = (altezza * larghezza + 7) // 8
+        muri = np.unpackbits(np.frombuffer(dati, np.uint8, n_muri, pos), count=altezza * larghezza)
+        pos += n_muri
+        mosse_ladro, pos = _spacchetta(dati, pos, n_ladro)
+        mosse_guardie, _ = _spacchetta(dati, pos, 2 * n_guardie)
+        return cls(id_partita, muri.reshape(altezza, larghezza).tolist(), (lx, ly), (g1x, g1y), (g2x, g2y),
+                   (ox, oy), ESITI[esito] if esito != 255 else None, mosse_ladro,
+                   list(zip(mosse_guardie[::2], mosse_guardie[1::2])))
+
+
+def _codice(prima, dopo):
+    mossa = (dopo[0] - prima[0], dopo[1] - prima[1])
+    if mossa not in _CODICI:
+        raise ValueError(f"Mossa non registrabile da {prima} a {dopo}: solo passi di una cella")
+    return _CODICI[mossa]
+
+
+def _applica(pos, codice):
+    dx, dy = MOSSE[codice]
+    return pos[0] + dx, pos[1] + dy
+
+
+def _impacca(codici):
+    bit = (np.asarray(codici, dtype=np.uint8)[:, None] >> np.arange(3, dtype=np.uint8)) & 1
+    return np.packbits(bit.ravel(), bitorder="little").tobytes()
+
+
+def _spacchetta(dati, pos, n):
+    n_byte = (3 * n + 7) // 8
+    bit = np.unpackbits(np.frombuffer(dati, np.uint8, n_byte, pos), count=3 * n, bitorder="little")
+    return (bit.reshape(n, 3) @ np.array([1, 2, 4])).tolist(), pos + n_byte
+
+
+# --- FILE DI REPLAY: MAGIA seguita da record preceduti dalla loro lunghezza (uint32) ---
+
+class ScrittoreReplay:
+    """
+    Aggiunge replay in coda a un file. Con riprendi=True un file esistente viene continuato:
+    un record troncato da un crash viene scartato, così come quelli con ID oltre fino_a
+    (le partite che il file dei risultati non ha ancora e che verranno rigiocate).
+    """
+
+    def __init__(self, percorso, riprendi=True, fino_a=None):
+        self.percorso = percorso
+        if riprendi and os.path.exists(percorso) and os.path.getsize(percorso) >= len(MAGIA):
+            fine = len(MAGIA)
+            for inizio, id_partita, lunghezza in _indice(percorso):
+                if fino_a is not None and id_partita > fino_a:
+                    break
+                fine = inizio + lunghezza
+            self.file = open(percorso, "rb+")
+            self.file.truncate(fine)
+            self.file.seek(fine)
+        else:
+            self.file = open(percorso, "wb")
+            self.file.write(MAGIA)
+
+    def scrivi(self, replay):
+        dati = replay if isinstance(replay, bytes) else replay.in_byte()
+        self.file.write(struct.pack("<I", len(dati)) + dati)
+        # Subito nel sistema operativo: se il processo muore il record resta
+        self.file.flush()
+
+    def chiudi(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *eccezione):
+        self.chiudi()
+
+
+def _indice(percorso):
+    # (inizio del record, ID, lunghezza con il prefisso) leggendo solo prefissi e ID
+    dimensione = os.path.getsize(percorso)
+    with open(percorso, "rb") as f:
+        if f.read(len(MAGIA)) != MAGIA:
+            raise ValueError(f"'{percorso}' non è un file di replay")
+        while True:
+            inizio = f.tell()
+            testa = f.read(8)
+            if len(testa) < 8:
+                return
+            lunghezza, id_partita = struct.unpack("<II", testa)
+            if inizio + 4 + lunghezza > dimensione:
+                return  # Record troncato
+            f.seek(lunghezza - 4, os.SEEK_CUR)
+            yield inizio, id_partita, lunghezza + 4
+
+
+def elenca(percorso):
+    """ID delle partite nel file, in ordine di scrittura."""
+    return [id_partita for _, id_partita, _ in _indice(percorso)]
+
+
+def carica(percorso, id_partita=None):
+    """Il Replay della partita richiesta (la prima del file se id_partita è None)."""
+    for inizio, id_letto, lunghezza in _indice(percorso):
+        if id_partita is None or id_letto == id_partita:
+            with open(percorso, "rb") as f:
+                f.seek(inizio + 4)
+                return Replay.da_byte(f.read(lunghezza - 4))
+    raise KeyError(f"Partita {id_partita} non presente in '{percorso}'")
@@ -0,0 +1,312 @@
+import csv
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+
+def percorso_configurazione(percorso_csv):
+    """File JSON con la configurazione della campagna di un CSV: stesso nome, estensione .json."""
+    return os.path.splitext(percorso_csv)[0] + ".json"
+
+
+def _normalizza(configurazione):
+    # Come la rilegge json (tuple -> liste), per confrontarla con quella salvata
+    return json.loads(json.dumps(configurazione or {}))
+
+
+class ScrittoreRisultati:
+    """
+    Scrive i risultati in coda a un CSV man mano che le partite finiscono, a blocchi di righe,
+    con un fsync periodico: un crash perde al massimo le righe non ancora scritte.
+    Con riprendi=True un file esistente viene continuato: l'ultima riga incompleta viene
+    scartata e ultimo_id dice da quale partita ripartire.
+    configurazione: parametri della campagna, salvati accanto al CSV (vedi percorso_configurazione);
+    la ripresa è rifiutata se quelli salvati mancano o sono diversi.
+    """
+
+    def __init__(self, percorso, intestazione, riprendi=False, righe_per_blocco=100, secondi_fsync=5.0,
+                 configurazione=None):
+        self.percorso = percorso
+        self.intestazione = list(intestazione)
+        self.configurazione = _normalizza(configurazione)
+        self.righe_per_blocco = righe_per_blocco
+        self.secondi_fsync = secondi_fsync
+        self.buffer = []
+        self.ultimo_id = 0
+
+        if riprendi and os.path.exists(percorso) and os.path.getsize(percorso) > 0:
+            self._controlla_configurazione()
+            self._prepara_ripresa()
+            self.file = open(percorso, "a", newline="")
+            self.writer = csv.writer(self.file)
+        else:
+            with open(percorso_configurazione(percorso), "w") as f:
+                json.dump(self.configurazione, f, indent=2)
+            self.file = open(percorso, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.intestazione)
+            self._sincronizza()
+        self.ultimo_fsync = time.monotonic()
+
+    def _controlla_configurazione(self):
+        # Righe di una campagna con altri parametri non vanno mescolate a quelle nuove
+        percorso = percorso_configurazione(self.percorso)
+        if not os.path.exists(percorso):
+            raise ValueError(f"'{self.percorso}' non ha una configurazione salvata ('{percorso}'): "
+                             f"impossibile riprendere")
+        with open(percorso) as f:
+            salvata = json.load(f)
+        if salvata != self.configurazione:
+            raise ValueError(f"'{self.percorso}' viene da un'altra configurazione ({salvata}): "
+                             f"impossibile riprendere con {self.configurazione}")
+
+    def _prepara_ripresa(self):
+        # Legge solo l'intestazione e la coda del file, così la ripresa non dipende dalla sua lunghezza
+        with open(self.percorso, "rb+") as f:
+            intestazione = f.readline()
+            if not intestazione.endswith(b"\n"):
+                # Nemmeno l'intestazione è completa: si riparte da zero
+                f.seek(0)
+                f.truncate()
+                f.write((",".join(self.intestazione) + "\r\n").encode())
+                return
+            colonne = next(csv.reader([intestazione.decode()]))
+            if colonne != self.intestazione:
+                raise ValueError(f"'{self.percorso}' ha colonne diverse ({colonne}): "
+                                 f"impossibile riprendere con {self.intestazione}")
+
+            # Cerca all'indietro finché la coda contiene almeno una riga intera
+            inizio_dati = f.tell()
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            coda = b""
+            while pos > inizio_dati and coda.count(b"\n") < 2:
+                passo = min(1 << 16, pos - inizio_dati)
+                pos -= passo
+                f.seek(pos)
+                coda = f.read(passo) + coda
+
+            # Una riga scritta a metà da un crash non conta: tronco all'ultimo "a capo"
+            taglio = coda.rfind(b"\n") + 1
+            f.truncate(pos + taglio)
+            righe = coda[:taglio].splitlines()
+            if righe and righe[-1]:
+                self.ultimo_id = int(next(csv.reader([righe[-1].decode()]))[0])
+
+    def scrivi(self, riga):
+        self.buffer.append(riga)
+        if len(self.buffer) >= self.righe_per_blocco:
+            self.svuota()
+
+    def svuota(self):
+        if self.buffer:
+            self.writer.writerows(self.buffer)
+            self.ultimo_id = int(self.buffer[-1][0])
+            self.buffer = []
+        self.file.flush()
+        if time.monotonic() - self.ultimo_fsync >= self.secondi_fsync:
+            self._sincronizza()
+
+    def _sincronizza(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.ultimo_fsync = time.monotonic()
+
+    def chiudi(self):
+        self.svuota()
+        self._sincronizza()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *eccezione):
+        # Anche in caso di errore le righe già completate finiscono su disco
+        self.chiudi()
+
+
+# --- FORMATO A COLONNE ---
+# Una cartella con schema.json e, per ogni colonna, una sottocartella di blocchi .npy
+# (000000.npy, 000001.npy, ...) leggibili in memory-map: chi analizza apre solo le colonne che usa.
+
+# Tipi delle colonne note; le altre sono float64
+TIPI = {
+    "ID_Partita": "int64",
+    "Mosse_Impiegate": "int32",
+    "Ladro_Nodi": "int64",
+    "Ladro_Push": "int64",
+    "Ladro_Frontiera_Max": "int32",
+    "Ladro_ms_Totale": "float32",
+    "Ladro_ms_Max": "float32",
+    "Guardie_Nodi": "int64",
+    "Guardie_Tagli": "int64",
+    "Guardie_Prof_Max": "int8",
+    "Guardie_ms_Totale": "float32",
+    "Guardie_ms_Max": "float32",
+}
+# Colonne di testo salvate come codici int8 (indice nella lista)
+CATEGORIE = {"Risultato": ["VITTORIA", "CATTURATO", "PAREGGIO"]}
+
+
+def _tipo(nome):
+    return "int8" if nome in CATEGORIE else TIPI.get(nome, "float64")
+
+
+def _file_blocco(cartella, nome, blocco):
+    return os.path.join(cartella, nome, f"{blocco:06d}.npy")
+
+
+def _conta_blocchi(cartella, nome):
+    percorso = os.path.join(cartella, nome)
+    return len([f for f in os.listdir(percorso) if f.endswith(".npy")]) if os.path.isdir(percorso) else 0
+
+
+class ScrittoreColonne:
+    """
+    Stessa interfaccia di ScrittoreRisultati, ma salva un blocco .npy per colonna ogni righe_per_blocco righe.
+    La prima colonna (l'ID della partita) viene scritta per ultima: un blocco esiste solo se c'è il suo ID,
+    così alla ripresa i blocchi rimasti a metà vengono scartati.
+    configurazione: parametri della campagna (griglia, turni, ...) salvati nello schema.
+    """
+
+    def __init__(self, cartella, intestazione, riprendi=False, righe_per_blocco=4096, configurazione=None):
+        self.cartella = self.percorso = cartella
+        self.intestazione = list(intestazione)
+        self.righe_per_blocco = righe_per_blocco
+        self.buffer = []
+        self.ultimo_id = 0
+        self.blocco = 0
+        id_colonna = self.intestazione[0]
+
+        schema = {"colonne": [[nome, _tipo(nome)] for nome in self.intestazione],
+                  "categorie": {nome: CATEGORIE[nome] for nome in self.intestazione if nome in CATEGORIE},
+                  "configurazione": _normalizza(configurazione)}
+        percorso_schema = os.path.join(cartella, "schema.json")
+        if riprendi and os.path.exists(percorso_schema):
+            with open(percorso_schema) as f:
+                esistente = json.load(f)
+            if esistente["colonne"] != schema["colonne"]:
+                raise ValueError(f"'{cartella}' ha colonne diverse: impossibile riprendere con {self.intestazione}")
+            if esistente.get("configurazione", {}) != schema["configurazione"]:
+                raise ValueError(f"'{cartella}' viene da un'altra configurazione ({esistente.get('configurazione')}): "
+                                 f"impossibile riprendere con {schema['configurazione']}")
+            self.blocco = _conta_blocchi(cartella, id_colonna)
+            if self.blocco:
+                self.ultimo_id = int(np.load(_file_blocco(cartella, id_colonna, self.blocco - 1), mmap_mode="r")[-1])
+        else:
+            shutil.rmtree(cartella, ignore_errors=True)
+
+        os.makedirs(cartella, exist_ok=True)
+        for nome in self.intestazione:
+            os.makedirs(os.path.join(cartella, nome), exist_ok=True)
+            # Blocchi oltre l'ultimo completo: resti di un'interruzione
+            for f in os.listdir(os.path.join(cartella, nome)):
+                if not f.endswith(".npy") or int(f.split(".")[0]) >= self.blocco:
+                    os.remove(os.path.join(cartella, nome, f))
+        with open(percorso_schema, "w") as f:
+            json.dump(schema, f, indent=2)
+
+    def scrivi(self, riga):
+        self.buffer.append(riga)
+        if len(self.buffer) >= self.righe_per_blocco:
+            self.svuota()
+
+    def svuota(self):
+        if not self.buffer:
+            return
+        colonne = list(zip(*self.buffer))
+        for i in list(range(1, len(self.intestazione))) + [0]:
+            nome = self.intestazione[i]
+            if nome in CATEGORIE:
+                codici = {valore: k for k, valore in enumerate(CATEGORIE[nome])}
+                valori = np.array([codici[v] for v in colonne[i]], dtype=np.int8)
+            else:
+                valori = np.array(colonne[i], dtype=_tipo(nome))
+            destinazione = _file_blocco(self.cartella, nome, self.blocco)
+            temporaneo = destinazione + ".tmp"
+            with open(temporaneo, "wb") as f:
+                np.save(f, valori)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporaneo, destinazione)
+        self.ultimo_id = int(self.buffer[-1][0])
+        self.blocco += 1
+        self.buffer = []
+
+    def chiudi(self):
+        self.svuota()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *eccezione):
+        self.chiudi()
+
+
+class LettoreColonne:
+    """Legge una cartella di ScrittoreColonne una colonna alla volta, con i blocchi in memory-map."""
+
+    def __init__(self, cartella):
+        self.cartella = cartella
+        with open(os.path.join(cartella, "schema.json")) as f:
+            schema = json.load(f)
+        self.colonne = [nome for nome, _ in schema["colonne"]]
+        self.categorie = schema["categorie"]
+        self.configurazione = schema["configurazione"]
+        self.n_blocchi = _conta_blocchi(cartella, self.colonne[0])
+
+    def blocchi(self, nome):
+        for blocco in range(self.n_blocchi):
+            yield np.load(_file_blocco(self.cartella, nome, blocco), mmap_mode="r")
+
+    def codici(self, nome):
+        return np.concatenate(list(self.blocchi(nome))) if self.n_blocchi else np.zeros(0, dtype=_tipo(nome))
+
+    def colonna(self, nome):
+        """La colonna intera; quelle di testo tornano come array di stringhe."""
+        valori = self.codici(nome)
+        if nome in self.categorie:
+            return np.array(self.categorie[nome])[valori]
+        return valori
+
+
+def percorso_risultati(nome_file_csv, formato=None):
+    """
+    Dove leggere i risultati: con formato "csv" o "colonne" quello del formato (None se manca),
+    con formato=None il più recente tra il CSV e la cartella a colonne con lo stesso nome senza .csv.
+    """
+    schema = os.path.join(os.path.splitext(nome_file_csv)[0], "schema.json")
+    candidati = {}
+    if formato in (None, "colonne") and os.path.exists(schema):
+        candidati[os.path.dirname(schema)] = os.path.getmtime(schema)
+    if formato in (None, "csv") and os.path.exists(nome_file_csv):
+        candidati[nome_file_csv] = os.path.getmtime(nome_file_csv)
+    return max(candidati, key=candidati.get) if candidati else None
+
+
+def carica_colonne(percorso, nomi):
+    """Solo le colonne richieste, come dict nome -> array NumPy, da una cartella a colonne o da un CSV."""
+    if os.path.isdir(percorso):
+        lettore = LettoreColonne(percorso)
+        return {nome: lettore.colonna(nome) for nome in nomi}
+    with open(percorso, newline="") as f:
+        lettore = csv.reader(f)
+        intestazione = next(lettore)
+        indici = [intestazione.index(nome) for nome in nomi]
+        valori = [[] for _ in nomi]
+        for riga in lettore:
+            for lista, i in zip(valori, indici):
+                lista.append(riga[i])
+    return {nome: np.array(lista) if nome in CATEGORIE else np.array(lista, dtype=_tipo(nome))
+            for nome, lista in zip(nomi, valori)}
+
+
+def apri_scrittore(nome_file_csv, intestazione, formato="csv", riprendi=False, configurazione=None):
+    """ScrittoreRisultati per formato "csv", ScrittoreColonne (cartella con lo stesso nome) per "colonne"."""
+    if formato == "colonne":
+        return ScrittoreColonne(os.path.splitext(nome_file_csv)[0], intestazione, riprendi,
+                                configurazione=configurazione)
+    return ScrittoreRisultati(nome_file_csv, intestazione, riprendi, configurazione=configurazione)
@@ -0,0 +1,246 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from guard import GameState, Position
+from replay import Replay
+from statistiche import StatistichePartita
+
+VITTORIA = "VITTORIA"
+CATTURATO = "CATTURATO"
+PAREGGIO = "PAREGGIO"
+
+
+@dataclass
+class RisultatoPartita:
+    esito: str  # VITTORIA, CATTURATO o PAREGGIO (turni finiti)
+    turni: int
+    mosse_ladro: int  # Turni in cui il ladro ha cambiato cella
+    pos_ladro: Tuple[int, int]
+    pos_g1: Tuple[int, int]
+    pos_g2: Tuple[int, int]
+    statistiche: Optional[dict] = None  # Colonne di statistiche.COLONNE, solo se richieste
+    replay: Optional[Replay] = None  # Traiettoria compatta della partita, solo se richiesta
+    pos_altre: Tuple[Tuple[int, int], ...] = ()  # Guardie oltre G1 e G2, nelle squadre di k guardie
+
+
+class Partita:
+    """
+    Motore di gioco senza grafica, condiviso da tutti i test e dall'interfaccia pygame.
+    Un turno è: mossa del ladro, controllo vittoria/cattura, mossa delle guardie, controllo cattura.
+    - ladro: qualsiasi agente con pos e pianifica_mossa(griglia, guardie)
+    - guardie: qualsiasi AI con get_best_moves(stato) che restituisce (g1, g2)
+    - altre_guardie: posizioni delle guardie oltre G1 e G2 (squadre di k guardie): lo stato passa
+      la squadra intera in guardie=[...] e get_best_moves deve restituire tutte le k posizioni
+    - max_turni: None = nessun limite (la partita finisce solo con vittoria o cattura)
+    - raggio_visivo: None = le guardie vedono sempre il ladro, altrimenti solo entro quella distanza
+    - budget_ms: tempo per turno passato a get_best_moves (solo per le AI che lo supportano)
+    - classe_stato / classe_posizione: GameState e Position del modulo delle guardie usate
+    - statistiche: True = contatori di ricerca e tempi di pianificazione per turno (vedi statistiche.py)
+    - registra: True = salva la traiettoria della partita in un Replay (vedi replay.py), id_partita compreso;
+      il formato dei replay ha due guardie, quindi non vale per le squadre con altre_guardie
+    """
+
+    def __init__(self, griglia, ladro, guardie, g1, g2, obiettivo=None, max_turni=200,
+                 raggio_visivo: Optional[int] = None, budget_ms=None,
+                 classe_stato=GameState, classe_posizione=Position, statistiche=False,
+                 registra=False, id_partita=0, altre_guardie=()):
+        self.griglia = griglia
+        self.ladro = ladro
+        self.guardie = guardie
+        self.g1 = g1
+        self.g2 = g2
+        self.altre_guardie = list(altre_guardie)
+        if registra and self.altre_guardie:
+            raise ValueError("i replay registrano solo due guardie")
+        self.obiettivo = obiettivo if obiettivo is not None else ladro.endPos
+        self.max_turni = max_turni
+        self.raggio_visivo = raggio_visivo
+        self.budget_ms = budget_ms
+        self.classe_stato = classe_stato
+        self.classe_posizione = classe_posizione
+        self.turni = 0
+        self.mosse_ladro = 0
+        self.esito = None
+        self.statistiche = StatistichePartita(ladro, guardie) if statistiche else None
+        self.replay = Replay(id_partita, griglia, ladro.pos, (g1.x, g1.y), (g2.x, g2.y),
+                             self.obiettivo) if registra else None
+
+    def squadra(self):
+        return [self.g1, self.g2] + self.altre_guardie
+
+    def _catturato(self):
+        lx, ly = self.ladro.pos
+        return any(abs(lx - g.x) + abs(ly - g.y) <= 1 for g in self.squadra())
+
+    def prepara_ladro(self):
+        """
+        Mezzo turno del ladro per un Pianificatore: (decidi, ripiego), due funzioni che danno la
+        decisione (passo, piano) da passare a turno_ladro; per agenti con istantanea, scegli_passo,
+        passo_di_ripiego ed esegui_passo. decidi cerca su una copia del ladro fatta qui (istantanea):
+        se va oltre la scadenza e resta in esecuzione non tocca posizione, storico, heat map e piano
+        del ladro, che intanto si muove con il ripiego lungo il piano dell'ultima decisione arrivata.
+        """
+        copia = self.ladro.istantanea()
+        guardie = [(g.x, g.y) for g in self.squadra()]
+
+        def decidi():
+            return copia.scegli_passo(self.griglia, guardie), copia.piano
+
+        def ripiego():
+            return self.ladro.passo_di_ripiego(self.griglia, guardie), self.ladro.piano
+
+        return decidi, ripiego
+
+    def turno_ladro(self, decisione=None):
+        """
+        Muove il ladro; restituisce l'esito se la partita è finita, altrimenti None.
+        decisione: (passo, piano) presa altrove (vedi prepara_ladro), None = il ladro decide adesso.
+        """
+        old_pos = self.ladro.pos
+        guardie = [(g.x, g.y) for g in self.squadra()]
+        if decisione is not None:
+            passo, self.ladro.piano = decisione
+            self.ladro.esegui_passo(passo)
+        elif self.statistiche is None:
+            self.ladro.pianifica_mossa(self.griglia, guardie)
+        else:
+            self.statistiche.cronometra(self.statistiche.ms_ladro, self.ladro.pianifica_mossa, self.griglia, guardie)
+        if self.ladro.pos != old_pos:
+            self.mosse_ladro += 1
+        if self.replay is not None:
+            self.replay.registra_ladro(old_pos, self.ladro.pos)
+
+        if self.ladro.pos == self.obiettivo:
+            self.esito = VITTORIA
+        elif self._catturato():
+            self.esito = CATTURATO
+        return self.esito
+
+    def _stato_guardie(self):
+        lx, ly = self.ladro.pos
+        if self.raggio_visivo is None or \
+                any(abs(lx - g.x) + abs(ly - g.y) <= self.raggio_visivo for g in self.squadra()):
+            ladro_visto = self.classe_posizione(lx, ly)
+        else:
+            ladro_visto = None
+        if self.altre_guardie:
+            return self.classe_stato(self.griglia, self.g1, self.g2, ladro_visto, guardie=self.squadra())
+        return self.classe_stato(self.griglia, self.g1, self.g2, ladro_visto)
+
+    def _decidi_guardie(self, stato):
+        opzioni = {} if self.budget_ms is None else {"time_budget_ms": self.budget_ms}
+        if self.statistiche is None:
+            return self.guardie.get_best_moves(stato, **opzioni)
+        return self.statistiche.cronometra(self.statistiche.ms_guardie, self.guardie.get_best_moves, stato, **opzioni)
+
+    def prepara_guardie(self):
+        """
+        Mezzo turno delle guardie per un Pianificatore: (decidi, ripiego), due funzioni che danno
+        le nuove posizioni da passare a turno_guardie. Il ripiego è la mossa dell'ultima profondità
+        completata (mossa_corrente delle AI anytime) se viene dalla ricerca su questo stato,
+        altrimenti le guardie restano ferme.
+        """
+        stato = self._stato_guardie()
+        ferme = tuple(self.squadra())
+
+        def decidi():
+            return self._decidi_guardie(stato)
+
+        def ripiego():
+            if getattr(self.guardie, "stato_corrente", None) is stato:
+                mosse = self.guardie.mossa_corrente
+                if mosse is not None:
+                    return mosse
+            return ferme
+
+        return decidi, ripiego
+
+    def turno_guardie(self, nuove=None):
+        """
+        Muove le guardie; restituisce l'esito se la partita è finita, altrimenti None.
+        nuove: posizioni già decise altrove (vedi prepara_guardie), None = le decide adesso.
+        """
+        old_g1, old_g2 = self.g1, self.g2
+        if nuove is None:
+            nuove = self._decidi_guardie(self._stato_guardie())
+        self.g1, self.g2, *self.altre_guardie = nuove
+
+        if self.replay is not None:
+            self.replay.registra_guardie((old_g1.x, old_g1.y), (self.g1.x, self.g1.y),
+                                         (old_g2.x, old_g2.y), (self.g2.x, self.g2.y))
+
+        self.turni += 1
+        if self._catturato():
+            self.esito = CATTURATO
+        elif self.max_turni is not None and self.turni >= self.max_turni:
+            self.esito = PAREGGIO
+        return self.esito
+
+    def gioca(self):
+        """Gioca fino alla fine e restituisce il RisultatoPartita."""
+        while self.esito is None:
+            if self.turno_ladro() is None:
+                self.turno_guardie()
+        return self.risultato()
+
+    def risultato(self):
+        statistiche = self.statistiche.come_dict() if self.statistiche is not None else None
+        if self.replay is not None:
+            self.replay.esito = self.esito
+        return RisultatoPartita(self.esito, self.turni, self.mosse_ladro, self.ladro.pos,
+                                (self.g1.x, self.g1.y), (self.g2.x, self.g2.y), statistiche, self.replay,
+                                tuple((g.x, g.y) for g in self.altre_guardie))
+
+
+class Pianificatore:
+    """
+    Decide un mezzo turno (prepara_ladro o prepara_guardie di Partita) in un thread separato:
+    chi lo usa (il ciclo di disegno di main.py) continua a girare e controlla con pronto() quando la
+    decisione è arrivata o la scadenza è passata. La partita la muove solo chi chiama decisione(),
+    con la decisione del thread o, in ritardo, con il ripiego.
+    Un agente ha il suo Pianificatore: finché la sua ricerca in ritardo non finisce non ne parte
+    un'altra, e i suoi turni si giocano con il ripiego.
+    """
+
+    def __init__(self, scadenza_ms=None):
+        self.scadenza_ms = scadenza_ms  # None = si aspetta sempre la decisione
+        self.thread = None
+        self.scadenza = None
+        self.ripiego = None
+        self.decisione_thread = None
+        self.errore = None
+        self.in_ritardo = False  # La ricerca di un turno precedente è ancora in corso
+
+    def avvia(self, decidi, ripiego):
+        """Avvia decidi() in un thread; restituisce False se la ricerca precedente è ancora in corso."""
+        self.ripiego = ripiego
+        self.scadenza = None if self.scadenza_ms is None else time.perf_counter() + self.scadenza_ms / 1000
+        self.in_ritardo = self.thread is not None and self.thread.is_alive()
+        if self.in_ritardo:
+            return False
+
+        def esegui():
+            try:
+                self.decisione_thread = decidi()
+            except Exception as errore:
+                self.errore = errore
+
+        self.decisione_thread, self.errore = None, None
+        # daemon: chiudendo la finestra non si aspetta la fine di una ricerca lunga
+        self.thread = threading.Thread(target=esegui, daemon=True)
+        self.thread.start()
+        return True
+
+    def pronto(self):
+        return self.in_ritardo or not self.thread.is_alive() or \
+            (self.scadenza is not None and time.perf_counter() >= self.scadenza)
+
+    def decisione(self):
+        """La decisione del thread se è arrivata, altrimenti il ripiego (quella in ritardo si scarta)."""
+        if self.in_ritardo or self.thread.is_alive():
+            return self.ripiego()
+        if self.errore is not None:
+            raise self.errore
+        return self.decisione_thread
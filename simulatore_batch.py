@@ -0,0 +1,241 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from mappa import (genera_mappe, impacca_righe, spacchetta_righe, espandi_righe,
+                   IRRAGGIUNGIBILE, MAX_LARGHEZZA_BIT)
+from simulatore import PAREGGIO, VITTORIA, CATTURATO
+
+# Celle recenti penalizzate per il ladro, come storico_mosse di RobberAgent
+MOSSE_STORICO = 3
+# Codici degli esiti negli array dei risultati
+ESITI = (PAREGGIO, VITTORIA, CATTURATO)
+IN_CORSO = -1
+
+# Mosse nello stesso ordine delle guardie di DummyGuards: la quinta è "ferma"
+DX = np.array([0, 0, 1, -1, 0])
+DY = np.array([1, -1, 0, 0, 0])
+
+
+@dataclass
+class RisultatiLotto:
+    esito: np.ndarray  # int8, indice in ESITI
+    turni: np.ndarray
+    mosse_ladro: np.ndarray
+
+    def conteggi(self):
+        return {nome: int((self.esito == codice).sum()) for codice, nome in enumerate(ESITI)}
+
+
+def campi_distanza(libere, obiettivo):
+    """BFS all'indietro dall'obiettivo (x, y) per tutte le mappe insieme: uint16 (B, H * W)."""
+    b, h, w = libere.shape
+    if w > MAX_LARGHEZZA_BIT:
+        return _campi_distanza_bool(libere, obiettivo)
+
+    # BFS sulle righe di bit: la distanza di ogni cella si accumula un bit alla volta
+    # (piani[j] = celle con il bit j della distanza acceso), spacchettata solo alla fine
+    lib = impacca_righe(libere)
+    fronte = np.zeros((b, h), dtype=np.uint64)
+    fronte[:, obiettivo[1]] = lib[:, obiettivo[1]] & (np.uint64(1) << np.uint64(obiettivo[0]))
+    visitate = fronte.copy()
+    piani = []
+    passo = 0
+    while fronte.any():
+        for j in range(passo.bit_length()):
+            if j == len(piani):
+                piani.append(np.zeros_like(fronte))
+            if passo >> j & 1:
+                piani[j] |= fronte
+        fronte = espandi_righe(fronte, lib) & ~visitate
+        visitate |= fronte
+        passo += 1
+
+    dist = np.zeros((b, h, w), dtype=np.uint16)
+    for j, piano in enumerate(piani):
+        dist |= spacchetta_righe(piano, w).astype(np.uint16) << np.uint16(j)
+    dist[~spacchetta_righe(visitate, w)] = IRRAGGIUNGIBILE
+    return dist.reshape(b, h * w)
+
+
+def _campi_distanza_bool(libere, obiettivo):
+    # Stessa BFS su array bool, per le mappe più larghe di MAX_LARGHEZZA_BIT
+    b, h, w = libere.shape
+    dist = np.full((b, h, w), IRRAGGIUNGIBILE, dtype=np.uint16)
+    fronte = np.zeros_like(libere)
+    fronte[:, obiettivo[1], obiettivo[0]] = libere[:, obiettivo[1], obiettivo[0]]
+    visitate = fronte.copy()
+    passo = 0
+    while fronte.any():
+        dist[fronte] = passo
+        nuovo = np.zeros_like(fronte)
+        nuovo[:, 1:, :] |= fronte[:, :-1, :]
+        nuovo[:, :-1, :] |= fronte[:, 1:, :]
+        nuovo[:, :, 1:] |= fronte[:, :, :-1]
+        nuovo[:, :, :-1] |= fronte[:, :, 1:]
+        fronte = nuovo & libere & ~visitate
+        visitate |= fronte
+        passo += 1
+    return dist.reshape(b, h * w)
+
+
+class _Lotto:
+    """Stato di B partite in corso, una riga per partita; le partite finite vengono ritirate."""
+
+    def __init__(self, libere, start, end, g1, g2, rng):
+        self.b, self.h, self.w = libere.shape
+        self.libere = libere.reshape(self.b, -1)
+        self.dist = campi_distanza(libere, end)
+        self.end = end[1] * self.w + end[0]
+        self.id = np.arange(self.b)
+        self.lx = np.full(self.b, start[0])
+        self.ly = np.full(self.b, start[1])
+        self.gx = np.tile(np.array([g1[0], g2[0]]), (self.b, 1))
+        self.gy = np.tile(np.array([g1[1], g2[1]]), (self.b, 1))
+        self.calore = np.zeros((self.b, self.h * self.w), dtype=np.uint16)
+        # Ultime MOSSE_STORICO celle raggiunte dal ladro (indice piatto, -1 = vuoto), la più recente in fondo
+        self.storico = np.full((self.b, MOSSE_STORICO), -1, dtype=np.int64)
+        self.mosse = np.zeros(self.b, dtype=np.int32)
+        self.attiva = np.ones(self.b, dtype=bool)
+        self.rng = rng
+
+    def ritira(self):
+        # Le righe delle partite finite continuano a muoversi a vuoto finché non sono
+        # almeno un quarto del lotto; allora gli array vengono compattati
+        if self.attiva.sum() > 0.75 * self.b:
+            return
+        tenere = self.attiva
+        for nome in ("libere", "dist", "id", "lx", "ly", "gx", "gy", "calore", "storico", "mosse", "attiva"):
+            setattr(self, nome, getattr(self, nome)[tenere])
+        self.b = len(self.id)
+
+    def _candidate(self, x, y):
+        # Celle raggiunte dalle 5 mosse: (B, 5) coordinate, indice piatto e validità
+        nx, ny = x[:, None] + DX, y[:, None] + DY
+        dentro = (nx >= 0) & (nx < self.w) & (ny >= 0) & (ny < self.h)
+        cella = np.where(dentro, ny * self.w + nx, 0)
+        valide = dentro & np.take_along_axis(self.libere, cella, axis=1)
+        return nx, ny, cella, valide
+
+    def _catture(self):
+        d = np.abs(self.gx - self.lx[:, None]) + np.abs(self.gy - self.ly[:, None])
+        return (d <= 1).any(axis=1)
+
+    def turno_ladro(self):
+        """Ladro a campo di distanza: distanza BFS dalla cassaforte + penalità guardie, storico e calore."""
+        righe = np.arange(self.b)
+        nx, ny, cella, valide = self._candidate(self.lx, self.ly)
+        valide[:, 4] = False  # Come A*, il ladro non resta fermo se ha una mossa
+        costo = self.dist[righe[:, None], cella].astype(np.int64)
+        # Come l'euristica di RobberAgent: +100 sulle ultime MOSSE_STORICO celle raggiunte, +5 per ogni
+        # arrivo nella cella (RobberAgent legge la sua heat map trasposta, qui si legge la cella stessa)
+        recenti = (cella[:, :, None] == self.storico[:, None, :]).any(axis=2)
+        costo += recenti * 100 + self.calore[righe[:, None], cella].astype(np.int64) * 5
+
+        # Guardie viste dal ladro (raggio 3): cella occupata vietata, penalità (4 - d) * 20 attorno
+        viste = np.abs(self.gx - self.lx[:, None]) + np.abs(self.gy - self.ly[:, None]) <= 3
+        for k in range(2):
+            d = np.abs(nx - self.gx[:, k:k + 1]) + np.abs(ny - self.gy[:, k:k + 1])
+            costo += np.where(viste[:, k:k + 1], np.maximum(4 - d, 0) * 20, 0)
+            valide &= ~(viste[:, k:k + 1] & (d == 0))
+
+        costo[~valide] = np.iinfo(np.int64).max
+        scelta = np.argmin(costo, axis=1)
+        bloccato = ~valide.any(axis=1)
+        scelta[bloccato] = 4
+        nuovo_x = np.where(bloccato, self.lx, nx[righe, scelta])
+        nuovo_y = np.where(bloccato, self.ly, ny[righe, scelta])
+        self.mosse += ~bloccato
+        self.lx, self.ly = nuovo_x, nuovo_y
+        # Come pianifica_mossa: storico e calore si aggiornano solo quando il ladro si sposta
+        mosse = righe[~bloccato]
+        arrivi = self.ly[mosse] * self.w + self.lx[mosse]
+        self.storico[mosse] = np.column_stack([self.storico[mosse, 1:], arrivi])
+        self.calore[mosse, arrivi] += 1
+
+        vinte = self.ly * self.w + self.lx == self.end
+        return vinte, ~vinte & self._catture()
+
+    def turno_guardie(self, tipo, raggio_visivo):
+        """Guardie "random" o "greedy" di DummyGuards, vettoriali su tutte le partite."""
+        visto = (np.abs(self.gx - self.lx[:, None]) + np.abs(self.gy - self.ly[:, None]) <= raggio_visivo).any(axis=1)
+        righe = np.arange(self.b)
+        for k in range(2):
+            nx, ny, _, valide = self._candidate(self.gx[:, k], self.gy[:, k])
+            # Mossa a caso: il punteggio casuale più alto tra le mosse valide
+            punteggio = np.where(valide, self.rng.random((self.b, 5)), -1.0)
+            scelta = np.argmax(punteggio, axis=1)
+            if tipo == "greedy":
+                # Ladro visto: la prima mossa valida (in ordine) che minimizza la distanza di Manhattan
+                d = np.abs(nx - self.lx[:, None]) + np.abs(ny - self.ly[:, None])
+                d = np.where(valide, d, np.iinfo(np.int64).max)
+                scelta = np.where(visto, np.argmin(d, axis=1), scelta)
+            self.gx[:, k] = nx[righe, scelta]
+            self.gy[:, k] = ny[righe, scelta]
+        return self._catture()
+
+
+def gioca_lotto(muri, start, end, g1, g2, guardie="random", max_turni=200, raggio_visivo=4,
+                rng=None, dimensione_lotto=16384):
+    """
+    Gioca in parallelo una partita per ogni mappa di muri (bool (B, H, W), True = muro), tutte
+    con le stesse posizioni iniziali (x, y). Tutte le partite avanzano di un turno alla volta;
+    quelle finite escono dagli array così le altre non pagano per loro.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    totale = len(muri)
+    esito = np.full(totale, IN_CORSO, dtype=np.int8)
+    turni = np.zeros(totale, dtype=np.int32)
+    mosse = np.zeros(totale, dtype=np.int32)
+
+    for inizio in range(0, totale, dimensione_lotto):
+        lotto = _Lotto(~muri[inizio:inizio + dimensione_lotto], start, end, g1, g2, rng)
+        lotto.id += inizio
+        for turno in range(1, max_turni + 1):
+            vinte, catturate = lotto.turno_ladro()
+            # Le guardie si muovono in tutto il lotto: gli esiti valgono solo per le partite attive
+            catturate_dopo = lotto.turno_guardie(guardie, raggio_visivo) & ~(vinte | catturate)
+            vinte &= lotto.attiva
+            catturate = (catturate | catturate_dopo) & lotto.attiva
+            finite = vinte | catturate
+
+            esito[lotto.id[vinte]] = ESITI.index(VITTORIA)
+            esito[lotto.id[catturate]] = ESITI.index(CATTURATO)
+            turni[lotto.id[finite]] = np.where(catturate_dopo, turno, turno - 1)[finite]
+            mosse[lotto.id[finite]] = lotto.mosse[finite]
+            lotto.attiva &= ~finite
+            lotto.ritira()
+            if not lotto.attiva.any():
+                break
+
+        # Turni esauriti
+        restanti = lotto.id[lotto.attiva]
+        esito[restanti] = ESITI.index(PAREGGIO)
+        turni[restanti] = max_turni
+        mosse[restanti] = lotto.mosse[lotto.attiva]
+
+    return RisultatiLotto(esito, turni, mosse)
+
+
+def gioca_partite(n, size=20, guardie="random", densita=0.25, max_turni=200, raggio_visivo=4, seed=None):
+    """n partite su mappe generate in blocco, con gli spawn dei test (guardie in punti proporzionali)."""
+    rng = np.random.default_rng(seed)
+    start, end = (0, 0), (size - 1, size - 1)
+    g1, g2 = (size // 2, size // 4), (size // 4, size // 2)
+    protette = [(g1[1], g1[0]), (g2[1], g2[0])]
+    mappe, trovate = [], 0
+    while trovate < n:
+        valide = genera_mappe(n - trovate, size, rng, densita, protette, start, end)
+        mappe.append(valide)
+        trovate += len(valide)
+    return gioca_lotto(np.concatenate(mappe), start, end, g1, g2, guardie, max_turni, raggio_visivo, rng)
+
+
+if __name__ == "__main__":
+    import time
+
+    for tipo in ("random", "greedy"):
+        t0 = time.perf_counter()
+        risultati = gioca_partite(100_000, guardie=tipo, seed=0)
+        print(f"{tipo}: {risultati.conteggi()} in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,75 @@
+import heapq
+import time
+
+# Colonne aggiunte ai CSV quando le statistiche sono attive, nell'ordine di scrittura
+COLONNE = ["Ladro_Nodi", "Ladro_Push", "Ladro_Frontiera_Max", "Ladro_ms_Totale", "Ladro_ms_Max",
+           "Guardie_Nodi", "Guardie_Tagli", "Guardie_Prof_Max", "Guardie_ms_Totale", "Guardie_ms_Max"]
+
+
+class ContatoriRicerca:
+    """
+    Contatori di una ricerca best-first (A*, Greedy).
+    Gli agenti usano push/pop al posto di heapq.heappush/heappop solo se hanno dei contatori
+    assegnati: da disattivati il ciclo di ricerca è esattamente quello di prima.
+    """
+
+    __slots__ = ("nodi_espansi", "push_heap", "frontiera_max")
+
+    def __init__(self):
+        self.nodi_espansi = 0
+        self.push_heap = 0
+        self.frontiera_max = 0
+
+    def push(self, heap, elemento):
+        heapq.heappush(heap, elemento)
+        self.push_heap += 1
+        if len(heap) > self.frontiera_max:
+            self.frontiera_max = len(heap)
+
+    def pop(self, heap):
+        self.nodi_espansi += 1
+        return heapq.heappop(heap)
+
+    def pushpop(self, heap, elemento):
+        # Come heapq.heappushpop: l'elemento entra nell'heap solo se non è già il minimo
+        self.nodi_espansi += 1
+        if heap and heap[0] < elemento:
+            self.push_heap += 1
+        return heapq.heappushpop(heap, elemento)
+
+
+class StatistichePartita:
+    """Aggrega per partita i contatori del ladro, quelli delle guardie e il tempo di pianificazione per turno."""
+
+    def __init__(self, ladro, guardie):
+        self.ladro = ContatoriRicerca()
+        if hasattr(ladro, "contatori"):
+            ladro.contatori = self.ladro
+        self.guardie = guardie
+        if hasattr(guardie, "conta_nodi"):
+            guardie.conta_nodi = True
+        # Nodi e tagli delle guardie sono cumulativi: qui si tiene solo la differenza per questa partita
+        self.nodi_iniziali = getattr(guardie, "nodi", 0)
+        self.tagli_iniziali = getattr(guardie, "tagli", 0)
+        self.turni_iniziali = len(getattr(guardie, "profondita_per_turno", []))
+        self.ms_ladro = []
+        self.ms_guardie = []
+
+    def cronometra(self, tempi, funzione, *args, **kwargs):
+        t0 = time.perf_counter()
+        risultato = funzione(*args, **kwargs)
+        tempi.append((time.perf_counter() - t0) * 1000)
+        return risultato
+
+    def riga(self):
+        """Valori nell'ordine di COLONNE."""
+        profondita = getattr(self.guardie, "profondita_per_turno", [])[self.turni_iniziali:] or [0]
+        return [self.ladro.nodi_espansi, self.ladro.push_heap, self.ladro.frontiera_max,
+                round(sum(self.ms_ladro), 3), round(max(self.ms_ladro, default=0), 3),
+                getattr(self.guardie, "nodi", 0) - self.nodi_iniziali,
+                getattr(self.guardie, "tagli", 0) - self.tagli_iniziali,
+                max(profondita),
+                round(sum(self.ms_guardie), 3), round(max(self.ms_guardie, default=0), 3)]
+
+    def come_dict(self):
+        return dict(zip(COLONNE, self.riga()))
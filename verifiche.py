@@ -0,0 +1,346 @@
+"""
+Verifiche di coerenza tra le varianti degli algoritmi, su mappe seedate.
+
+    python verifiche.py                  # tutte le verifiche
+    python verifiche.py --verifiche jps  # solo alcune
+
+Ogni verifica stampa cosa ha confrontato ed esce con codice 1 se qualcosa non torna.
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from RobberAgent import RobberAgent
+from guard import MinimaxGuardAI, Position
+from jps import PianificatoreJPS
+from mappa import Mappa, genera_mappa, genera_mappe, ottieni_mappa, IRRAGGIUNGIBILE
+from simulatore import Partita, Pianificatore, PAREGGIO, VITTORIA, CATTURATO
+from simulatore_batch import DX, DY, ESITI, MOSSE_STORICO, gioca_lotto
+
+SEED = 2026
+
+
+def _mappa_con_partenze(size, k, n_partenze):
+    """Mappa seedata con obiettivo nell'angolo e n_partenze celle libere da cui l'obiettivo è raggiungibile."""
+    rng = np.random.default_rng([SEED, size, k])
+    obiettivo = (size - 1, size - 1)
+    griglia = genera_mappa(size, 0.25, [(0, 0), obiettivo], (0, 0), obiettivo, rng=rng)
+    mappa = ottieni_mappa(griglia)
+    distanze = mappa.distanze_da(mappa.indice(*obiettivo))
+    libere = [c for i, c in enumerate(mappa.coordinate)
+              if distanze[i] not in (0, IRRAGGIUNGIBILE) and not mappa.occupazione[i]]
+    partenze = [libere[i] for i in rng.choice(len(libere), n_partenze, replace=False)]
+    return griglia, mappa, distanze, obiettivo, partenze
+
+
+def _lunghezza(came_from, obiettivo):
+    # Passi da obiettivo a partenza lungo came_from
+    passi, nodo = 0, obiettivo
+    while came_from[nodo] is not None:
+        passi, nodo = passi + 1, came_from[nodo]
+    return passi
+
+
+def _primo_passo(came_from, partenza, obiettivo):
+    # Prima mossa del percorso di came_from, come RobberAgent.scegli_passo (None = irraggiungibile)
+    if obiettivo not in came_from:
+        return None
+    nodo = obiettivo
+    while came_from[nodo] != partenza:
+        nodo = came_from[nodo]
+    return nodo
+
+
+class _LadroConfronto(RobberAgent):
+    """Ladro A* che a ogni turno chiede la prima mossa anche a JPS, sullo stesso stato (storico, heat map, guardie)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.confronto = PianificatoreJPS(self)
+        self.turni = 0
+        self.diverse = []
+
+    def a_star(self, griglia, guardie_visibili):
+        came_from = super().a_star(griglia, guardie_visibili)
+        atteso = _primo_passo(came_from, self.pos, self.endPos)
+        passo = self.confronto.prossimo_passo(griglia, guardie_visibili)
+        self.turni += 1
+        if passo != atteso:
+            self.diverse.append((self.pos, atteso, passo))
+        return came_from
+
+
+def verifica_jps(n_mappe=50, n_partite=100):
+    """
+    JPS deve dare sempre la stessa prima mossa di A*.
+    - Senza penalità (ladro appena creato, nessuna guardia) l'euristica è la sola distanza di Manhattan:
+      A* e JPS devono trovare percorsi lunghi quanto la BFS e fare una prima mossa su un percorso minimo.
+    - A metà partita, con storico, heat map e guardie visibili: in ogni turno delle partite di TestRunner
+      giocate da A*, la prima mossa di JPS sullo stesso stato deve essere quella di A*; le stesse
+      partite giocate da JPS devono finire allo stesso modo, con le stesse mosse.
+    """
+    errori = []
+    controlli = 0
+    for size in (20, 40):
+        for k in range(n_mappe):
+            griglia, mappa, distanze, obiettivo, partenze = _mappa_con_partenze(size, k, 3)
+            for partenza in partenze:
+                ottima = distanze[mappa.indice(*partenza)]
+                a_star = RobberAgent(partenza, obiettivo, grid_size=size)
+                jps = RobberAgent(partenza, obiettivo, pianificatore="jps", grid_size=size)
+                lunghezze = (_lunghezza(a_star.a_star(griglia, []), obiettivo),
+                             _lunghezza(jps.jps.cerca(griglia, []), obiettivo))
+                passo = jps.jps.prossimo_passo(griglia, [])
+                controlli += 1
+                if lunghezze != (ottima, ottima) or distanze[mappa.indice(*passo)] != ottima - 1:
+                    errori.append(f"jps {size}x{size} mappa {k} da {partenza}: lunghezze A*/JPS {lunghezze}, "
+                                  f"ottima {ottima}, primo passo {passo}")
+    print(f"jps: {controlli} partenze senza penalità, {len(errori)} diverse dalla BFS")
+
+    # Partite come in TestRunner: prima mossa turno per turno, poi esito e mosse della partita intera
+    turni, diverse, partite_diverse = 0, 0, 0
+    for id_partita in range(n_partite):
+        a_star = _LadroConfronto((0, 0), (19, 19))
+        risultati = []
+        for ladro in (a_star, RobberAgent((0, 0), (19, 19), pianificatore="jps")):
+            rng = np.random.default_rng(np.random.SeedSequence([SEED, id_partita]))
+            griglia = genera_mappa(20, 0.25, [(0, 0), (0, 1), (1, 0), (19, 19), (10, 5), (5, 10)],
+                                   (0, 0), (19, 19), rng=rng)
+            guardie = MinimaxGuardAI(max_depth=2, seed=int(rng.integers(2 ** 63)))
+            risultato = Partita(griglia, ladro, guardie, Position(10, 5), Position(5, 10)).gioca()
+            risultati.append((risultato.esito, risultato.turni, risultato.mosse_ladro))
+        turni += a_star.turni
+        diverse += len(a_star.diverse)
+        for pos, atteso, passo in a_star.diverse[:3]:
+            errori.append(f"jps partita {id_partita} da {pos}: prima mossa A* {atteso}, JPS {passo}")
+        if risultati[0] != risultati[1]:
+            partite_diverse += 1
+            errori.append(f"jps partita {id_partita}: A* {risultati[0]}, JPS {risultati[1]}")
+    print(f"jps: {turni} turni a metà partita, {diverse} con una prima mossa diversa da A*; "
+          f"{n_partite - partite_diverse}/{n_partite} partite uguali")
+    return errori
+
+
+def verifica_hpa(limite=1.25):
+    """
+    HPA* è approssimato: il percorso astratto passa per le celle di transizione sui bordi dei cluster.
+    Senza guardie il ladro deve comunque arrivare alla cassaforte in al massimo limite volte i passi
+    minimi (BFS); si riportano eccesso medio e massimo, accanto a quelli di A* sulle stesse mappe
+    (anche A* può allungare: storico e heat map penalizzano le celle già visitate).
+    """
+    errori = []
+    for size, n_mappe in ((20, 100), (40, 100), (100, 20)):
+        rapporti = {"a_star": [], "hpa_star": []}
+        for k in range(n_mappe):
+            rng = np.random.default_rng([SEED, size, k])
+            obiettivo = (size - 1, size - 1)
+            griglia = genera_mappa(size, 0.25, [(0, 0), obiettivo], (0, 0), obiettivo, rng=rng)
+            mappa = ottieni_mappa(griglia)
+            ottima = mappa.distanze_da(0)[mappa.indice(*obiettivo)]
+            for pianificatore in ("a_star", "hpa_star"):
+                ladro = RobberAgent((0, 0), obiettivo, pianificatore=pianificatore, grid_size=size)
+                n = 0
+                while ladro.pos != obiettivo and n <= limite * ottima:
+                    ladro.pianifica_mossa(griglia, [])
+                    n += 1
+                if ladro.pos != obiettivo:
+                    errori.append(f"{pianificatore} {size}x{size} mappa {k}: oltre {limite} volte "
+                                  f"i {ottima} passi minimi")
+                else:
+                    rapporti[pianificatore].append(n / ottima)
+        for pianificatore, r in rapporti.items():
+            if r:
+                print(f"{pianificatore} {size}x{size}: eccesso medio {np.mean(r) - 1:+.2%}, massimo "
+                      f"{max(r) - 1:+.2%}, {sum(x > 1 for x in r)}/{len(r)} mappe sopra il minimo")
+    return errori
+
+
+def _partita_scalare(muri, start, end, g1, g2, guardie, max_turni, raggio_visivo, rng):
+    """
+    Le stesse politiche di simulatore_batch scritte una partita e una cella alla volta.
+    Restituisce (esito, turni, mosse del ladro).
+    """
+    griglia = muri.astype(int).tolist()
+    mappa = Mappa(griglia)
+    dist = mappa.distanze_da(mappa.indice(*end))
+    ladro, squadra = start, [g1, g2]
+    storico, calore = [], {}
+    mosse = 0
+
+    def catturato():
+        return any(abs(ladro[0] - g[0]) + abs(ladro[1] - g[1]) <= 1 for g in squadra)
+
+    def muovi_guardie():
+        # Il lotto muove le guardie anche dopo la mossa finale del ladro: stessi numeri casuali consumati
+        visto = any(abs(ladro[0] - g[0]) + abs(ladro[1] - g[1]) <= raggio_visivo for g in squadra)
+        for k, (x, y) in enumerate(squadra):
+            candidate = [(x + dx, y + dy) for dx, dy in zip(DX.tolist(), DY.tolist())]
+            valide = [mappa.libera(*c) for c in candidate]
+            punteggi = rng.random(5)
+            scelta = max((j for j in range(5) if valide[j]), key=lambda j: punteggi[j])
+            if guardie == "greedy" and visto:
+                scelta = min((j for j in range(5) if valide[j]),
+                             key=lambda j: abs(candidate[j][0] - ladro[0]) + abs(candidate[j][1] - ladro[1]))
+            squadra[k] = candidate[scelta]
+
+    for turno in range(1, max_turni + 1):
+        viste = [g for g in squadra if abs(ladro[0] - g[0]) + abs(ladro[1] - g[1]) <= 3]
+        migliore, costo_migliore = None, None
+        for dx, dy in zip(DX.tolist()[:4], DY.tolist()[:4]):
+            c = (ladro[0] + dx, ladro[1] + dy)
+            if not mappa.libera(*c) or c in viste:
+                continue
+            i = mappa.indice(*c)
+            costo = dist[i] + (100 if i in storico else 0) + calore.get(i, 0) * 5
+            costo += sum(max(4 - abs(c[0] - g[0]) - abs(c[1] - g[1]), 0) * 20 for g in viste)
+            if costo_migliore is None or costo < costo_migliore:
+                migliore, costo_migliore = c, costo
+        if migliore is not None:
+            ladro = migliore
+            mosse += 1
+            i = mappa.indice(*ladro)
+            storico = (storico + [i])[-MOSSE_STORICO:]
+            calore[i] = calore.get(i, 0) + 1
+        if ladro == end or catturato():
+            muovi_guardie()
+            return (VITTORIA if ladro == end else CATTURATO), turno - 1, mosse
+        muovi_guardie()
+        if catturato():
+            return CATTURATO, turno, mosse
+    return PAREGGIO, max_turni, mosse
+
+
+def verifica_batch(n_partite=200, size=20, max_turni=200):
+    """
+    Il lotto NumPy contro _partita_scalare sulle stesse mappe seedate, partita per partita.
+    - greedy con raggio visivo illimitato: nessuna scelta dipende dal caso, quindi si gioca tutto
+      in un lotto solo (con le partite finite che escono dagli array) e gli esiti devono coincidere.
+    - random: un lotto per partita, così i numeri casuali vengono estratti nello stesso ordine.
+    """
+    rng = np.random.default_rng(SEED)
+    start, end = (0, 0), (size - 1, size - 1)
+    g1, g2 = (size // 2, size // 4), (size // 4, size // 2)
+    muri = genera_mappe(n_partite, size, rng, 0.25, [(g1[1], g1[0]), (g2[1], g2[0])], start, end)
+    errori = []
+    for guardie, raggio, lotto in (("greedy", 10 ** 6, n_partite), ("random", 4, 1)):
+        batch = gioca_lotto(muri, start, end, g1, g2, guardie, max_turni, raggio,
+                            np.random.default_rng(SEED), dimensione_lotto=lotto)
+        rng_scalare = np.random.default_rng(SEED)
+        diverse = 0
+        for i in range(len(muri)):
+            atteso = _partita_scalare(muri[i], start, end, g1, g2, guardie, max_turni, raggio, rng_scalare)
+            ottenuto = (ESITI[batch.esito[i]], int(batch.turni[i]), int(batch.mosse_ladro[i]))
+            if ottenuto != atteso:
+                diverse += 1
+                errori.append(f"batch {guardie} partita {i}: lotto {ottenuto}, scalare {atteso}")
+        print(f"batch {guardie}: {len(muri) - diverse}/{len(muri)} partite uguali alla versione scalare")
+    return errori
+
+
+class _LadroLento(RobberAgent):
+    """Ladro A* che, con lento impostato, sceglie il passo solo dopo via.set(): una ricerca oltre la scadenza."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lento = False
+        self.via = threading.Event()
+
+    def scegli_passo(self, griglia, guardia_tutte):
+        if self.lento:
+            self.via.wait()
+        return super().scegli_passo(griglia, guardia_tutte)
+
+
+def verifica_scadenza(scadenza_ms=20):
+    """
+    Un mezzo turno del ladro oltre la scadenza di Pianificatore, come nel ciclo di main.py: la ricerca
+    lavora su una copia (RobberAgent.istantanea) e il ladro si muove con passo_di_ripiego lungo il
+    piano dell'ultima decisione arrivata in tempo, anche nel turno dopo (la ricerca è ancora in corso).
+    Quando la ricerca in ritardo finisce, piano, posizione, storico e heat map del ladro devono essere
+    quelli dei passi giocati, e il suo risultato (scartato) deve partire dalla posizione della copia.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence([SEED, 0]))
+    griglia = genera_mappa(20, 0.25, [(0, 0), (0, 1), (1, 0), (19, 19), (10, 5), (5, 10)], (0, 0), (19, 19), rng=rng)
+    ladro = _LadroLento((0, 0), (19, 19))
+    partita = Partita(griglia, ladro, MinimaxGuardAI(max_depth=1, seed=SEED), Position(10, 5), Position(5, 10))
+    pianificatore_ladro, pianificatore_guardie = Pianificatore(scadenza_ms), Pianificatore()
+
+    def mezzo_turno(pianificatore, prepara, turno):
+        pianificatore.avvia(*prepara())
+        while not pianificatore.pronto():
+            time.sleep(0.001)
+        return turno(pianificatore.decisione())
+
+    def turno_intero():
+        mezzo_turno(pianificatore_ladro, partita.prepara_ladro, partita.turno_ladro)
+        if partita.esito is None:
+            mezzo_turno(pianificatore_guardie, partita.prepara_guardie, partita.turno_guardie)
+
+    errori = []
+    turno_intero()
+    piano = ladro.piano
+    if not piano or piano[0] != (0, 0):
+        errori.append(f"scadenza: il piano in tempo non parte dalla posizione del ladro: {piano[:3]}")
+        return errori
+
+    # Due turni oltre la scadenza: il primo avvia la ricerca lenta, il secondo la trova ancora in corso
+    ladro.lento = True
+    partenza_ricerca = ladro.pos
+    attese = [piano[piano.index(ladro.pos) + 1], piano[piano.index(ladro.pos) + 2]]
+    turno_intero()
+    ancora_in_corso = pianificatore_ladro.thread.is_alive()
+    turno_intero()
+    ladro.lento = False
+    ladro.via.set()
+    pianificatore_ladro.thread.join()
+
+    if not ancora_in_corso or not pianificatore_ladro.in_ritardo:
+        errori.append("scadenza: la ricerca lenta non era in ritardo")
+    if partita.esito is not None:
+        errori.append(f"scadenza: partita finita durante la verifica ({partita.esito})")
+    if ladro.piano != piano:
+        errori.append(f"scadenza: la ricerca in ritardo ha cambiato il piano del ladro: {ladro.piano[:3]}")
+    if ladro.pos != attese[-1] or ladro.storico_mosse[-2:] != attese:
+        errori.append(f"scadenza: ladro in {ladro.pos} (storico {ladro.storico_mosse}), "
+                      f"il ripiego lungo il piano dava {attese}")
+    if int(ladro.heat_map.sum()) != partita.mosse_ladro:
+        errori.append(f"scadenza: heat map con {int(ladro.heat_map.sum())} passi, giocati {partita.mosse_ladro}")
+    passo_tardivo, piano_tardivo = pianificatore_ladro.decisione_thread
+    if not piano_tardivo or piano_tardivo[0] != partenza_ricerca or \
+            passo_tardivo not in ottieni_mappa(griglia).vicini_xy[partenza_ricerca]:
+        errori.append(f"scadenza: la ricerca in ritardo non è partita da {partenza_ricerca}: "
+                      f"passo {passo_tardivo}, piano {piano_tardivo[:3]}")
+
+    # Il turno dopo la ricerca torna in tempo e ripianifica dalla posizione vera
+    prima = ladro.pos
+    turno_intero()
+    if ladro.piano[:1] != [prima]:
+        errori.append(f"scadenza: il nuovo piano parte da {ladro.piano[:1]}, il ladro era in {prima}")
+    print(f"scadenza: ricerca oltre {scadenza_ms} ms, ladro mosso con il ripiego fino a {attese[-1]}, "
+          f"{len(errori)} incoerenze")
+    return errori
+
+
+VERIFICHE = {
+    "jps": verifica_jps,
+    "hpa_star": verifica_hpa,
+    "batch": verifica_batch,
+    "scadenza": verifica_scadenza,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verifiche", nargs="+", default=list(VERIFICHE), choices=list(VERIFICHE))
+    args = parser.parse_args()
+
+    errori = []
+    for nome in args.verifiche:
+        errori += VERIFICHE[nome]()
+    for errore in errori:
+        print(f"  FALLITA: {errore}")
+    if errori:
+        raise SystemExit(1)
+    print("\nTutte le verifiche superate.")